@@ -0,0 +1,256 @@
+"""Benchmark create_rooms for synthetic buildings of different sizes.
+
+The benchmark runs create_rooms with the fake backend (see dynosaur.fakerevit) so it
+runs outside Revit. For each building size it reports the time for each stage,
+rooms and surfaces per second and peak memory. The scaling exponent is the slope of
+log(time) over log(room count) and should stay close to 1.
+
+Stage times are recorded using instrumentation.Report (see the stages in
+dynosaur.instrumentation). Stages without any time (e.g. cache) are not printed.
+other is everything else (e.g. disposing the Dynamo geometries and the report
+itself) and should stay a small part of the time.
+
+Results are compared with the baseline file and the benchmark exits with an error
+if rooms per second drops more than the threshold for any size or if the scaling
+exponent grows. Use --save-baseline to update the baseline after an intended change.
+Peak memory is measured using tracemalloc in a separate pass once all the sizes
+are timed so memory tracing doesn't slow down the timed runs. It is not available
+in IronPython.
+
+Each timed run of a small building calls create_rooms several times until the run
+takes MIN_RUN_TIME. The time of a run is divided by the number of calls so the time
+of the 10 room building is not lost in the noise of the machine.
+
+Usage:
+    python benchmarks/create_rooms_benchmark.py [options]
+    python benchmarks/create_rooms_benchmark.py --sizes 10 100 1000 10000
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dynosaur import backend  # noqa: E402
+backend.set_backend('fake')
+from dynosaur import fakerevit  # noqa: E402
+from dynosaur import dynosaur  # noqa: E402
+from dynosaur import instrumentation  # noqa: E402
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'create_rooms_baseline.json')
+
+# minimum time of all the runs for each size in seconds
+MIN_TIME = 1.0
+
+# minimum time of a single run in seconds
+MIN_RUN_TIME = 0.2
+
+STAGES = instrumentation.STAGES + ('other',)
+
+
+def run(doc, calls=1):
+    """Run create_rooms for all the rooms in a fake document.
+
+    Args:
+        doc: A fakerevit.Document.
+        calls: Number of calls to create_rooms in the run (Default: 1).
+
+    Returns:
+        A tuple of (total time, stage times, room count, surface count, peak live
+        geometries). Times are for a single call.
+    """
+    fakerevit.set_current_document(doc)
+    fakerevit.DynamoGeometry.reset_counters()
+    report = instrumentation.Report(per_element=False)
+    start = time.time()
+    for _ in range(calls):
+        rooms, _, _ = dynosaur.create_rooms(doc.rooms, report=report)
+    total = (time.time() - start) / calls
+    stage_times = dict((stage, report.stage_time(stage) / calls)
+                       for stage in STAGES[:-1])
+    stage_times['other'] = max(total - sum(stage_times.values()), 0)
+    return total, stage_times, len(rooms), \
+        rooms.surface_count + rooms.fen_surface_count, \
+        report.peaks.get('live_geometries', 0)
+
+
+def peak_memory(doc):
+    """Peak memory in bytes for create_rooms or None if tracemalloc is missing."""
+    if tracemalloc is None:
+        return None
+    fakerevit.set_current_document(doc)
+    tracemalloc.start()
+    try:
+        dynosaur.create_rooms(doc.rooms)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def scaling_exponent(room_counts, times):
+    """Least squares slope of log(time) over log(room count)."""
+    xs = [math.log(c) for c in room_counts]
+    ys = [math.log(max(t, 1e-9)) for t in times]
+    if len(xs) < 2:
+        return None
+    x_mean, y_mean = sum(xs) / len(xs), sum(ys) / len(ys)
+    sxx = sum((x - x_mean) ** 2 for x in xs)
+    return sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys)) / sxx
+
+
+def benchmark(sizes, repeat=3, memory=True, **building):
+    """Run the benchmark for a list of building sizes.
+
+    Args:
+        sizes: List of room counts.
+        repeat: Minimum number of runs for each size. The fastest run is
+            reported.
+        memory: Measure peak memory in a separate pass after the timed runs.
+        building: Keyword arguments for fakerevit.create_building.
+
+    Returns:
+        A dictionary with the building settings, the results for each size and the
+        scaling exponent.
+    """
+    if tracemalloc is not None and tracemalloc.is_tracing():
+        # e.g. PYTHONTRACEMALLOC is set. Memory is measured in its own pass.
+        tracemalloc.stop()
+    docs = []
+    results = []
+    for size in sizes:
+        doc = fakerevit.create_building(size, **building)
+        docs.append(doc)
+        # runs of small buildings call create_rooms until they take MIN_RUN_TIME
+        # and the runs are repeated until they take MIN_TIME to reduce noise
+        runs = [run(doc)]
+        calls = int(math.ceil(MIN_RUN_TIME / max(runs[0][0], 1e-6)))
+        if calls > 1:
+            runs = []
+        while len(runs) < repeat or sum(r[0] for r in runs) * calls < MIN_TIME:
+            runs.append(run(doc, calls))
+        total, stage_times, room_count, surface_count, peak_live = \
+            min(runs, key=lambda r: r[0])
+        # Dynamo geometries that are not disposed in the last run
+        live_count = fakerevit.DynamoGeometry.live_count()
+        results.append({
+            'rooms': room_count,
+            'surfaces': surface_count,
+            'time': total,
+            'stages': stage_times,
+            'rooms_per_second': room_count / total,
+            'surfaces_per_second': surface_count / total,
+            'peak_memory': None,
+            'live_geometries': live_count,
+            'peak_live_geometries': peak_live
+        })
+    for doc, result in zip(docs, results):
+        if memory:
+            result['peak_memory'] = peak_memory(doc)
+        print_result(result)
+    return {
+        'building': building,
+        'results': results,
+        'scaling_exponent': scaling_exponent(
+            [r['rooms'] for r in results], [r['time'] for r in results])
+    }
+
+
+def print_result(result):
+    print('%6d rooms %7d surfaces %8.3f s %8.0f rooms/s %9.0f surfaces/s  '
+          'peak memory: %s  live geometries: %d (peak %d)' % (
+              result['rooms'], result['surfaces'], result['time'],
+              result['rooms_per_second'], result['surfaces_per_second'],
+              '%.1f MB' % (result['peak_memory'] / 1e6)
+              if result['peak_memory'] is not None else 'n/a',
+              result['live_geometries'], result.get('peak_live_geometries', 0)))
+    print('       ' + '  '.join(
+        '%s: %.0f%%' % (stage, 100.0 * result['stages'][stage] /
+                        max(result['time'], 1e-9))
+        for stage in STAGES if result['stages'][stage]))
+
+
+def compare(report, baseline, threshold):
+    """Compare a report with the baseline.
+
+    Returns:
+        A list of regression messages. The list is empty if there is no regression.
+    """
+    if report['building'] != baseline['building']:
+        return ['Building settings are different from the baseline. Use '
+                '--save-baseline to create a baseline for these settings.']
+    regressions = []
+    base_results = dict((r['rooms'], r) for r in baseline['results'])
+    for result in report['results']:
+        base = base_results.get(result['rooms'])
+        if not base:
+            continue
+        ratio = result['rooms_per_second'] / base['rooms_per_second']
+        if ratio < 1 - threshold:
+            regressions.append('%d rooms: %.0f rooms/s is %.0f%% slower than the '
+                               'baseline (%.0f rooms/s).' % (
+                                   result['rooms'], result['rooms_per_second'],
+                                   100 * (1 - ratio), base['rooms_per_second']))
+    exponent, base_exponent = report['scaling_exponent'], baseline['scaling_exponent']
+    if exponent is not None and base_exponent is not None and \
+            exponent > base_exponent + threshold / 2:
+        regressions.append('Scaling exponent %.2f is larger than the baseline '
+                           '(%.2f).' % (exponent, base_exponent))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark create_rooms for synthetic buildings.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000],
+                        help='Room counts (default: 10 100 1000).')
+    parser.add_argument('--windows-per-wall', type=int, default=2)
+    parser.add_argument('--curtain-wall-share', type=float, default=0.25)
+    parser.add_argument('--unbounded-share', type=float, default=0.02)
+    parser.add_argument('--degenerate-share', type=float, default=0.05)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip measuring peak memory.')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Save the results as the new baseline.')
+    parser.add_argument('--threshold', type=float, default=0.3,
+                        help='Allowed slow down compared to the baseline '
+                        '(default: 0.3).')
+    args = parser.parse_args(argv)
+
+    report = benchmark(
+        args.sizes, args.repeat, not args.no_memory,
+        windows_per_wall=args.windows_per_wall,
+        curtain_wall_share=args.curtain_wall_share,
+        unbounded_share=args.unbounded_share,
+        degenerate_share=args.degenerate_share)
+    if report['scaling_exponent'] is not None:
+        print('scaling exponent: %.2f' % report['scaling_exponent'])
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print('saved baseline to %s' % args.baseline)
+        return 0
+
+    if not os.path.isfile(args.baseline):
+        print('no baseline at %s' % args.baseline)
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.threshold)
+    for message in regressions:
+        print('REGRESSION: ' + message)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Measure the import time of the dynosaur modules.
+
+Each module is imported in a new Python process so nothing is imported before it
+except the standard library modules that Python loads at startup. The time is the
+best of a few runs. The benchmark also checks that importing a module doesn't load
+the backend (dynosaur.revitapi or dynosaur.fakerevit) or clr. The Revit and Dynamo
+assemblies should only be loaded the first time a backend function is called.
+
+The modules are compiled before they are measured so the time doesn't include
+compiling the source files.
+
+The benchmark exits with an error if any module is slower than the target or loads
+the backend.
+
+Usage:
+    python benchmarks/import_benchmark.py [options]
+    python benchmarks/import_benchmark.py --target 20 --repeat 10 dynosaur.objects
+"""
+import argparse
+import compileall
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the pure Python modules and the entry point for Dynamo
+MODULES = (
+    'dynosaur',
+    'dynosaur.geometry',
+    'dynosaur.objects',
+    'dynosaur.adjacency',
+    'dynosaur.simplify',
+    'dynosaur.modelfile',
+    'dynosaur.writers',
+    'dynosaur.cache',
+    'dynosaur.execution',
+    'dynosaur.dynosaur'
+)
+
+# modules that should only be loaded when the backend is used
+BACKEND_MODULES = ('clr', 'dynosaur.revitapi', 'dynosaur.fakerevit')
+
+SCRIPT = '''
+import sys, time
+sys.path.insert(0, %r)
+start = time.time()
+import %s
+duration = time.time() - start
+loaded = [m for m in %r if m in sys.modules]
+print('%%r' %% ((duration, loaded),))
+'''
+
+
+def measure(module, repeat):
+    """Import a module in new processes and return (best time, backend modules)."""
+    script = SCRIPT % (ROOT, module, BACKEND_MODULES)
+    best = None
+    loaded = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', script])
+        duration, loaded = eval(output.decode('utf-8').strip().splitlines()[-1])
+        best = duration if best is None else min(best, duration)
+    return best, loaded
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('modules', nargs='*', default=MODULES,
+                        help='Modules to import (Default: the core modules).')
+    parser.add_argument('--target', type=float, default=50,
+                        help='Maximum import time for each module in milliseconds.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of imports for each module. The best is used.')
+    options = parser.parse_args(args)
+
+    compileall.compile_dir(os.path.join(ROOT, 'dynosaur'), quiet=1)
+    failed = []
+    for module in options.modules:
+        duration, loaded = measure(module, options.repeat)
+        print('%-22s %7.1f ms%s' % (
+            module, duration * 1000,
+            '  loads: %s' % ', '.join(loaded) if loaded else ''))
+        if loaded or duration * 1000 > options.target:
+            failed.append(module)
+    if failed:
+        print('slower than %.0f ms or loads the backend: %s' % (
+            options.target, ', '.join(failed)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
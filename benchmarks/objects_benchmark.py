@@ -0,0 +1,154 @@
+"""Compare dictionary based rooms with the array based dynosaur RoomModel.
+
+The dictionary rooms keep a point object for each vertex. RoomModel keeps the
+coordinates in a single float array. Traversing the model is measured both through
+the dictionary-like views and directly through the arrays.
+
+Usage:
+    python benchmarks/objects_benchmark.py [options]
+    python benchmarks/objects_benchmark.py --rooms 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    # IronPython and Python 2
+    tracemalloc = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dynosaur import objects  # noqa: E402
+
+SURFACES_PER_ROOM = 12
+FENS_PER_SURFACE = 2
+
+
+class Point(object):
+    """Minimal stand-in for a Dynamo point."""
+
+    __slots__ = ('X', 'Y', 'Z')
+
+    def __init__(self, x, y, z):
+        self.X, self.Y, self.Z = x, y, z
+
+
+def _quad(x, y, z, size):
+    return (Point(x, y, z), Point(x + size, y, z), Point(x + size, y, z + size),
+            Point(x, y, z + size))
+
+
+def build_dicts(room_count):
+    """Build rooms the way dynosaur used to: one dictionary per entity."""
+    rooms = []
+    for r in range(room_count):
+        room = {'name': r, 'surfaces': []}
+        for s in range(SURFACES_PER_ROOM):
+            srf_name = '%d_%d' % (r, s)
+            srf = {'name': srf_name, 'vertices': _quad(r, s, 0, 3.0),
+                   'fen_surfaces': [], 'parent_id': r}
+            for f in range(FENS_PER_SURFACE):
+                srf['fen_surfaces'].append(
+                    {'name': f, 'vertices': _quad(r, s, f, 1.0),
+                     'parent_id': srf_name})
+            room['surfaces'].append(srf)
+        rooms.append(room)
+    return rooms
+
+
+def build_model(room_count):
+    """Build rooms in a RoomModel."""
+    model = objects.RoomModel()
+    for r in range(room_count):
+        room = model.add_room(r)
+        for s in range(SURFACES_PER_ROOM):
+            srf = room.add_surface('%d_%d' % (r, s), _quad(r, s, 0, 3.0))
+            for f in range(FENS_PER_SURFACE):
+                srf.add_fen_surface(f, _quad(r, s, f, 1.0))
+    return model
+
+
+def traverse_dicts(rooms):
+    """Walk the rooms the way test.py does and sum up the coordinates."""
+    total = 0
+    for room in rooms:
+        for surface in room['surfaces']:
+            total += sum(p.X + p.Y + p.Z for p in surface['vertices'])
+            for fen_surface in surface['fen_surfaces']:
+                total += sum(p.X + p.Y + p.Z for p in fen_surface['vertices'])
+    return total
+
+
+def traverse_views(model):
+    """Walk the RoomModel views the same way."""
+    total = 0
+    for room in model:
+        for surface in room['surfaces']:
+            total += sum(x + y + z for x, y, z in surface['vertices'])
+            for fen_surface in surface['fen_surfaces']:
+                total += sum(x + y + z for x, y, z in fen_surface['vertices'])
+    return total
+
+
+def traverse_arrays(model):
+    """Read the same coordinates directly from the RoomModel arrays."""
+    return sum(model.vertices)
+
+
+def measure(builder, traversers, room_count):
+    """Measure build time, memory and traverse time for a builder."""
+    if tracemalloc:
+        # measure memory in a separate run. tracemalloc slows down the build
+        tracemalloc.start()
+        rooms = builder(room_count)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del rooms
+    else:
+        memory = None
+    start = time.time()
+    rooms = builder(room_count)
+    build_time = time.time() - start
+    traverse_times = []
+    for traverser in traversers:
+        start = time.time()
+        traverser(rooms)
+        traverse_times.append(time.time() - start)
+    return build_time, traverse_times, memory
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rooms', type=int, default=5000,
+                        help='Number of rooms (%d surfaces with %d fenestration '
+                        'surfaces each).' % (SURFACES_PER_ROOM, FENS_PER_SURFACE))
+    room_count = parser.parse_args(args).rooms
+
+    surface_count = room_count * SURFACES_PER_ROOM * (1 + FENS_PER_SURFACE)
+    print('%d rooms, %d surfaces and fenestration surfaces' %
+          (room_count, surface_count))
+    cases = (
+        ('dict', build_dicts, (traverse_dicts,)),
+        ('RoomModel', build_model, (traverse_views, traverse_arrays))
+    )
+    results = {}
+    for name, builder, traversers in cases:
+        results[name] = measure(builder, traversers, room_count)
+        build_time, traverse_times, memory = results[name]
+        print('%-10s build: %6.3f s  traverse: %s  memory per surface: %s' % (
+            name, build_time,
+            ' / '.join('%6.3f s' % t for t in traverse_times),
+            '%.0f bytes' % (float(memory) / surface_count) if memory else 'n/a'))
+
+    dict_memory, model_memory = results['dict'][2], results['RoomModel'][2]
+    if dict_memory and model_memory:
+        print('memory reduction: %.1fx' % (float(dict_memory) / model_memory))
+    print('traverse speedup using arrays: %.1fx' % (
+        results['dict'][1][0] / max(results['RoomModel'][1][1], 1e-9)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Compare batch projection of opening vertices with one ClosestPointTo per point.
+
+The benchmark creates a synthetic facade of rectangular wall faces in different
+directions with several windows each. The stand-in face calculates ClosestPointTo
+for one point at a time and returns a new point object similar to the Dynamo
+geometry kernel.
+
+The benchmark exits with an error if the batch projection deviates more than the
+tolerance from ClosestPointTo.
+
+Usage:
+    python benchmarks/projection_benchmark.py [options]
+    python benchmarks/projection_benchmark.py --walls 1000 --tolerance 0.01
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dynosaur import geometry  # noqa: E402
+
+WINDOWS_PER_WALL = 6
+VERTICES_PER_WINDOW = 8
+
+
+class Point(object):
+    """Stand-in for a Dynamo point."""
+
+    __slots__ = ('X', 'Y', 'Z')
+
+    def __init__(self, x, y, z):
+        self.X, self.Y, self.Z = x, y, z
+
+    def Dispose(self):
+        pass
+
+
+class Vertex(object):
+
+    __slots__ = ('PointGeometry',)
+
+    def __init__(self, point):
+        self.PointGeometry = point
+
+
+class RectangleFace(object):
+    """Stand-in for a rectangular Dynamo face."""
+
+    def __init__(self, origin, x_axis, y_axis):
+        self.origin, self.x_axis, self.y_axis = origin, x_axis, y_axis
+        corners = (origin, geometry.add(origin, x_axis),
+                   geometry.add(geometry.add(origin, x_axis), y_axis),
+                   geometry.add(origin, y_axis))
+        self.Vertices = tuple(Vertex(Point(*c)) for c in corners)
+
+    def point_at(self, u, v):
+        return tuple(o + u * a + v * b
+                     for o, a, b in zip(self.origin, self.x_axis, self.y_axis))
+
+    def ClosestPointTo(self, point):
+        vector = geometry.subtract(geometry.xyz(point), self.origin)
+        u = geometry.dot(vector, self.x_axis) / geometry.dot(self.x_axis, self.x_axis)
+        v = geometry.dot(vector, self.y_axis) / geometry.dot(self.y_axis, self.y_axis)
+        return Point(*self.point_at(min(max(u, 0), 1), min(max(v, 0), 1)))
+
+
+def create_facade(wall_count, seed=0):
+    """Create walls and window vertices slightly off the wall plane."""
+    rnd = random.Random(seed)
+    walls = []
+    for count in range(wall_count):
+        angle = rnd.uniform(0, 2 * math.pi)
+        x_axis = (6000 * math.cos(angle), 6000 * math.sin(angle), 0)
+        y_axis = (0, 0, 3000)
+        face = RectangleFace((rnd.uniform(0, 1e5), rnd.uniform(0, 1e5), 3000 * count),
+                             x_axis, y_axis)
+        normal = geometry.normalize(geometry.cross(x_axis, y_axis))
+        openings = []
+        for _ in range(WINDOWS_PER_WALL):
+            u, v = rnd.uniform(0.05, 0.8), rnd.uniform(0.05, 0.7)
+            offset = rnd.uniform(-200, 200)
+            opening = []
+            for i in range(VERTICES_PER_WINDOW):
+                a = 2 * math.pi * i / VERTICES_PER_WINDOW
+                pt = face.point_at(u + 0.05 * (1 + math.cos(a)),
+                                   v + 0.05 * (1 + math.sin(a)))
+                opening.append(Point(*(c + offset * n for c, n in zip(pt, normal))))
+            openings.append(opening)
+        walls.append((face, openings))
+    return walls
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--walls', type=int, default=250,
+                        help='Number of walls (%d windows with %d vertices each).' % (
+                            WINDOWS_PER_WALL, VERTICES_PER_WINDOW))
+    parser.add_argument('--tolerance', type=float, default=0.001,
+                        help='Maximum deviation from ClosestPointTo.')
+    options = parser.parse_args(args)
+    wall_count, tolerance = options.walls, options.tolerance
+
+    walls = create_facade(wall_count)
+    point_count = wall_count * WINDOWS_PER_WALL * VERTICES_PER_WINDOW
+    print('%d walls, %d opening vertices' % (wall_count, point_count))
+
+    start = time.time()
+    reference = [
+        [tuple(geometry.xyz(face.ClosestPointTo(pt)) for pt in opening)
+         for opening in openings]
+        for face, openings in walls
+    ]
+    per_point_time = time.time() - start
+
+    start = time.time()
+    projected = []
+    fallback_count = 0
+    for face, openings in walls:
+        projector = geometry.FaceProjector(face, tolerance)
+        projected.append([projector.project(opening) for opening in openings])
+        fallback_count += projector.fallback_count
+    batch_time = time.time() - start
+
+    deviation = max(
+        geometry.length(geometry.subtract(a, b))
+        for ref_wall, prj_wall in zip(reference, projected)
+        for ref_opening, prj_opening in zip(ref_wall, prj_wall)
+        for a, b in zip(ref_opening, prj_opening)
+    )
+    print('ClosestPointTo: %.3f s (%.0f points/s)' % (
+        per_point_time, point_count / per_point_time))
+    print('batch:          %.3f s (%.0f points/s)' % (
+        batch_time, point_count / batch_time))
+    print('fallback points: %d' % fallback_count)
+    print('maximum deviation: %g' % deviation)
+    if deviation > tolerance:
+        print('batch projection deviates more than %g' % tolerance)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
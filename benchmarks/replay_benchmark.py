@@ -0,0 +1,65 @@
+"""Measure the time for replaying a recording against a live run of create_rooms.
+
+The benchmark creates a synthetic building with the fake backend (see
+dynosaur.fakerevit), records the raw rooms in create_rooms and replays the
+recording with replay_rooms. The time for reading the recording is included in the
+replay time.
+
+The benchmark exits with an error if the replayed rooms don't have the same number
+of surfaces, fenestration surfaces and adjacent pairs as the live run.
+
+Usage:
+    python benchmarks/replay_benchmark.py [options]
+    python benchmarks/replay_benchmark.py --rooms 5000 --workers 4
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dynosaur import backend  # noqa: E402
+backend.set_backend('fake')
+from dynosaur import fakerevit  # noqa: E402
+from dynosaur import dynosaur  # noqa: E402
+from sharding_benchmark import summary  # noqa: E402
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rooms', type=int, default=2000,
+                        help='Number of rooms in the building.')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of workers for processing the rooms.')
+    options = parser.parse_args(args)
+
+    doc = fakerevit.create_building(options.rooms, curtain_wall_share=0.3)
+    folder = tempfile.mkdtemp()
+    try:
+        path = os.path.join(folder, 'building.dynr')
+        start = time.time()
+        expected = summary(dynosaur.create_rooms(
+            doc.rooms, workers=options.workers, record=path)[0])
+        live_time = time.time() - start
+        start = time.time()
+        result = summary(dynosaur.replay_rooms(path, workers=options.workers)[0])
+        replay_time = time.time() - start
+        size = os.path.getsize(path)
+    finally:
+        shutil.rmtree(folder)
+
+    print('%d rooms, %d surfaces, %d fenestration surfaces, %d adjacent pairs' %
+          expected)
+    print('create_rooms  %7.2f s  recording %.1f MB' % (live_time, size / 1e6))
+    print('replay_rooms  %7.2f s  %.1f times faster' % (
+        replay_time, live_time / replay_time))
+    if result != expected:
+        print('different result: %s' % (result,))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Measure how create_rooms_sharded scales with the number of workers.
+
+The benchmark creates a synthetic building with the fake backend (see
+dynosaur.fakerevit) and runs create_rooms once and create_rooms_sharded for each
+number of workers. Rooms are extracted on the main thread and the shards are
+processed in worker processes so the speedup depends on the number of cores and on
+the share of the time that is spent in extracting the rooms.
+
+The benchmark exits with an error if the sharded rooms don't have the same number
+of surfaces, fenestration surfaces and adjacent pairs as create_rooms.
+
+Usage:
+    python benchmarks/sharding_benchmark.py [options]
+    python benchmarks/sharding_benchmark.py --rooms 5000 --workers 1 2 4 8 --by grid
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dynosaur import backend  # noqa: E402
+backend.set_backend('fake')
+from dynosaur import fakerevit  # noqa: E402
+from dynosaur import dynosaur  # noqa: E402
+from dynosaur import sharding  # noqa: E402
+
+
+def summary(model):
+    """Number of rooms, surfaces, fenestration surfaces and adjacent pairs."""
+    pairs = sum(1 for a in model.surface_adjacents if a != -1) // 2
+    return len(model), model.surface_count, model.fen_surface_count, pairs
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rooms', type=int, default=2000,
+                        help='Number of rooms in the building.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4],
+                        help='Number of workers for each run.')
+    parser.add_argument('--by', default=sharding.LEVEL,
+                        choices=(sharding.LEVEL, sharding.GRID),
+                        help='Split the rooms by level or by a grid.')
+    parser.add_argument('--cell-size', type=float, default=None,
+                        help='Size of the grid cells in internal units.')
+    options = parser.parse_args(args)
+
+    doc = fakerevit.create_building(options.rooms, curtain_wall_share=0.3)
+    start = time.time()
+    expected = summary(dynosaur.create_rooms(doc.rooms)[0])
+    base_time = time.time() - start
+    print('create_rooms        %7.2f s  %d rooms, %d surfaces, %d fenestration '
+          'surfaces, %d adjacent pairs' % ((base_time,) + expected))
+
+    failed = []
+    for workers in options.workers:
+        start = time.time()
+        rooms = sharding.create_rooms_sharded(
+            doc.rooms, options.by, options.cell_size, workers)[0]
+        duration = time.time() - start
+        result = summary(rooms)
+        print('%2d workers          %7.2f s  speedup %.2f%s' % (
+            workers, duration, base_time / duration,
+            '' if result == expected else '  different result: %s' % (result,)))
+        if result != expected:
+            failed.append(workers)
+    if failed:
+        print('different result for workers: %s' % ', '.join(map(str, failed)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
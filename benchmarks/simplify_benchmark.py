@@ -0,0 +1,87 @@
+"""Measure simplifying the output of create_rooms.
+
+The benchmark creates a synthetic building with the fake backend (see
+dynosaur.fakerevit) and adds a vertex in the middle of the first edge of each face
+of every other room. The extra vertices keep these faces from matching the faces of
+the neighbouring rooms. The building is created with create_rooms with and without
+simplify.
+
+The benchmark exits with an error if create_rooms(simplify=True) doesn't remove all
+the extra vertices or doesn't find the same surfaces, fenestration surfaces and
+adjacent pairs as the building without the extra vertices.
+
+Usage:
+    python benchmarks/simplify_benchmark.py [options]
+    python benchmarks/simplify_benchmark.py --rooms 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dynosaur import backend  # noqa: E402
+backend.set_backend('fake')
+from dynosaur import fakerevit  # noqa: E402
+from dynosaur import dynosaur  # noqa: E402
+from dynosaur import geometry  # noqa: E402
+from dynosaur.instrumentation import Report  # noqa: E402
+from sharding_benchmark import summary  # noqa: E402
+
+
+def add_collinear_vertices(rooms):
+    """Add a vertex in the middle of the first edge of each face of every other room.
+
+    Returns:
+        Number of added vertices.
+    """
+    count = 0
+    for revit_room in rooms[::2]:
+        faces = []
+        for face in revit_room.faces:
+            start, end = face.boundary[0], face.boundary[1]
+            middle = tuple(v / 2.0 for v in geometry.add(start, end))
+            faces.append(fakerevit.Face(
+                face.boundary[:1] + (middle,) + face.boundary[1:], face.holes,
+                face.hosts))
+            count += 1
+        revit_room.faces = faces
+    return count
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rooms', type=int, default=2000,
+                        help='Number of rooms in the building.')
+    options = parser.parse_args(args)
+
+    expected = summary(dynosaur.create_rooms(fakerevit.create_building(
+        options.rooms, curtain_wall_share=0.3).rooms)[0])
+    print('without extra vertices   %d rooms, %d surfaces, %d fenestration '
+          'surfaces, %d adjacent pairs' % expected)
+
+    doc = fakerevit.create_building(options.rooms, curtain_wall_share=0.3)
+    added = add_collinear_vertices(doc.rooms)
+    print('not simplified           %d rooms, %d surfaces, %d fenestration '
+          'surfaces, %d adjacent pairs' % summary(
+              dynosaur.create_rooms(doc.rooms)[0]))
+
+    report = Report()
+    start = time.time()
+    rooms, _, log = dynosaur.create_rooms(doc.rooms, simplify=True, report=report)
+    duration = time.time() - start
+    result = summary(rooms)
+    removed = report.counters['removed_vertices']
+    print('simplified               %d rooms, %d surfaces, %d fenestration '
+          'surfaces, %d adjacent pairs' % result)
+    print('%.2f s  %.3f s simplification  %d of %d extra vertices removed' % (
+        duration, report.stage_time('simplification'), removed, added))
+    print(log[0])
+    if result != expected or removed != added:
+        print('different result')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""Measure the time for validating a RoomModel.
+
+The benchmark uses the box rooms of writer_benchmark with a window in each wall and
+validates the whole model. The model doesn't have any issues so every check runs to
+the end for every polygon.
+
+The benchmark exits with an error if validating the model takes longer than the
+target.
+
+Usage:
+    python benchmarks/validation_benchmark.py [options]
+    python benchmarks/validation_benchmark.py --rooms 8500 --target 5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dynosaur import validation  # noqa: E402
+from writer_benchmark import build_model  # noqa: E402
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rooms', type=int, default=8500,
+                        help='Number of rooms in the model (6 surfaces each).')
+    parser.add_argument('--target', type=float, default=5,
+                        help='Maximum time for validating the model in seconds.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of runs. The best run is used.')
+    options = parser.parse_args(args)
+
+    model = build_model(options.rooms)
+    duration = None
+    for _ in range(options.repeat):
+        start = time.time()
+        result = validation.validate_model(model)
+        run_time = time.time() - start
+        duration = run_time if duration is None else min(duration, run_time)
+    print('%d surfaces, %d fenestration surfaces, %d issues' % (
+        model.surface_count, model.fen_surface_count, len(result)))
+    print('%.3f s  %.0f polygons/s' % (
+        duration, (model.surface_count + model.fen_surface_count) / duration))
+    if duration > options.target:
+        print('slower than %.1f s' % options.target)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
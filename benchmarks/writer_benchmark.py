@@ -0,0 +1,145 @@
+"""Measure the throughput of the streaming IDF and gbXML writers.
+
+The benchmark builds a synthetic RoomModel of box rooms with a window in each wall.
+Neighbouring rooms share a wall so the model has adjacent surfaces. Each writer
+writes the whole model and the benchmark reports the surfaces and fenestration
+surfaces of the model per second. gbXML writes adjacent surfaces once so it writes
+fewer elements than there are surfaces. The peak memory of the writer is measured in
+a separate run using tracemalloc and should not depend on the size of the model.
+tracemalloc is not available in IronPython.
+
+The benchmark exits with an error if any writer is slower than the target. The time
+is the best of a few runs to reduce the noise from other processes. Each writer
+writes the model until the runs take MIN_TIME seconds in total. The default
+target is 80000 surfaces/s. The gbXML writer writes 85000 to 115000 surfaces/s of
+the default model on a busy single CPU machine (about 150000 with --rooms 500, the
+coordinates of smaller buildings are shorter) and the target leaves room for the
+noise of such machines. The target is 60000 surfaces/s on Python 2 because
+formatting floats into unicode text is slower there (the gbXML writer reaches about
+75000).
+
+Usage:
+    python benchmarks/writer_benchmark.py [options]
+    python benchmarks/writer_benchmark.py --rooms 50000 --target 100000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    # IronPython and Python 2
+    tracemalloc = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dynosaur import objects, writers  # noqa: E402
+
+# minimum surfaces per second for each writer
+TARGET = 80000 if sys.version_info[0] > 2 else 60000
+
+# minimum time of all the runs of a writer in seconds
+MIN_TIME = 5.0
+
+ROOM_SIZE = 5.0
+HEIGHT = 3.0
+
+
+def build_model(room_count):
+    """Build a row of box rooms with a window in each wall."""
+    model = objects.RoomModel()
+    s, h = ROOM_SIZE, HEIGHT
+    east_wall = None
+    for r in range(room_count):
+        room = model.add_room('room_%d' % r)
+        x = r * s
+        corners = ((x, 0), (x + s, 0), (x + s, s), (x, s))
+        for w in range(4):
+            (x0, y0), (x1, y1) = corners[w], corners[(w + 1) % 4]
+            wall = room.add_surface(
+                'wall_%d_%d' % (r, w),
+                ((x0, y0, 0), (x1, y1, 0), (x1, y1, h), (x0, y0, h)), r)
+            if w == 3 and east_wall is not None:
+                # the west wall is the east wall of the previous room
+                model.set_adjacent_surfaces(wall.index, east_wall)
+                continue
+            if w == 1:
+                east_wall = wall.index
+            dx, dy = (x1 - x0) / 4.0, (y1 - y0) / 4.0
+            wall.add_fen_surface(
+                'window_%d_%d' % (r, w),
+                ((x0 + dx, y0 + dy, 1), (x1 - dx, y1 - dy, 1),
+                 (x1 - dx, y1 - dy, 2), (x0 + dx, y0 + dy, 2)))
+        room.add_surface('floor_%d' % r, tuple(
+            (cx, cy, 0) for cx, cy in reversed(corners)))
+        room.add_surface('roof_%d' % r, tuple((cx, cy, h) for cx, cy in corners))
+    # build the indices of the model before measuring the memory of the writers
+    model.room_surfaces(0)
+    model.surface_fen_surfaces(0)
+    return model
+
+
+def measure(model, extension, folder, repeat):
+    """Write the model and return (seconds, surfaces, file size, peak memory).
+
+    The time is the best of at least repeat runs (see MIN_TIME).
+    """
+    path = os.path.join(folder, 'model' + extension)
+    memory = None
+    if tracemalloc:
+        tracemalloc.start()
+        writers.write_rooms(model, path)
+        memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    duration = None
+    runs, total_time = 0, 0.0
+    while runs < repeat or total_time < MIN_TIME:
+        start = time.time()
+        writers.write_rooms(model, path)
+        run_time = time.time() - start
+        runs += 1
+        total_time += run_time
+        duration = run_time if duration is None else min(duration, run_time)
+    count = len(model.surface_names) + len(model.fen_names)
+    return duration, count, os.path.getsize(path), memory
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rooms', type=int, default=20000,
+                        help='Number of rooms in the model.')
+    parser.add_argument('--target', type=float, default=TARGET,
+                        help='Minimum surfaces per second for each writer '
+                        '(default: %d).' % TARGET)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of runs for each writer. The best run is used.')
+    options = parser.parse_args(args)
+
+    model = build_model(options.rooms)
+    print('%d rooms, %d surfaces, %d fenestration surfaces' % (
+        len(model.room_names), len(model.surface_names), len(model.fen_names)))
+    folder = tempfile.mkdtemp()
+    failed = []
+    try:
+        for extension in ('.idf', '.xml'):
+            duration, count, size, memory = measure(model, extension, folder,
+                                                    options.repeat)
+            rate = count / max(duration, 1e-9)
+            print('%-5s %6.3f s  %9.0f surfaces/s  %6.1f MB  peak memory: %s' % (
+                extension, duration, rate, size / 1e6,
+                '%.1f MB' % (memory / 1e6) if memory else 'n/a'))
+            if rate < options.target:
+                failed.append(extension)
+    finally:
+        shutil.rmtree(folder)
+    if failed:
+        print('slower than %.0f surfaces/s: %s' % (options.target, ', '.join(failed)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
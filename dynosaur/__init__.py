@@ -1 +1,12 @@
-"""dynosaur for dynamo!"""
+"""dynosaur for dynamo!
+
+Most of dynosaur is pure Python and imports without Revit or Dynamo. The data model
+(objects), the geometry math (geometry, adjacency, simplify), the model files and
+the writers (modelfile, writers), the caches and the instrumentation can be used
+in CPython to post-process the rooms. Recorded runs (recording) can be replayed
+without Revit with dynosaur.replay_rooms.
+
+Revit and Dynamo are only loaded the first time a backend function is called (see
+dynosaur.backend). dynosaur.revitapi is the only module that imports clr. Keep it
+that way and check the import time with benchmarks/import_benchmark.py.
+"""
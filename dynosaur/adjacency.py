@@ -0,0 +1,188 @@
+"""Find duplicated and adjacent surfaces in a RoomModel.
+
+Vertices of each polygon are snapped to a grid with the size of the tolerance and
+the sorted set of the snapped vertices is used as a key for the polygon. Surfaces
+with the same key have the same geometry regardless of the order and the start
+point of their vertices so duplicated and adjacent surfaces can be found using a
+dictionary instead of comparing every two surfaces.
+
+Vertices that are closer than tolerance to each other can still end up in different
+cells if they are on two sides of a grid line. set_adjacent_surfaces compares the
+surfaces that are not matched by their keys to the surfaces in the neighbouring
+cells of the minimum corner of their bounding box.
+"""
+import collections
+import math
+
+DEFAULT_TOLERANCE = 0.01
+
+# offsets of a cell and its neighbouring cells
+_NEIGHBOURS = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+               for dz in (-1, 0, 1)]
+
+
+def polygon_key(vertices, tolerance=None):
+    """Get a key for a polygon which doesn't depend on the order of vertices.
+
+    Args:
+        vertices: A flat list of x, y, z values.
+        tolerance: Size of the grid that vertices will be snapped to.
+    """
+    tolerance = tolerance or DEFAULT_TOLERANCE
+    snapped = [int(round(v / tolerance)) for v in vertices]
+    return tuple(sorted(set(zip(snapped[0::3], snapped[1::3], snapped[2::3]))))
+
+
+def _polygon_keys(model, polygon_indices, tolerance):
+    offsets, vertices = model.polygon_offsets, model.vertices
+    return [polygon_key(vertices[3 * offsets[i]:3 * offsets[i + 1]], tolerance)
+            for i in polygon_indices]
+
+
+def remove_duplicate_surfaces(model, tolerance=None):
+    """Remove surfaces that are duplicated in the same room.
+
+    The first surface is kept and fenestration surfaces of the duplicated surfaces
+    are moved to it unless the same fenestration surface already exists.
+
+    Returns:
+        Number of removed surfaces.
+    """
+    surface_keys = _polygon_keys(model, model.surface_polygons, tolerance)
+    fen_keys = _polygon_keys(model, model.fen_polygons, tolerance)
+
+    kept = {}
+    duplicates = {}
+    for index, key in enumerate(surface_keys):
+        room_key = model.surface_rooms[index], key
+        if room_key in kept:
+            duplicates[index] = kept[room_key]
+        else:
+            kept[room_key] = index
+
+    if not duplicates:
+        return 0
+
+    kept_fens = set(
+        (model.fen_surfaces[i], key) for i, key in enumerate(fen_keys)
+        if model.fen_surfaces[i] not in duplicates
+    )
+    for fen_index, key in enumerate(fen_keys):
+        surface = duplicates.get(model.fen_surfaces[fen_index])
+        if surface is None or (surface, key) in kept_fens:
+            continue
+        kept_fens.add((surface, key))
+        model.set_fen_surface_parent(fen_index, surface)
+
+    model.remove_surfaces(duplicates)
+    return len(duplicates)
+
+
+def set_adjacent_surfaces(model, tolerance=None, surfaces=None):
+    """Find surfaces in different rooms with the same host element and geometry.
+
+    Adjacent surfaces will be set for both surfaces in the model. Surfaces that
+    already have an adjacent surface are not changed. Surfaces that don't have the
+    same polygon key are matched if every vertex of each surface is within
+    tolerance of a vertex of the other surface in x, y and z.
+
+    Args:
+        model: A RoomModel.
+        tolerance: Size of the grid for matching the vertices
+            (Default: DEFAULT_TOLERANCE).
+        surfaces: Optional indices of the surfaces to match. By default all the
+            surfaces are matched.
+
+    Returns:
+        Number of adjacent pairs.
+    """
+    hosts, adjacents = model.surface_hosts, model.surface_adjacents
+    if surfaces is None:
+        surfaces = range(model.surface_count)
+    surfaces = [i for i in surfaces if hosts[i] is not None and adjacents[i] == -1]
+    surface_keys = _polygon_keys(
+        model, [model.surface_polygons[i] for i in surfaces], tolerance)
+    # find surfaces with the same host and geometry
+    groups = {}
+    for index, key in zip(surfaces, surface_keys):
+        groups.setdefault((hosts[index], key), []).append(index)
+
+    rooms = model.surface_rooms
+    count = 0
+    for indices in groups.values():
+        pending = collections.deque(indices)
+        while len(pending) > 1:
+            surface = pending.popleft()
+            # surfaces of the same room are kept for the next surfaces
+            skipped = []
+            while pending and rooms[pending[0]] == rooms[surface]:
+                skipped.append(pending.popleft())
+            if not pending:
+                # the rest of the surfaces are in the same room
+                break
+            model.set_adjacent_surfaces(surface, pending.popleft())
+            count += 1
+            pending.extendleft(reversed(skipped))
+
+    return count + _set_near_adjacent_surfaces(
+        model, [i for i in surfaces if adjacents[i] == -1],
+        tolerance or DEFAULT_TOLERANCE)
+
+
+def _polygon_points(model, polygon):
+    offsets, vertices = model.polygon_offsets, model.vertices
+    values = vertices[3 * offsets[polygon]:3 * offsets[polygon + 1]]
+    return list(zip(values[0::3], values[1::3], values[2::3]))
+
+
+def _is_covered(points, other, tolerance):
+    """Check if every point is within tolerance of a point of the other polygon."""
+    for x, y, z in points:
+        for ox, oy, oz in other:
+            if abs(x - ox) <= tolerance and abs(y - oy) <= tolerance and \
+                    abs(z - oz) <= tolerance:
+                break
+        else:
+            return False
+    return True
+
+
+def _set_near_adjacent_surfaces(model, surfaces, tolerance):
+    """Match the surfaces with vertices on two sides of a grid line.
+
+    Minimum corners of the bounding box of two matching polygons are within
+    tolerance so they are in the same or in the neighbouring cells.
+
+    Returns:
+        Number of adjacent pairs.
+    """
+    hosts, rooms = model.surface_hosts, model.surface_rooms
+    adjacents = model.surface_adjacents
+    # (host, x, y, z): surfaces in the cell that are not matched yet
+    cells = {}
+    points = {}
+
+    def _find_match(surface, surface_points, cell):
+        host, (x, y, z) = hosts[surface], cell
+        for dx, dy, dz in _NEIGHBOURS:
+            for other in cells.get((host, x + dx, y + dy, z + dz), ()):
+                if adjacents[other] == -1 and rooms[other] != rooms[surface] and \
+                        _is_covered(surface_points, points[other], tolerance) and \
+                        _is_covered(points[other], surface_points, tolerance):
+                    return other
+
+    count = 0
+    for surface in surfaces:
+        surface_points = _polygon_points(model, model.surface_polygons[surface])
+        if not surface_points:
+            continue
+        cell = tuple(int(math.floor(min(values) / tolerance))
+                     for values in zip(*surface_points))
+        match = _find_match(surface, surface_points, cell)
+        if match is None:
+            points[surface] = surface_points
+            cells.setdefault((hosts[surface],) + cell, []).append(surface)
+        else:
+            model.set_adjacent_surfaces(surface, match)
+            count += 1
+    return count
@@ -0,0 +1,75 @@
+"""Backend for the Revit and Dynamo calls that are not methods of an object.
+
+dynosaur modules don't import clr. The calls that need a Revit or Dynamo import are
+sent to the current backend instead. A backend is a module with these functions:
+
+    current_document(): The current Revit document.
+    collect_elements(document, categories, family_instances_only=False,
+        level_id=None, phase_id=None, placed_only=False, bounding_box=None,
+        family_name=None): Iterate over elements of one or several categories.
+        categories is a BuiltInCategory name without the OST_ prefix (e.g. 'Rooms')
+        or a list of names. See collector.collect_elements for the filters.
+    category_name(element): BuiltInCategory name of an element without OST_.
+    to_ds_type(element): Wrap a Revit element as a Dynamo element (ToDSType).
+    element_id(value): Create an ElementId from its integer value.
+    boundary_location(index): SpatialElementBoundaryLocation for 0 (Finish) and 1
+        (Center).
+    spatial_element_geometry_calculator(document, boundary_location): Create a
+        SpatialElementGeometryCalculator. boundary_location is 0 or 1.
+    geometry_options(): Create geometry Options.
+    to_solid(geometry_object): Convert a geometry object to a Solid.
+    to_proto_type(geometry): Convert a Revit geometry to Dynamo (ToProtoType).
+    length_unit_scale(document): Scale from Revit internal units to display units.
+    point_by_coordinates(x, y, z): Create a Dynamo point.
+    surface_by_perimeter_points(points): Create a Dynamo surface.
+    short_curve_tolerance(document): Shortest curve length in Revit internal units.
+
+Everything else is called on the objects themselves (e.g. GetBoundaryFaceInfo,
+FindInserts, ClosestPointTo and DistanceTo) and a backend should return objects that
+support the same members as the Revit and Dynamo objects.
+
+Available backends:
+    revit: Revit API and Dynamo geometry (dynosaur.revitapi). This is the default.
+    fake: A pure Python stand-in document with synthetic buildings for running
+        dynosaur outside Revit (dynosaur.fakerevit).
+
+Set DYNOSAUR_BACKEND environment variable or use set_backend to change the backend.
+"""
+import importlib
+import os
+
+BACKENDS = {
+    'revit': 'revitapi',
+    'fake': 'fakerevit'
+}
+
+_backend = None
+
+
+def set_backend(backend):
+    """Set the backend for dynosaur.
+
+    Args:
+        backend: Name of a backend (revit, fake) or a backend module.
+
+    Returns:
+        The backend module.
+    """
+    global _backend
+    if isinstance(backend, str):
+        try:
+            module_name = BACKENDS[backend]
+        except KeyError:
+            raise ValueError(
+                '{} is not a valid backend. Valid backends are: {}'.format(
+                    backend, ', '.join(sorted(BACKENDS))))
+        backend = importlib.import_module('.' + module_name, __package__)
+    _backend = backend
+    return _backend
+
+
+def get_backend():
+    """Get the current backend. The backend is loaded the first time it is used."""
+    if _backend is None:
+        set_backend(os.environ.get('DYNOSAUR_BACKEND', 'revit'))
+    return _backend
@@ -0,0 +1,347 @@
+"""Persistent cache for the rooms of an export.
+
+Creating a room is expensive and most rooms don't change between two runs of the
+same model. RoomCache stores the finished rooms on disk and create_rooms only
+recreates the rooms that have changed since the last run.
+
+    rooms, elements, log = create_rooms(revit_rooms, cache='C:/temp/model.cache')
+
+A cached room is used if the fingerprint of the room hasn't changed. The fingerprint
+is calculated from the Revit room (id, bounding box, area, perimeter and volume)
+and the elements that were used to create the room in the last run (bounding box,
+inserts and curtain panels for each element). A new window in a wall, a moved
+window or a moved wall changes the fingerprint.
+
+The whole cache is invalidated if the cache version, the document or the export
+settings (boundary location and tolerance) change. Rooms that are not used for
+more than max_rooms rooms are evicted first.
+"""
+from collections import OrderedDict
+import json
+import os
+
+from . import objects
+from .util import element_id_value
+from .backend import get_backend
+
+CACHE_VERSION = 1
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+
+def _bounding_box(element):
+    """Bounding box of an element as a tuple of 6 rounded values or None."""
+    try:
+        bbox = element.get_BoundingBox(None)
+    except Exception:
+        return None
+    if bbox is None:
+        return None
+    return tuple(round(v, 6) for pt in (bbox.Min, bbox.Max) for v in (pt.X, pt.Y, pt.Z))
+
+
+def _element_values(element):
+    """Values for the fingerprint of a boundary or a child element."""
+    values = [_bounding_box(element)]
+    try:
+        inserts = element.FindInserts(True, False, True, True)
+    except AttributeError:
+        pass
+    else:
+        values.append(sorted(i.IntegerValue for i in inserts))
+    grid = getattr(element, 'CurtainGrid', None)
+    if grid:
+        values.append(sorted(i.IntegerValue for i in grid.GetPanelIds()))
+    return values
+
+
+def fingerprint(revit_room, element_ids=()):
+    """Calculate a fingerprint for a Revit room and the elements around it.
+
+    Args:
+        revit_room: A Revit room.
+        element_ids: Integer ids for the elements that are used to create the room.
+
+    Returns:
+        The fingerprint as a hex string.
+    """
+    doc = revit_room.Document
+    backend = get_backend()
+    values = [revit_room.Id.IntegerValue, _bounding_box(revit_room)]
+    for name in ('Area', 'Perimeter', 'Volume'):
+        value = getattr(revit_room, name, None)
+        values.append(round(value, 6) if isinstance(value, float) else value)
+    for element_id in sorted(set(element_ids)):
+        element = doc.GetElement(backend.element_id(element_id))
+        values.append((element_id, _element_values(element) if element else None))
+    # hashlib loads OpenSSL and is only imported once a room is checked
+    import hashlib
+    return hashlib.md5(repr(values).encode('utf-8')).hexdigest()
+
+
+def _encode_elements(elements):
+    encoded = []
+    for element in elements:
+        value = element_id_value(element)
+        if value is None:
+            encoded.append(None)
+        elif hasattr(element, 'InternalElement'):
+            encoded.append(['dynamo', value])
+        else:
+            encoded.append(['revit', value])
+    return encoded
+
+
+def _decode_elements(doc, encoded):
+    """Get the elements from the document.
+
+    Raises KeyError if any of the elements is not in the document anymore.
+    """
+    backend = get_backend()
+    elements = []
+    for item in encoded:
+        if item is None:
+            elements.append(None)
+            continue
+        kind, value = item
+        element = doc.GetElement(backend.element_id(value))
+        if element is None:
+            raise KeyError(value)
+        elements.append(backend.to_ds_type(element) if kind == 'dynamo' else element)
+    return elements
+
+
+def _encode_name(name, room_id, element_indices):
+    """Encode a room, surface or fenestration surface name.
+
+    Names can be a string, the id of the room, an element or an element id.
+    """
+    if isinstance(name, string_types):
+        return ['text', name]
+    if name == room_id:
+        return ['room']
+    if id(name) in element_indices:
+        return ['element', element_indices[id(name)]]
+    value = getattr(name, 'IntegerValue', None)
+    if value is not None:
+        return ['element_id', value]
+    return ['text', str(name)]
+
+
+def _decode_name(encoded, room_id, elements):
+    kind = encoded[0]
+    if kind == 'text':
+        return encoded[1]
+    if kind == 'room':
+        return room_id
+    if kind == 'element':
+        return elements[encoded[1]]
+    return get_backend().element_id(encoded[1])
+
+
+def _polygon_values(model, polygon):
+    return list(model.vertices[3 * model.polygon_offsets[polygon]:
+                               3 * model.polygon_offsets[polygon + 1]])
+
+
+def _points(values):
+    return tuple(zip(values[0::3], values[1::3], values[2::3]))
+
+
+def room_record(room, elements, log, room_id):
+    """Create a cache record for a room.
+
+    Args:
+        room: A room in its own RoomModel (see dynosaur.iter_rooms).
+        elements: List of the elements for the room.
+        log: List of messages for the room.
+        room_id: Id of the Revit room.
+    """
+    model = room.model
+    element_indices = dict((id(el), count) for count, el in enumerate(elements))
+    element_ids = set(element_id_value(el) for el in elements)
+    element_ids.update(h for h in model.surface_hosts if h is not None)
+    element_ids.discard(None)
+    return {
+        'name': _encode_name(room['name'], room_id, element_indices),
+        'surfaces': [
+            [_encode_name(name, room_id, element_indices), host,
+             _polygon_values(model, polygon)]
+            for name, host, polygon in zip(model.surface_names, model.surface_hosts,
+                                           model.surface_polygons)
+        ],
+        'fen_surfaces': [
+            [_encode_name(name, room_id, element_indices), surface,
+             _polygon_values(model, polygon)]
+            for name, surface, polygon in zip(model.fen_names, model.fen_surfaces,
+                                              model.fen_polygons)
+        ],
+        'elements': _encode_elements(elements),
+        'element_ids': sorted(element_ids),
+        'log': list(log)
+    }
+
+
+def load_room_record(record, revit_room):
+    """Recreate a room from a cache record.
+
+    Returns:
+        A tuple of (room, elements, log) similar to dynosaur.iter_rooms.
+
+    Raises KeyError if any of the elements is not in the document anymore.
+    """
+    room_id = revit_room.Id
+    elements = _decode_elements(revit_room.Document, record['elements'])
+    model = objects.RoomModel()
+    room = model.add_room(_decode_name(record['name'], room_id, elements))
+    for name, host, values in record['surfaces']:
+        model.add_surface(room, _decode_name(name, room_id, elements),
+                          _points(values), host)
+    for name, surface, values in record['fen_surfaces']:
+        model.add_fen_surface(surface, _decode_name(name, room_id, elements),
+                              _points(values))
+    return room, elements, list(record['log'])
+
+
+class RoomCache(object):
+    """On-disk cache for rooms.
+
+    The cache is loaded when it is created and is written to disk in save. Writing
+    is done to a temporary file first so an interrupted run can't leave a broken
+    cache. A cache file that can't be read is ignored.
+
+    Args:
+        path: Path to the cache file.
+        max_rooms: Maximum number of rooms in the cache. Least recently used rooms
+            are removed first (Default: 20000).
+    """
+
+    def __init__(self, path, max_rooms=20000):
+        self.path = path
+        self.max_rooms = max_rooms
+        self.settings = None
+        self.hits = 0
+        self.misses = 0
+        self._rooms = OrderedDict()
+        self._is_changed = False
+        self._load()
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data['version'] != CACHE_VERSION:
+                return
+            self.settings = data['settings']
+            self._rooms = OrderedDict((key, record) for key, record in data['rooms'])
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            self.settings = None
+            self._rooms = OrderedDict()
+
+    def __len__(self):
+        return len(self._rooms)
+
+    def __contains__(self, room_id):
+        return str(room_id) in self._rooms
+
+    def set_settings(self, **settings):
+        """Set the document and export settings for the cache.
+
+        All the rooms are removed from the cache if the settings are different from
+        the settings of the cached rooms.
+        """
+        settings = json.loads(json.dumps(settings))
+        if settings != self.settings:
+            self.clear()
+            self.settings = settings
+            self._is_changed = True
+
+    def get(self, revit_room):
+        """Get a room from the cache.
+
+        Returns:
+            A tuple of (room, elements, log) or None if the room is not in the cache
+            or it has changed since it was cached.
+        """
+        key = str(revit_room.Id.IntegerValue)
+        record = self._rooms.get(key)
+        if record is not None and \
+                record['fingerprint'] == fingerprint(revit_room, record['element_ids']):
+            try:
+                room = load_room_record(record, revit_room)
+            except KeyError:
+                # an element is deleted
+                pass
+            else:
+                # move the room to the end of the cache
+                del self._rooms[key]
+                self._rooms[key] = record
+                self.hits += 1
+                return room
+        self.misses += 1
+        return None
+
+    def set(self, revit_room, room, elements, log):
+        """Add a room to the cache."""
+        record = room_record(room, elements, log, revit_room.Id)
+        record['fingerprint'] = fingerprint(revit_room, record['element_ids'])
+        key = str(revit_room.Id.IntegerValue)
+        self._rooms.pop(key, None)
+        self._rooms[key] = record
+        while len(self._rooms) > self.max_rooms:
+            self._rooms.popitem(last=False)
+        self._is_changed = True
+
+    def invalidate(self, room_ids):
+        """Remove rooms from the cache.
+
+        Args:
+            room_ids: Revit rooms, room ElementIds or integer ids.
+        """
+        for room_id in room_ids:
+            room_id = getattr(room_id, 'Id', room_id)
+            room_id = getattr(room_id, 'IntegerValue', room_id)
+            if self._rooms.pop(str(room_id), None) is not None:
+                self._is_changed = True
+
+    def clear(self):
+        """Remove all the rooms from the cache."""
+        if self._rooms:
+            self._rooms = OrderedDict()
+            self._is_changed = True
+
+    def save(self):
+        """Write the cache to disk if it has changed."""
+        if not self._is_changed:
+            return
+        data = {
+            'version': CACHE_VERSION,
+            'settings': self.settings,
+            'rooms': list(self._rooms.items())
+        }
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        if hasattr(os, 'replace'):
+            os.replace(temp_path, self.path)
+        else:
+            # IronPython 2.7
+            if os.path.isfile(self.path):
+                os.remove(self.path)
+            os.rename(temp_path, self.path)
+        self._is_changed = False
+
+    def __repr__(self):
+        return 'RoomCache: %s (%d rooms)' % (self.path, len(self._rooms))
+
+
+def get_cache(cache):
+    """Get a RoomCache for a path or return the input cache as is."""
+    if cache is None or isinstance(cache, RoomCache):
+        return cache
+    return RoomCache(cache)
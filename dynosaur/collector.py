@@ -1,50 +1,142 @@
-"""Functions to collect a certain type of object from Revit document."""
+"""Functions to collect a certain type of object from Revit document.
 
-import clr
-clr.AddReference("RevitAPI")
-from Autodesk.Revit.DB import FilteredElementCollector, BuiltInCategory, FamilyInstance
+collect_elements is lazy and only loads the elements that pass the filters. The
+filters are applied by the Revit FilteredElementCollector:
 
-clr.AddReference('RevitServices')
-import RevitServices
-from RevitServices.Persistence import DocumentManager
-# from RevitServices.Transactions import TransactionManager
+    level: Only the elements on a level.
+    phase: Only the elements in a phase.
+    placed_only: Only the rooms and spaces that are placed and bounded.
+    bounding_box: Only the elements that intersect a bounding box.
 
-# Add ToDSType method for curtain panels
-clr.AddReference('RevitNodes')
-import Revit
-clr.ImportExtensions(Revit.Elements)
+Use collect_by_category to collect several categories in one pass.
+"""
+from .backend import get_backend
 
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
 
-def collect_rooms():
-    """Collect all the rooms in the current Revit document."""
-    document = DocumentManager.Instance.CurrentDBDocument
-    collector = FilteredElementCollector(document)
-    collector.OfCategory(BuiltInCategory.OST_Rooms)
-    room_iter = collector.GetElementIdIterator()
-    room_iter.Reset()
-    return tuple(document.GetElement(el_id) for el_id in room_iter)
 
+def _element_id(element, document, category):
+    """Get the ElementId for an element, an ElementId, an integer id or a name."""
+    if element is None:
+        return None
+    backend = get_backend()
+    if isinstance(element, int):
+        return backend.element_id(element)
+    if isinstance(element, string_types):
+        for el in backend.collect_elements(document, category):
+            if el.Name == element:
+                return el.Id
+        raise ValueError('There is no element named %s in %s.' % (element, category))
+    return getattr(element, 'Id', element)
 
-def collect_spaces():
-    """Collect all the spaces in the current Revit document."""
-    document = DocumentManager.Instance.CurrentDBDocument
-    collector = FilteredElementCollector(document)
-    collector.OfCategory(BuiltInCategory.OST_MEPSpaces)
-    room_iter = collector.GetElementIdIterator()
-    room_iter.Reset()
-    return tuple(document.GetElement(el_id) for el_id in room_iter)
 
+def bounding_box(elements, margin=0):
+    """Get the bounding box of a list of elements.
 
-def collect_curtain_panels():
-    doc = DocumentManager.Instance.CurrentDBDocument
+    Args:
+        elements: Revit elements.
+        margin: A value to expand the bounding box in each direction.
 
-    collector = FilteredElementCollector(doc)
-    collector.OfCategory(BuiltInCategory.OST_CurtainWallPanels)
-    collector.OfClass(FamilyInstance)
+    Returns:
+        ((x, y, z), (x, y, z)) for the minimum and the maximum corners or None if
+        any of the elements doesn't have a bounding box.
+    """
+    min_pt = [float('inf')] * 3
+    max_pt = [float('-inf')] * 3
+    for element in elements:
+        bbox = element.get_BoundingBox(None)
+        if bbox is None:
+            return None
+        for i, axis in enumerate(('X', 'Y', 'Z')):
+            min_pt[i] = min(min_pt[i], getattr(bbox.Min, axis))
+            max_pt[i] = max(max_pt[i], getattr(bbox.Max, axis))
+    if min_pt[0] > max_pt[0]:
+        return None
+    return tuple(v - margin for v in min_pt), tuple(v + margin for v in max_pt)
 
-    cw_element_collector = collector.GetElementIdIterator()
-    cw_element_collector.Reset()
 
-    cw_collector = (doc.GetElement(cw_id) for cw_id in cw_element_collector)
-    return tuple(cw.ToDSType(True) for cw in cw_collector
-                 if cw.Symbol.Family.Name == 'System Panel')
+def collect_elements(categories, document=None, level=None, phase=None,
+                     placed_only=False, bounding_box=None,
+                     family_instances_only=False, family_name=None):
+    """Iterate over the elements of one or several categories.
+
+    Args:
+        categories: BuiltInCategory name without OST_ (e.g. Rooms, MEPSpaces) or a
+            list of names.
+        document: Revit document (Default: current document).
+        level: A Level, its ElementId, integer id or name.
+        phase: A Phase, its ElementId, integer id or name.
+        placed_only: Only collect the rooms and spaces that are placed and bounded.
+        bounding_box: ((x, y, z), (x, y, z)) in Revit internal units. Only collect
+            the elements that intersect the bounding box.
+        family_instances_only: Only collect FamilyInstance elements.
+        family_name: Only collect the instances of this family.
+
+    Returns:
+        A generator of Revit elements.
+    """
+    backend = get_backend()
+    document = document or backend.current_document()
+    return backend.collect_elements(
+        document, categories, family_instances_only,
+        _element_id(level, document, 'Levels'),
+        _element_id(phase, document, 'Phases'),
+        placed_only, bounding_box, family_name)
+
+
+def collect_by_category(categories, document=None, **filters):
+    """Collect several categories in one pass.
+
+    Args:
+        categories: A list of BuiltInCategory names without OST_.
+        document: Revit document (Default: current document).
+        filters: Filters for collect_elements.
+
+    Returns:
+        A dictionary of category name: tuple of elements.
+    """
+    backend = get_backend()
+    elements = dict((category, []) for category in categories)
+    for element in collect_elements(categories, document, **filters):
+        elements[backend.category_name(element)].append(element)
+    return dict((category, tuple(els)) for category, els in elements.items())
+
+
+def collect_rooms(document=None, **filters):
+    """Collect all the rooms in the current Revit document.
+
+    See collect_elements for filters (e.g. level, placed_only).
+    """
+    return tuple(collect_elements('Rooms', document, **filters))
+
+
+def collect_spaces(document=None, **filters):
+    """Collect all the spaces in the current Revit document.
+
+    See collect_elements for filters (e.g. level, placed_only).
+    """
+    return tuple(collect_elements('MEPSpaces', document, **filters))
+
+
+def iter_curtain_panels(document=None, **filters):
+    """Iterate over the system curtain panels as Dynamo elements.
+
+    Only the panels that pass the filters are wrapped as Dynamo elements. See
+    collect_elements for filters (e.g. bounding_box).
+    """
+    backend = get_backend()
+    panels = collect_elements('CurtainWallPanels', document,
+                              family_instances_only=True, family_name='System Panel',
+                              **filters)
+    return (backend.to_ds_type(cw) for cw in panels)
+
+
+def collect_curtain_panels(document=None, **filters):
+    """Collect all the system curtain panels in the current Revit document.
+
+    Panels are returned as Dynamo elements.
+    """
+    return tuple(iter_curtain_panels(document, **filters))
@@ -1,36 +1,200 @@
 """Functions to deal with Revit curtain wall and curtain panel elements."""
-import clr
-clr.AddReference("RevitNodes")
-from Revit import GeometryConversion
-# Import ToProtoType, ToRevitType geometry conversion extension methods
-clr.ImportExtensions(GeometryConversion)
+from . import geometry
+from .geometryscope import GeometryScope
+from .instrumentation import get_report
+from .backend import get_backend
 
 
-def extract_curtain_panel_vertices(curtain_panels, base_face, tol=None):
-    """Return lists of lists of vertices for a panel grid."""
+class CurtainPanelIndex(object):
+    """Spatial index for curtain panels.
+
+    Outer face, center point and vertices of each panel are calculated once and
+    the center points are bucketed in a uniform grid. Use this index to only check
+    the panels around a base face instead of all the panels in the document.
+
+    Args:
+        curtain_panels: Curtain panels as Dynamo elements (see
+            collector.collect_curtain_panels).
+        cell_size: Size of the grid cells. By default it is set to the median size
+            of the panels.
+        templates: An optional geometrytemplate.GeometryTemplateCache. The outer
+            face of the panels is calculated once for each panel type.
+
+    Center points are Dynamo points and are kept until the index is disposed. Use
+    Dispose once the index is not needed anymore.
+    """
+
+    def __init__(self, curtain_panels, cell_size=None, templates=None):
+        backend = get_backend()
+        # keeps the center points until the index is disposed
+        self._scope = GeometryScope()
+        self.panels = []
+        self.centers = []
+        # vertices as (x, y, z) values
+        self.loops = []
+        # center point coordinates as (x, y, z)
+        self._coordinates = []
+        sizes = []
+        for panel in curtain_panels:
+            if not panel:
+                continue
+            outer_faces = templates.outer_faces(panel.InternalElement) \
+                if templates is not None else None
+            if outer_faces is None:
+                with GeometryScope() as scope:
+                    faces = scope.track_all(panel.Faces)
+                    if not faces:
+                        continue
+                    outer_face = max(faces, key=lambda x: x.Area)
+                    points = scope.track_all(v.PointGeometry
+                                             for v in outer_face.Vertices)
+                    loop = tuple(geometry.xyz(pt) for pt in points)
+                    center = outer_face.PointAtParameter(0.5, 0.5)
+            else:
+                outer_faces = [f for f in outer_faces if f is not None]
+                if not outer_faces:
+                    continue
+                _, loop, center = max(outer_faces, key=lambda f: f[0])
+                center = backend.point_by_coordinates(*center)
+            self._scope.track(center)
+            self.panels.append(panel)
+            self.centers.append(center)
+            self.loops.append(loop)
+            self._coordinates.append(geometry.xyz(center))
+            if loop:
+                sizes.append(max(max(v[i] for v in loop) - min(v[i] for v in loop)
+                                 for i in range(3)))
+
+        if not cell_size:
+            sizes.sort()
+            cell_size = sizes[len(sizes) // 2] if sizes else 1.0
+        self.cell_size = cell_size or 1.0
+
+        self._grid = {}
+        for count, coordinate in enumerate(self._coordinates):
+            self._grid.setdefault(self._cell(coordinate), []).append(count)
+
+    def __len__(self):
+        return len(self.panels)
+
+    def Dispose(self):
+        """Dispose the center points of the panels."""
+        self._scope.dispose()
+
+    def _cell(self, coordinate):
+        return tuple(int(c // self.cell_size) for c in coordinate)
+
+    def candidates(self, min_pt, max_pt):
+        """Get sorted index of panels with a center point inside a bounding box.
+
+        Args:
+            min_pt: Minimum corner of the bounding box as (x, y, z).
+            max_pt: Maximum corner of the bounding box as (x, y, z).
+        """
+        min_cell = self._cell(min_pt)
+        max_cell = self._cell(max_pt)
+        cell_count = 1
+        for mn, mx in zip(min_cell, max_cell):
+            cell_count *= mx - mn + 1
+
+        if cell_count > len(self._grid):
+            # it is faster to check the occupied cells than visiting all the cells
+            cells = (
+                indices for cell, indices in self._grid.items()
+                if all(mn <= c <= mx for c, mn, mx in zip(cell, min_cell, max_cell))
+            )
+        else:
+            cells = (
+                self._grid.get((x, y, z), ())
+                for x in range(min_cell[0], max_cell[0] + 1)
+                for y in range(min_cell[1], max_cell[1] + 1)
+                for z in range(min_cell[2], max_cell[2] + 1)
+            )
+
+        return sorted(
+            i for indices in cells for i in indices
+            if all(mn <= c <= mx
+                   for c, mn, mx in zip(self._coordinates[i], min_pt, max_pt))
+        )
+
+    def near_face(self, base_face, tol):
+        """Get sorted index of panels with center point closer than tol to base_face."""
+        with GeometryScope() as scope:
+            bbox = scope.track(base_face.BoundingBox)
+            min_pt = tuple(c - tol for c in geometry.xyz(scope.track(bbox.MinPoint)))
+            max_pt = tuple(c + tol for c in geometry.xyz(scope.track(bbox.MaxPoint)))
+        return [i for i in self.candidates(min_pt, max_pt)
+                if base_face.DistanceTo(self.centers[i]) < tol]
+
+
+def find_curtain_panels(curtain_panels, base_face, tol=None):
+    """Find the curtain panels on a base face.
+
+    Args:
+        curtain_panels: A CurtainPanelIndex or a list of curtain panels.
+        base_face: Dynamo base face or a geometry.FaceProjector.
+        tol: Maximum distance between the center of the panel and base_face
+            (Default: 50).
+
+    Returns:
+        A tuple of panels and a tuple of their vertices as (x, y, z) values. The
+        vertices are not projected to base_face.
+    """
     tol = tol or 50
-    outer_faces = tuple(
-        sorted(s.Faces, key=lambda x: x.Area, reverse=True)[0]
-        for s in curtain_panels if s and s.Faces.Length != 0)
-    # filtered panels
-    panels = tuple(p for p in curtain_panels if p and p.Faces.Length != 0)
-    # find center points
-    center_pts = tuple(face.PointAtParameter(0.5, 0.5) for face in outer_faces)
-
-    pattern = tuple(base_face.DistanceTo(pt) < tol for pt in center_pts)
-
-    panel_element_ids = tuple(panel for count, panel in enumerate(panels)
-                              if pattern[count])
-    vertices = ((base_face.ClosestPointTo(v.PointGeometry) for v in face.Vertices)
-                for count, face in enumerate(outer_faces)
-                if pattern[count])
+    is_temporary = not isinstance(curtain_panels, CurtainPanelIndex)
+    if is_temporary:
+        curtain_panels = CurtainPanelIndex(curtain_panels)
+    base_face = geometry.face_projector(base_face).face
+
+    try:
+        pattern = curtain_panels.near_face(base_face, tol)
+        return tuple(curtain_panels.panels[i] for i in pattern), \
+            tuple(curtain_panels.loops[i] for i in pattern)
+    finally:
+        if is_temporary:
+            curtain_panels.Dispose()
+
+
+def extract_curtain_panel_vertices(curtain_panels, base_face, tol=None, report=None):
+    """Return lists of lists of vertices for a panel grid.
+
+    Args:
+        curtain_panels: A CurtainPanelIndex or a list of curtain panels. Create the
+            index once and reuse it for all the faces. Passing the list of panels
+            will rebuild the index for every call.
+        base_face: Dynamo base face or a geometry.FaceProjector.
+        tol: Maximum distance between the center of the panel and base_face
+            (Default: 50).
+        report: An optional instrumentation.Report to record the time for finding
+            the panels (extraction) and projecting their vertices (projection).
+
+    Returns:
+        A tuple of panels and a tuple of projected vertices as (x, y, z) values.
+    """
+    report = get_report(report)
+    start = report.start()
+    projector = geometry.face_projector(base_face)
+    panel_element_ids, loops = find_curtain_panels(curtain_panels, projector, tol)
+    report.add_time('extraction', start)
+
+    start = report.start()
+    vertices = tuple(projector.project(loop) for loop in loops)
+    report.add_time('projection', start)
     return panel_element_ids, vertices
 
 
-def extract_panels_vertices(host_element, base_face, opt):
-    """Return lists of lists of vertices for a panel grid."""
+def extract_panels_vertices(host_element, base_face, opt, templates=None):
+    """Return lists of lists of vertices for a panel grid.
+
+    base_face can be a Dynamo face or a geometry.FaceProjector. Use templates (a
+    geometrytemplate.GeometryTemplateCache) to convert the geometry of each panel
+    type once. Dynamo geometries of each panel are disposed once its vertices are
+    projected.
+    """
     if not host_element.CurtainGrid:
         return (), ()
+    projector = geometry.face_projector(base_face)
+    backend = get_backend()
     opt.ComputeReferences = True
     _panelElementIds = []
     _panelVertices = []
@@ -38,35 +202,43 @@ def extract_panels_vertices(host_element, base_face, opt):
     for panel_id in panel_ids:
 
         panel_el = host_element.Document.GetElement(panel_id)
-        geometries = panel_el.get_Geometry(opt)
-        # From here solids are dynamo objects
-        solids = tuple(p.ToProtoType()
-                       for geometry in geometries
-                       for p in geometry.GetInstanceGeometry())
-
-        if panel_el.Name == 'Curtain Wall Dbl Glass':
-            # remove handle geometry
-            solids = solids[2:]
-
-        outer_faces = tuple(
-            sorted(s.Faces, key=lambda x: x.SurfaceGeometry().Area, reverse=True)[0]
-            for s in solids if s and s.Faces.Length != 0)
-
-        vertices = tuple(
-            tuple(ver.PointGeometry for ver in outer_face.Vertices)
-            for outer_face in outer_faces
-        )
+        outer_faces = templates.outer_faces(panel_el) \
+            if templates is not None else None
+        if outer_faces is not None:
+            if panel_el.Name == 'Curtain Wall Dbl Glass':
+                # remove handle geometry
+                outer_faces = outer_faces[2:]
+            vertices = tuple(f[1] for f in outer_faces if f is not None)
+            coordinates = tuple(projector.project(ver_group) for ver_group in vertices)
+        else:
+            with GeometryScope() as scope:
+                geometries = panel_el.get_Geometry(opt)
+                # From here solids are dynamo objects
+                solids = scope.track_all(backend.to_proto_type(p)
+                                         for geo in geometries
+                                         for p in geo.GetInstanceGeometry())
 
-        coordinates = tuple(
-            (base_face.ClosestPointTo(ver) for ver in ver_group)
-            for ver_group in vertices
-        )
+                if panel_el.Name == 'Curtain Wall Dbl Glass':
+                    # remove handle geometry
+                    solids = solids[2:]
+
+                outer_faces = []
+                for s in solids:
+                    faces = scope.track_all(s.Faces) if s else ()
+                    if faces:
+                        outer_faces.append(max(
+                            faces, key=lambda x: scope.track(x.SurfaceGeometry()).Area))
+
+                vertices = tuple(
+                    scope.track_all(ver.PointGeometry for ver in outer_face.Vertices)
+                    for outer_face in outer_faces
+                )
+
+                coordinates = tuple(projector.project(ver_group)
+                                    for ver_group in vertices)
 
         for coords in coordinates:
             _panelElementIds.append(panel_id)
             _panelVertices.append(coords)
 
-        # cleaning up
-        (solid.Dispose() for solid in solids)
-
     return _panelElementIds, _panelVertices
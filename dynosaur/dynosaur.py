@@ -1,37 +1,126 @@
 """Collection of functions for Revit."""
-import objects
-import window
-import curtainwall
-import util
-import room
-import collector
-
-import clr
-clr.AddReference("RevitAPI")
-# DB for spatial element calculator
-import Autodesk.Revit.DB as DB
-
-# Import DocumentManager and TransactionManager
-clr.AddReference("RevitServices")
-import RevitServices
-from RevitServices.Persistence import DocumentManager
-from RevitServices.Transactions import TransactionManager
-
-
-def create_rooms(rooms, boundary_location=1):
-    """Creat dynosaur rooms from revit rooms.
-
-    This script will only work from inside Dynamo nodes. for a similar script
-    forRrevit check this link for more details:
-    https://github.com/jeremytammik/SpatialElementGeometryCalculator/
-        blob/master/SpatialElementGeometryCalculator/Command.cs
+import collections
+
+from . import objects
+from . import curtainwall
+from . import util
+from . import collector
+from . import adjacency
+from . import hostelement
+from . import geometrytemplate
+from . import pipeline
+from . import execution
+from . import recording
+from .cache import get_cache
+from .simplify import simplify_model
+from .validation import validate_model
+from .instrumentation import get_report
+
+# curtain panels are only collected around the rooms. The margin is in Revit
+# internal units (feet) and covers the thickness of the curtain walls.
+PANEL_MARGIN = 3.0
+
+
+def _create_room(revit_room, calculator, curtain_panels, host_elements,
+                 tolerance=None, report=None, context=None, recording=None):
+    """Create a dynosaur room from a Revit room.
+
+    Dynamo geometries that are created for the room are disposed before returning
+    the room. host_elements is a hostelement.HostElementCache that is shared between
+    the rooms. Stages and counters are recorded in report. The raw room is added
+    to recording if it is not None.
+
+    Returns:
+        A tuple of (room, elements, log). room is the only room in a new RoomModel.
     """
-    # unwrap room elements
-    # this is not the right way of logging in python and probably any other language
-    log = []
-    rooms = tuple(util.get_internal_elements(rooms))
+    raw_room, room_elements = pipeline.extract_room(
+        revit_room, calculator, curtain_panels, host_elements, report, context)
+    if recording is not None:
+        recording.add(raw_room, room_elements)
+    processed_room = pipeline.process_room(raw_room, tolerance, report)
+    return pipeline.resolve_room(processed_room, room_elements, revit_room.Id,
+                                 report)
+
+
+def create_extractors(rooms, boundary_location, context, report=None):
+    """Create the objects that extract_room needs for a group of rooms.
+
+    Dispose the context and the curtain panel index once all the rooms are
+    extracted.
+
+    Returns:
+        A tuple of (calculator, curtain panels, host elements). calculator is a
+        SpatialElementGeometryCalculator, curtain panels is a
+        curtainwall.CurtainPanelIndex for the panels around the rooms and host
+        elements is a hostelement.HostElementCache.
+    """
+    report = get_report(report)
+    start = report.start()
+    # create a spatial element calculator to calculate room data
+    calculator = context.calculator(boundary_location)
+
+    opt = context.geometry_options
+    host_elements = hostelement.HostElementCache(opt, context=context)
+
+    # the curtain panels around the rooms. Build the index once and use it for all
+    # the faces. The geometry of each panel type is only converted once.
+    templates = geometrytemplate.GeometryTemplateCache(opt, context=context)
+    cps = curtainwall.CurtainPanelIndex(
+        collector.iter_curtain_panels(
+            context.document,
+            bounding_box=collector.bounding_box(rooms, PANEL_MARGIN)),
+        templates=templates)
+    report.count('template_hits', templates.hits)
+    report.count('template_misses', templates.misses)
+    report.add_time('setup', start)
+    return calculator, cps, host_elements
+
+
+def iter_rooms(rooms, boundary_location=1, tolerance=None, report=None, cache=None,
+               workers=None, chunk_size=50, context=None, recording=None):
+    """Create dynosaur rooms from revit rooms one room at a time.
+
+    Each room is yielded as soon as it is created and Dynamo geometries for the room
+    are disposed before moving to the next room. Use this function to start using the
+    rooms before all the rooms are created and to keep the memory flat for large
+    models.
+
+    Adjacent surfaces between the rooms are not set. Use create_rooms or
+    adjacency.set_adjacent_surfaces to find them once all the rooms are created.
+
+    Args:
+        rooms: Revit rooms.
+        boundary_location: 0 for finish face and 1 for center line (Default: 1).
+        tolerance: Tolerance for finding duplicated surfaces
+            (Default: adjacency.DEFAULT_TOLERANCE).
+        report: An optional instrumentation.Report to record the time for each stage
+            and each room.
+        cache: An optional cache.RoomCache or path to a cache file. Rooms that
+            haven't changed since they are cached are loaded from the cache and
+            the new rooms are added to the cache. The cache is saved once all the
+            rooms are created.
+        workers: Number of workers for processing the rooms or an executor with a
+            submit method (e.g. concurrent.futures.ThreadPoolExecutor). Revit calls
+            stay on the current thread and the pure Python geometry work is done by
+            the workers in chunks of rooms (see dynosaur.pipeline). Processes are
+            used in CPython and threads in IronPython. Rooms are yielded in the same
+            order as the input rooms. By default all the work is done on the
+            current thread.
+        chunk_size: Number of rooms that are sent to a worker at once (Default: 50).
+        context: An optional util.DocumentContext to keep the parameters and the
+            families of the elements between runs. It is only used if it is for the
+            document of the rooms. Invalidate the context after changing the document.
+        recording: An optional recording.Recording. The raw rooms that are
+            extracted from Revit are added to the recording (see dynosaur.recording).
+
+    Yields:
+        A tuple of (room, elements, log) for each room. room is a dynosaur room in
+        its own RoomModel, elements is the list of Revit elements for surfaces and
+        fenestration surfaces and log is the list of messages for the room.
+    """
+    rooms = tuple(util.get_internal_elements(rooms) or ())
     if not rooms:
-        return []
+        return
 
     # start Transactions. This might look unnecessary but I had issues with permissions
     # when trying to access rooms.
@@ -39,196 +128,323 @@ def create_rooms(rooms, boundary_location=1):
     # doc = DocumentManager.Instance.CurrentDBDocument
     # TransactionManager.Instance.EnsureInTransaction(doc)
 
-    # create a spatial element calculator to calculate room data
     doc = rooms[0].Document
-    options = DB.SpatialElementBoundaryOptions()
-    options.SpatialElementBoundaryLocation = \
-        util.get_boundary_location(boundary_location)
-    calculator = DB.SpatialElementGeometryCalculator(doc, options)
-
-    opt = DB.Options()
-    element_collector = []
-    room_collector = range(len(rooms))
-
-    # all the curtain panels
-    cps = collector.collect_curtain_panels()
-
-    # surface_collector = {}  # collect hbSurfaces so I can set adjucent surfaces
-    for room_count, revit_room in enumerate(rooms):
-        # initiate zone based on room id
-        element_collector.append([])
-        new_room = objects.create_room(revit_room.Id)
-
-        # calculate spatial data for revit room
-        revit_room_spatial_data = calculator.CalculateSpatialElementGeometry(revit_room)
-
-        # get the geometry of the room
-        revit_room_geometry = revit_room_spatial_data.GetGeometry()
-
-        # Cast revit room faces to dynamo geometry using ToProtoType method
-        room_faces_dyn = room.get_dynamo_room_faces(revit_room_geometry)
-
-        assert revit_room_geometry.Faces.Size == len(room_faces_dyn), \
-            "Number of rooms elements ({}) doesn't match number of faces ({}).\n" \
-            "Make sure the Room is bounded.".format(revit_room_geometry.Faces.Size,
-                                                    len(room_faces_dyn))
-
-        for count, face in enumerate(revit_room_geometry.Faces):
-            # base face is useful to project the openings to room boundary
-            base_face_dyn = room_faces_dyn[count]
-
-            # Revit is strange! if two roofs have a shared wall then it will be
-            # duplicated! By checking the values inside the _collector I try to avoid
-            # that.
-            _collector = []
-
-            boundary_faces = revit_room_spatial_data.GetBoundaryFaceInfo(face)
-
-            if len(boundary_faces) == 0:
-                # There is no boundary face! I don't know what does this exactly mean
-                # in the Revit world but now that there is no boundary face we can just
-                # use the dynamo face and create the surface!
-                face_vertices = tuple(v.PointGeometry for v in base_face_dyn.Vertices)
-
-                new_surface = objects.create_surface(
-                    "%s_%s" % (new_room['name'], util.create_uuid()),
-                    new_room['name'],
-                    face_vertices
-                )
-
-                objects.add_surface_to_room(new_room, new_surface)
+    report = get_report(report)
+    cache = get_cache(cache)
+    if cache is not None:
+        cache.set_settings(document=getattr(doc, 'PathName', None) or doc.Title,
+                           boundary_location=boundary_location, tolerance=tolerance)
+
+    def _finish(revit_room, new_room):
+        for message in new_room[2]:
+            report.log(message)
+        if cache is not None:
+            start = report.start()
+            cache.set(revit_room, *new_room)
+            report.add_time('cache', start)
+        return new_room
+
+    def _results(items, future):
+        # rooms from a chunk in the same order as the input rooms
+        if future is not None:
+            processed_rooms, worker_report = future.result()
+            report.merge(worker_report)
+            processed_rooms = iter(processed_rooms)
+        for revit_room, cached_room, extracted in items:
+            if cached_room is not None:
+                yield cached_room
                 continue
+            raw_room, room_elements = extracted
+            yield _finish(revit_room, pipeline.resolve_room(
+                next(processed_rooms), room_elements, revit_room.Id, report))
+
+    if isinstance(workers, int):
+        executor = pipeline.create_executor(workers) if workers > 1 else None
+        max_pending = 2 * workers
+    else:
+        executor = workers
+        max_pending = 4
+    # chunks that are sent to the workers as (items, future)
+    pending = collections.deque()
+    # items for the next chunk as (revit_room, cached room, (raw room, elements))
+    chunk = []
+
+    def _submit():
+        raw_rooms = [item[2][0] for item in chunk if item[2] is not None]
+        future = executor.submit(pipeline.process_rooms, raw_rooms, tolerance) \
+            if raw_rooms else None
+        pending.append((tuple(chunk), future))
+        del chunk[:]
+
+    # unit scale, geometry options, parameters and families are read once in a run
+    context = util.get_context(doc, context)
+    # calculator and curtain panels are only needed if a room is not in the cache
+    calculator = cps = None
+    try:
+        for revit_room in rooms:
+            cached_room = None
+            if cache is not None:
+                start = report.start()
+                cached_room = cache.get(revit_room)
+                report.add_time('cache', start)
+                report.count('cache_hits' if cached_room is not None
+                             else 'cache_misses')
+
+            if cached_room is not None:
+                if executor is None or not (chunk or pending):
+                    yield cached_room
+                    continue
+                # keep the order of the rooms
+                chunk.append((revit_room, cached_room, None))
+            else:
+                if calculator is None:
+                    calculator, cps, host_elements = create_extractors(
+                        rooms, boundary_location, context, report)
+
+                if executor is None:
+                    yield _finish(revit_room, _create_room(
+                        revit_room, calculator, cps, host_elements, tolerance,
+                        report, context, recording))
+                    continue
 
-            for boundary_face in boundary_faces:
-                # boundary_face is a SpatialElementBoundarySubface
-                # we need to get the element (Wall, Roof, etc) first
-                boundary_element = doc.GetElement(
-                    boundary_face.SpatialBoundaryElement.HostElementId
-                )
+                # Revit calls stay on this thread and the rest is sent to the workers
+                extracted = pipeline.extract_room(
+                    revit_room, calculator, cps, host_elements, report, context)
+                if recording is not None:
+                    recording.add(*extracted)
+                chunk.append((revit_room, None, extracted))
+
+            if sum(1 for item in chunk if item[2] is not None) >= chunk_size:
+                _submit()
+                while len(pending) > max_pending:
+                    for new_room in _results(*pending.popleft()):
+                        yield new_room
+
+        if chunk:
+            _submit()
+        while pending:
+            for new_room in _results(*pending.popleft()):
+                yield new_room
+    finally:
+        # disposes the calculator
+        context.dispose()
+        if cps is not None:
+            cps.Dispose()
+        if cache is not None:
+            cache.save()
+        if executor is not None and executor is not workers:
+            executor.shutdown()
+        # End Transaction
+        # TransactionManager.Instance.TransactionTaskDone()
+
+
+def create_rooms(rooms, boundary_location=1, tolerance=None, report=None,
+                 cache=None, workers=None, chunk_size=50, progress=None, cancel=None,
+                 time_budget=None, checkpoint_interval=60, simplify=False,
+                 validate=False, context=None, record=None):
+    """Creat dynosaur rooms from revit rooms.
 
-                # initiate honeybee surface
-                face_vertices = tuple(v.PointGeometry for v in base_face_dyn.Vertices)
+    This script will only work from inside Dynamo nodes. for a similar script
+    forRrevit check this link for more details:
+    https://github.com/jeremytammik/SpatialElementGeometryCalculator/
+        blob/master/SpatialElementGeometryCalculator/Command.cs
 
-                # TODO(mostapha) This should be done once when all the surfaces are
-                # created.
-                if face_vertices in _collector:
-                    continue
+    Args:
+        rooms: Revit rooms.
+        boundary_location: 0 for finish face and 1 for center line (Default: 1).
+            Adjacent surfaces can only be found for center line boundaries.
+        tolerance: Tolerance for finding duplicated and adjacent surfaces
+            (Default: adjacency.DEFAULT_TOLERANCE).
+        report: An optional instrumentation.Report to record the time for each stage
+            and each room. Use it to find the rooms and the elements that are slow.
+            Messages in log are also added to the report.
+        cache: An optional cache.RoomCache or path to a cache file. Only the rooms
+            that have changed since the last run are recreated (see dynosaur.cache).
+        workers: Number of workers for processing the rooms in parallel or an
+            executor (see iter_rooms). The result is the same as processing the
+            rooms on the current thread.
+        chunk_size: Number of rooms that are sent to a worker at once. Progress is
+            reported and cancellation is checked after each chunk (Default: 50).
+        progress: An optional function that is called as progress(p) after each
+            chunk of rooms and once the run stops. p is an execution.Progress with
+            the number of rooms and surfaces that are done, the elapsed time and
+            the estimated time to finish.
+        cancel: An optional execution.CancellationToken. The run stops after the
+            current chunk once it is cancelled and doesn't start if it is already
+            cancelled.
+        time_budget: Optional time for the run in seconds. The run stops after the
+            first chunk that ends after the time is up.
+        checkpoint_interval: Minimum time between saving the cache during the run
+            in seconds (Default: 60). Use the same cache to continue a run that is
+            stopped without recreating the finished rooms.
+        simplify: Remove the duplicated and collinear vertices before finding the
+            adjacent surfaces (see dynosaur.simplify). The number of removed
+            vertices is added to the log (Default: False).
+        validate: Check the geometry of the surfaces and the fenestration surfaces
+            before finding the adjacent surfaces and add the issues to the log (see
+            dynosaur.validation). Issues are not fixed. Use
+            validation.validate_model(rooms, fix=True) to fix them (Default: False).
+        context: An optional util.DocumentContext for the document of the rooms
+            (see iter_rooms).
+        record: An optional path to a recording file. The raw rooms that are
+            extracted from Revit are written to the file once the run is done. Use
+            replay_rooms to create the rooms again from the file without Revit.
+            Rooms from the cache are not recorded (see dynosaur.recording).
+
+    Returns:
+        A tuple of (rooms, elements, log). rooms is a RoomModel, elements is a list of
+        Revit elements for each room and log is a list of messages. If the run stops
+        early only the rooms that are done are returned and the last message in log
+        is the number of remaining rooms. rooms is an empty RoomModel if no room is
+        done.
+    """
+    rooms = tuple(util.get_internal_elements(rooms) or ())
+    report = get_report(report)
+    cache = get_cache(cache)
+    status = execution.Progress(len(rooms))
+    new_recording = None
+    if record:
+        doc = rooms[0].Document if rooms else None
+        new_recording = recording.Recording({
+            'document': getattr(doc, 'PathName', None) or getattr(doc, 'Title', None),
+            'boundary_location': boundary_location})
+    # log is kept for the Dynamo nodes. Use report for the timings and the counters.
+    log = []
+    element_collector = []
+    room_collector = objects.RoomModel()
+    for new_room, elements, room_log in execution.run_chunks(
+            iter_rooms(rooms, boundary_location, tolerance, report, cache, workers,
+                       chunk_size, context, new_recording),
+            status, chunk_size, progress, cancel, time_budget, cache,
+            checkpoint_interval, report):
+        start = report.start()
+        room_collector.extend(new_room.model)
+        report.add_time('assemble', start)
+        element_collector.append(elements)
+        log.extend(room_log)
+
+    if new_recording is not None:
+        new_recording.save(record)
+
+    if status.stopped:
+        message = 'Run is %s after %d of %d rooms. %d rooms are not created.' % (
+            status.status.replace('_', ' '), status.rooms_done, status.room_count,
+            status.remaining_rooms)
+        log.append(message)
+        report.log(message)
+
+    return _finish_model(room_collector, element_collector, log, tolerance,
+                         simplify, validate, report)
+
+
+def _finish_model(room_collector, element_collector, log, tolerance=None,
+                  simplify=False, validate=False, report=None):
+    """Simplify, validate and find the adjacent surfaces of the created rooms.
+
+    Returns:
+        A tuple of (rooms, elements, log) for create_rooms and replay_rooms.
+    """
+    report = get_report(report)
+    if not len(room_collector):
+        return room_collector, element_collector, log
+
+    if simplify:
+        reduction = simplify_model(room_collector, tolerance, report=report)
+        message = 'Removed %d of %d vertices.' % (
+            reduction['vertices_before'] - reduction['vertices_after'],
+            reduction['vertices_before'])
+        log.append(message)
+        report.log(message)
+
+    if validate:
+        result = validate_model(room_collector, tolerance, report=report)
+        messages = ['Found %d geometry issues in %d surfaces.' % (
+            len(result), result.surface_count)]
+        messages.extend(str(issue) for issue in result)
+        for message in messages:
+            log.append(message)
+            report.log(message)
+
+    # find adjacent surfaces between the rooms
+    start = report.start()
+    report.count('adjacent_pairs',
+                 adjacency.set_adjacent_surfaces(room_collector, tolerance))
+    report.add_time('adjacency', start)
 
-                new_surface = objects.create_surface(
-                    "%s_%s" % (new_room['name'], boundary_element.Id),
-                    new_room['name'],
-                    face_vertices
-                )
-
-                # TODO(mostapha) This should be done once when all the surfaces are
-                # created.
-                _collector.append(face_vertices)
-
-                # collect element id for each face.
-                # this can be part of the object itself. I need to think about it before
-                # adding it to the object. Trying to keep it as light as possible
-                element_collector[room_count].append(doc.GetElement(
-                    boundary_face.SpatialBoundaryElement.HostElementId
-                ))
-
-                # I'm not sure how this works in Revit but I assume there is an easy
-                # way to find the adjacent surface for an element. Let's hope this time
-                # revit doesn't let me down!
-                # if boundary_element.Id not in surface_collector:
-                #     surface_collector[boundary_element.Id] = new_surface
-                # else:
-                #     # TODO(mostapha): set adjacent surface
-                #     pass
-
-                # -------------------------------------------------------------------- #
-                # ----------------------- child surfaces ----------------------------- #
-                # -------------------------------------------------------------------- #
-
-                # time to find child surfaces (e.g. windows!)
-                # this is the reason dynosaur exists in the first place
-
-                # Take care of curtain wall systems
-                # This will most likely fail for custom curtain walls
-                if util.get_parameter(boundary_element, 'Family') == 'Curtain Wall':
-                    # get cooredinates and element ids for this curtain wall.
-
-                    # _elementIds, _coordinates = curtainwall.extract_panels_vertices(
-                    #     boundary_element, base_face_dyn, opt)
-                    _elementIds, _coordinates = \
-                        curtainwall.extract_curtain_panel_vertices(cps, base_face_dyn)
-                    for count, coordinate in enumerate(_coordinates):
-                        if not coordinate:
-                            log.append("{} has an opening with less than "
-                                       "two coordinates. It has been removed!"
-                                       .format(_elementIds[count]))
-                            continue
-
-                        # create honeybee surface - use element id as the name
-                        new_fen_surface = objects.create_fen_surface(
-                            _elementIds[count],
-                            new_surface['name'],
-                            coordinate)
-
-                        # get element and add it to the collector
-                        try:
-                            elm = boundary_element.Document.GetElement(_elementIds[count])
-                            element_collector[room_count].append(elm)
-                        except TypeError:
-                            element_collector[room_count].append(_elementIds[count])
-
-                        # add fenestration surface to base surface
-                        objects.add_fenestration_to_surface(new_surface,
-                                                            new_fen_surface)
-                else:
-                    # collect child elements for non-curtain wall systems
-                    childelement_collector = window.get_child_elemenets(boundary_element)
-
-                    if not childelement_collector:
-                        objects.add_surface_to_room(new_room, new_surface)
-                        continue
-
-                    _coordinates = window.exctract_glazing_vertices(
-                        boundary_element,
-                        base_face_dyn,
-                        opt
-                    )
-
-                    for count, coordinate in enumerate(_coordinates):
-
-                        if not coordinate:
-                            log.append("{} in {} has an opening with less than "
-                                       "two coordinates. It has been removed!"
-                                       .format(
-                                           childelement_collector[count].Id,
-                                           new_room['name']
-                                       ))
-
-                        # create honeybee surface - use element id as the name
-                        new_fen_surface = objects.create_fen_surface(
-                            childelement_collector[count].Id,
-                            new_room['name'],
-                            coordinate
-                        )
-
-                        # add fenestration surface to base honeybee surface
-                        element_collector[room_count].append(
-                            childelement_collector[count]
-                        )
-                        # add fenestration surface to base surface
-                        objects.add_fenestration_to_surface(
-                            new_surface, new_fen_surface)
-
-                # add surface to dynosaur room
-                objects.add_surface_to_room(new_room, new_surface)
-                # clean up!
-                boundary_element.Dispose()
-
-        room_collector[room_count] = new_room
-
-        # clean up!
-        revit_room_spatial_data.Dispose()
-
-    calculator.Dispose()
-    # End Transaction
-    # TransactionManager.Instance.TransactionTaskDone()
     return room_collector, element_collector, log
+
+
+def replay_rooms(recording_file, tolerance=None, report=None, workers=None,
+                 chunk_size=50, simplify=False, validate=False):
+    """Create dynosaur rooms from a recording of the raw rooms without Revit.
+
+    The rooms are processed the same way as create_rooms. Use it to try other
+    tolerances and settings or to profile a model outside Revit.
+
+    Args:
+        recording_file: Path to a recording file from create_rooms or a
+            recording.Recording.
+        tolerance: Tolerance for finding duplicated and adjacent surfaces
+            (Default: adjacency.DEFAULT_TOLERANCE).
+        report: An optional instrumentation.Report to record the time for each stage
+            and each room.
+        workers: Number of workers for processing the rooms in parallel or an
+            executor (see iter_rooms). By default the rooms are processed on the
+            current thread.
+        chunk_size: Number of rooms that are sent to a worker at once (Default: 50).
+        simplify: Remove the duplicated and collinear vertices (see create_rooms).
+        validate: Check the geometry of the rooms and add the issues to the log (see
+            create_rooms).
+
+    Returns:
+        A tuple of (rooms, elements, log) like create_rooms. Revit elements are
+        recording.RecordedElements with the id of the recorded elements.
+    """
+    report = get_report(report)
+    if isinstance(recording_file, recording.Recording):
+        recorded = recording_file
+    else:
+        recorded = recording.read_recording(recording_file)
+
+    if isinstance(workers, int):
+        executor = pipeline.create_executor(workers) if workers > 1 else None
+    else:
+        executor = workers
+
+    chunks = [range(start, min(start + chunk_size, len(recorded)))
+              for start in range(0, len(recorded), chunk_size)]
+    try:
+        results = []
+        for indices in chunks:
+            raw_rooms = [recorded.rooms[i][0] for i in indices]
+            if executor is None:
+                results.append(pipeline.process_rooms(raw_rooms, tolerance))
+            else:
+                results.append(executor.submit(
+                    pipeline.process_rooms, raw_rooms, tolerance))
+
+        log = []
+        element_collector = []
+        room_collector = objects.RoomModel()
+        for indices, result in zip(chunks, results):
+            if executor is not None:
+                result = result.result()
+            processed_rooms, worker_report = result
+            report.merge(worker_report)
+            for index, processed_room in zip(indices, processed_rooms):
+                new_room, elements, room_log = pipeline.resolve_room(
+                    processed_room, recorded.elements(index),
+                    recording.RecordedElement(recorded.rooms[index][0][0]), report)
+                start = report.start()
+                room_collector.extend(new_room.model)
+                report.add_time('assemble', start)
+                element_collector.append(elements)
+                for message in room_log:
+                    log.append(message)
+                    report.log(message)
+    finally:
+        if executor is not None and executor is not workers:
+            executor.shutdown()
+
+    return _finish_model(room_collector, element_collector, log, tolerance,
+                         simplify, validate, report)
@@ -0,0 +1,211 @@
+"""Progress, cancellation and time budgets for long runs.
+
+create_rooms processes the rooms in chunks. After each chunk it calls the progress
+callback, saves the cache and stops if the run is cancelled or is out of time. The
+rooms that are done are returned as usual and the log says how many rooms are left.
+
+    token = execution.CancellationToken(stop_file='C:/temp/stop')
+    rooms, elements, log = create_rooms(
+        revit_rooms, cache='C:/temp/model.cache', progress=callback, cancel=token,
+        time_budget=300)
+
+The cache is the checkpoint. Rooms that are done are saved to the cache during the
+run (see checkpoint_interval) and when the run stops. Running create_rooms again
+with the same rooms and cache loads the finished rooms from the cache and only
+creates the remaining rooms.
+"""
+import os
+import threading
+
+from .instrumentation import clock, get_report
+
+# status of a run
+RUNNING, DONE, CANCELLED, OUT_OF_TIME = 'running', 'done', 'cancelled', 'out_of_time'
+
+
+class CancellationToken(object):
+    """Cancel a run from the progress callback, another thread or another process.
+
+    The run stops after the current chunk of rooms.
+
+    Args:
+        stop_file: An optional path to a file. The run is cancelled once the file
+            exists. Use it to stop a run inside Dynamo from outside Revit.
+    """
+
+    def __init__(self, stop_file=None):
+        self.stop_file = stop_file
+        self._event = threading.Event()
+
+    def cancel(self):
+        """Cancel the run."""
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        """True if the run is cancelled."""
+        if not self._event.is_set() and self.stop_file and \
+                os.path.exists(self.stop_file):
+            self._event.set()
+        return self._event.is_set()
+
+    def __repr__(self):
+        return 'CancellationToken: %s' % ('cancelled' if self.cancelled else 'active')
+
+
+class Progress(object):
+    """Progress of a run.
+
+    Progress is passed to the progress callback after each chunk of rooms.
+
+    Args:
+        room_count: Number of input rooms.
+
+    Attributes:
+        rooms_done: Number of rooms that are done including the cached rooms.
+        cached_rooms: Number of rooms that are loaded from the cache.
+        surfaces, fen_surfaces: Number of surfaces and fenestration surfaces in the
+            rooms that are done.
+        elapsed: Time since the start of the run in seconds.
+        status: 'running', 'done', 'cancelled' or 'out_of_time'.
+    """
+
+    def __init__(self, room_count):
+        self.room_count = room_count
+        self.rooms_done = 0
+        self.cached_rooms = 0
+        self.surfaces = 0
+        self.fen_surfaces = 0
+        self.elapsed = 0.0
+        self.status = RUNNING
+        self._start = clock()
+
+    def add_room(self, room):
+        """Add a room from iter_rooms that is done."""
+        self.rooms_done += 1
+        self.surfaces += room.model.surface_count
+        self.fen_surfaces += room.model.fen_surface_count
+        self.update()
+
+    def update(self):
+        """Update the elapsed time."""
+        self.elapsed = clock() - self._start
+
+    @property
+    def remaining_rooms(self):
+        """Number of rooms that are not done yet."""
+        return self.room_count - self.rooms_done
+
+    @property
+    def fraction(self):
+        """Fraction of the rooms that are done between 0 and 1."""
+        return float(self.rooms_done) / self.room_count if self.room_count else 1.0
+
+    @property
+    def eta(self):
+        """Estimated time to finish the remaining rooms in seconds or None.
+
+        The estimate is based on the rooms that are not loaded from the cache and
+        assumes none of the remaining rooms are cached.
+        """
+        created = self.rooms_done - self.cached_rooms
+        if not self.remaining_rooms:
+            return 0.0
+        if not created:
+            return None
+        return self.elapsed / created * self.remaining_rooms
+
+    @property
+    def stopped(self):
+        """True if the run stopped before all the rooms were done."""
+        return self.status in (CANCELLED, OUT_OF_TIME)
+
+    def to_dict(self):
+        """Get the progress as a dictionary."""
+        return {
+            'room_count': self.room_count,
+            'rooms_done': self.rooms_done,
+            'cached_rooms': self.cached_rooms,
+            'surfaces': self.surfaces,
+            'fen_surfaces': self.fen_surfaces,
+            'elapsed': self.elapsed,
+            'eta': self.eta,
+            'status': self.status
+        }
+
+    def __repr__(self):
+        eta = self.eta
+        return 'Progress: %d/%d rooms (%.0f%%), %d surfaces, %.1f s, ETA %s [%s]' % (
+            self.rooms_done, self.room_count, 100 * self.fraction, self.surfaces,
+            self.elapsed, '%.0f s' % eta if eta is not None else 'n/a', self.status)
+
+
+def run_chunks(rooms, progress, chunk_size=50, callback=None, cancel=None,
+               time_budget=None, cache=None, checkpoint_interval=60, report=None):
+    """Yield the rooms from iter_rooms and stop between chunks if the run is
+    cancelled or is out of time.
+
+    The run doesn't start if it is already cancelled or the time budget is 0.
+
+    The rooms generator is closed when the run stops so the Dynamo geometries are
+    disposed and the cache is saved (see dynosaur.iter_rooms).
+
+    Args:
+        rooms: A generator of (room, elements, log) from iter_rooms.
+        progress: A Progress for the rooms. Its status is set once the run stops.
+        chunk_size: Number of rooms in each chunk (Default: 50).
+        callback: An optional function that is called as callback(progress) after
+            each chunk and once more when the run is done or stopped.
+        cancel: An optional CancellationToken or any object with a cancelled
+            attribute.
+        time_budget: Optional time for the run in seconds. The run stops after the
+            first chunk that ends after the time is up.
+        cache: The cache.RoomCache of the rooms. It is saved every
+            checkpoint_interval seconds.
+        checkpoint_interval: Minimum time between saving the cache in seconds
+            (Default: 60).
+        report: An optional instrumentation.Report to record the time for saving
+            the cache (cache).
+    """
+    report = get_report(report)
+
+    def _stop():
+        if cancel is not None and cancel.cancelled:
+            progress.status = CANCELLED
+        elif time_budget is not None and progress.elapsed >= time_budget:
+            progress.status = OUT_OF_TIME
+        return progress.status != RUNNING
+
+    chunk_count = 0
+    last_checkpoint = clock()
+    hits = cache.hits if cache is not None else 0
+    try:
+        for new_room in (() if _stop() else rooms):
+            progress.add_room(new_room[0])
+            if cache is not None:
+                # workers can get rooms from the cache before they are yielded
+                progress.cached_rooms = min(cache.hits - hits, progress.rooms_done)
+            yield new_room
+            chunk_count += 1
+            if chunk_count < chunk_size:
+                continue
+
+            chunk_count = 0
+            if cache is not None and clock() - last_checkpoint >= checkpoint_interval:
+                start = report.start()
+                cache.save()
+                report.add_time('cache', start)
+                last_checkpoint = clock()
+            if callback:
+                # the callback can cancel the run
+                callback(progress)
+            if _stop():
+                break
+    finally:
+        # dispose the geometries and save the cache
+        rooms.close()
+    progress.update()
+    if progress.status == RUNNING:
+        progress.status = DONE
+    if callback:
+        callback(progress)
@@ -0,0 +1,941 @@
+"""A pure Python stand-in for Revit and Dynamo.
+
+Use this backend to run and profile dynosaur outside Revit. It provides a fake
+Revit document with synthetic buildings and light Dynamo geometry objects that
+support the members that dynosaur uses.
+
+Usage:
+    from dynosaur import backend, fakerevit
+    from dynosaur.dynosaur import create_rooms
+
+    backend.set_backend('fake')
+    doc = fakerevit.create_building(100, windows_per_wall=2, curtain_wall_share=0.3)
+    rooms, elements, log = create_rooms(doc.rooms)
+
+All the geometries are planar polygons. Coordinates are in millimeters and the
+document uses the same units for display so length_unit_scale is 1.
+"""
+import math
+import random
+
+from . import geometry
+
+
+# -------------------------------------------------------------------------------- #
+# ------------------------------ Dynamo geometry --------------------------------- #
+# -------------------------------------------------------------------------------- #
+
+class DynamoGeometry(object):
+    """Base class for Dynamo geometries.
+
+    The class keeps track of created and disposed geometries.
+    """
+
+    created = 0
+    disposed = 0
+
+    def __init__(self):
+        DynamoGeometry.created += 1
+        self.is_disposed = False
+
+    @classmethod
+    def live_count(cls):
+        """Number of geometries which are not disposed yet."""
+        return DynamoGeometry.created - DynamoGeometry.disposed
+
+    @classmethod
+    def reset_counters(cls):
+        DynamoGeometry.created = DynamoGeometry.disposed = 0
+
+    def Dispose(self):
+        if not self.is_disposed:
+            self.is_disposed = True
+            DynamoGeometry.disposed += 1
+
+
+class Array(list):
+    """A list with Length and Size like .NET arrays and Revit arrays."""
+
+    @property
+    def Length(self):
+        return len(self)
+
+    @property
+    def Size(self):
+        return len(self)
+
+
+class Point(DynamoGeometry):
+    """Dynamo point."""
+
+    def __init__(self, x, y, z):
+        DynamoGeometry.__init__(self)
+        self.X, self.Y, self.Z = x, y, z
+
+    def Scale(self, amount):
+        return Point(self.X * amount, self.Y * amount, self.Z * amount)
+
+    def __repr__(self):
+        return 'Point(X = %.3f, Y = %.3f, Z = %.3f)' % (self.X, self.Y, self.Z)
+
+
+class BoundingBox(object):
+
+    def __init__(self, points):
+        self.MinPoint = Point(*(min(p[i] for p in points) for i in range(3)))
+        self.MaxPoint = Point(*(max(p[i] for p in points) for i in range(3)))
+
+
+class Vertex(object):
+    """Topology vertex. Like Dynamo, PointGeometry creates a new point every time."""
+
+    def __init__(self, coordinates):
+        self._coordinates = coordinates
+
+    @property
+    def PointGeometry(self):
+        return Point(*self._coordinates)
+
+
+class CoEdge(object):
+
+    def __init__(self, start):
+        self.StartVertex = Vertex(start)
+
+
+class Loop(object):
+
+    def __init__(self, coordinates):
+        self.CoEdges = Array(CoEdge(c) for c in coordinates)
+
+
+class TopologyFace(object):
+
+    def __init__(self, surface):
+        # openings first and the outer loop last
+        self.Loops = Array(
+            [Loop(h) for h in surface.holes] + [Loop(surface.boundary)])
+
+
+class Surface(DynamoGeometry):
+    """A planar Dynamo surface with an outer boundary and optional holes.
+
+    Args:
+        boundary: List of (x, y, z) values for the outer boundary.
+        holes: List of lists of (x, y, z) values for the holes.
+    """
+
+    def __init__(self, boundary, holes=()):
+        DynamoGeometry.__init__(self)
+        self.boundary = tuple(tuple(float(c) for c in pt) for pt in boundary)
+        self.holes = tuple(tuple(tuple(pt) for pt in h) for h in holes)
+        plane = geometry.plane_from_points(self.boundary)
+        if plane is None:
+            raise ValueError('Surface vertices are collinear.')
+        self.origin, normal = plane
+        # match the normal with the order of the vertices
+        if geometry.dot(normal, geometry.newell_normal(self.boundary)) < 0:
+            normal = tuple(-c for c in normal)
+        self.normal = normal
+        self.x_axis, self.y_axis = geometry.plane_axes(normal)
+        self._uvs = geometry.to_plane_coordinates(
+            self.boundary, self.origin, self.x_axis, self.y_axis)
+
+    @classmethod
+    def ByPerimeterPoints(cls, points):
+        points = tuple(geometry.xyz(pt) for pt in points)
+        if len(set(points)) < 3:
+            raise ValueError('Surface needs at least three points.')
+        surface = cls(points)
+        if _is_self_intersecting(surface._uvs):
+            raise ValueError('Perimeter curves are self-intersecting.')
+        return surface
+
+    @property
+    def Vertices(self):
+        return Array(Vertex(c) for loop in (self.boundary,) + self.holes for c in loop)
+
+    @property
+    def Faces(self):
+        return Array([TopologyFace(self)])
+
+    @property
+    def Area(self):
+        return _polygon_area(self._uvs) - sum(
+            _polygon_area(geometry.to_plane_coordinates(
+                h, self.origin, self.x_axis, self.y_axis)) for h in self.holes)
+
+    @property
+    def BoundingBox(self):
+        return BoundingBox(self.boundary)
+
+    def SurfaceGeometry(self):
+        return self
+
+    def PointAtParameter(self, u, v):
+        us = [uv[0] for uv in self._uvs]
+        vs = [uv[1] for uv in self._uvs]
+        pu = min(us) + u * (max(us) - min(us))
+        pv = min(vs) + v * (max(vs) - min(vs))
+        return Point(*self._from_uv(pu, pv))
+
+    def _from_uv(self, u, v):
+        return tuple(o + u * x + v * y
+                     for o, x, y in zip(self.origin, self.x_axis, self.y_axis))
+
+    def _closest(self, point):
+        p = geometry.xyz(point)
+        u, v = geometry.to_plane_coordinates(
+            (p,), self.origin, self.x_axis, self.y_axis)[0]
+        if not _is_inside(u, v, self._uvs):
+            u, v = min((_closest_on_segment(u, v, self._uvs[i - 1], self._uvs[i])
+                        for i in range(len(self._uvs))),
+                       key=lambda c: (c[0] - u) ** 2 + (c[1] - v) ** 2)
+        return self._from_uv(u, v)
+
+    def ClosestPointTo(self, point):
+        return Point(*self._closest(point))
+
+    def DistanceTo(self, point):
+        return geometry.length(
+            geometry.subtract(geometry.xyz(point), self._closest(point)))
+
+
+class Solid(DynamoGeometry):
+    """Dynamo solid as a collection of surfaces."""
+
+    def __init__(self, faces):
+        DynamoGeometry.__init__(self)
+        self.Faces = Array(faces)
+
+
+def _polygon_area(uvs):
+    return abs(sum(uvs[i - 1][0] * uvs[i][1] - uvs[i][0] * uvs[i - 1][1]
+                   for i in range(len(uvs)))) / 2.0
+
+
+def _is_inside(u, v, uvs):
+    inside = False
+    for i in range(len(uvs)):
+        (u0, v0), (u1, v1) = uvs[i - 1], uvs[i]
+        if (v0 > v) != (v1 > v) and u < (u1 - u0) * (v - v0) / (v1 - v0) + u0:
+            inside = not inside
+    return inside
+
+
+def _is_self_intersecting(uvs):
+    def _orientation(a, b, c):
+        value = (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+        return (value > 1e-9) - (value < -1e-9)
+
+    count = len(uvs)
+    for i in range(count):
+        a, b = uvs[i], uvs[(i + 1) % count]
+        # skip the neighbour edges
+        for j in range(i + 2, count - 1 if i == 0 else count):
+            c, d = uvs[j], uvs[(j + 1) % count]
+            if _orientation(a, b, c) * _orientation(a, b, d) < 0 and \
+                    _orientation(c, d, a) * _orientation(c, d, b) < 0:
+                return True
+    return False
+
+
+def _closest_on_segment(u, v, start, end):
+    du, dv = end[0] - start[0], end[1] - start[1]
+    ln = du * du + dv * dv
+    t = 0 if ln == 0 else ((u - start[0]) * du + (v - start[1]) * dv) / ln
+    t = min(max(t, 0), 1)
+    return start[0] + t * du, start[1] + t * dv
+
+
+# -------------------------------------------------------------------------------- #
+# ------------------------------- Revit document --------------------------------- #
+# -------------------------------------------------------------------------------- #
+
+class ElementId(object):
+
+    def __init__(self, value):
+        self.IntegerValue = value
+
+    def __eq__(self, other):
+        return isinstance(other, ElementId) and other.IntegerValue == self.IntegerValue
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.IntegerValue)
+
+    def __str__(self):
+        return str(self.IntegerValue)
+
+    __repr__ = __str__
+
+
+class XYZ(object):
+
+    def __init__(self, x, y, z):
+        self.X, self.Y, self.Z = x, y, z
+
+
+class BoundingBoxXYZ(object):
+
+    def __init__(self, points):
+        self.Min = XYZ(*(min(pt[i] for pt in points) for i in range(3)))
+        self.Max = XYZ(*(max(pt[i] for pt in points) for i in range(3)))
+
+
+class Edge(object):
+
+    def __init__(self, start, end):
+        self.start, self.end = start, end
+
+    def Evaluate(self, parameter):
+        return XYZ(*(s + parameter * (e - s) for s, e in zip(self.start, self.end)))
+
+
+class Face(object):
+    """Revit planar face.
+
+    Similar to Revit, converting a face with an edge shorter than SHORT_EDGE to
+    Dynamo fails.
+
+    Args:
+        boundary: List of (x, y, z) values.
+        holes: List of lists of (x, y, z) values for openings.
+        hosts: List of ElementIds for the boundary elements of a room face.
+    """
+
+    SHORT_EDGE = 0.001
+
+    def __init__(self, boundary, holes=(), hosts=()):
+        self.boundary = tuple(boundary)
+        self.holes = tuple(holes)
+        self.hosts = tuple(hosts)
+
+    @property
+    def FaceNormal(self):
+        return geometry.normalize(geometry.newell_normal(self.boundary))
+
+    @property
+    def EdgeLoops(self):
+        return Array(
+            Array(Edge(loop[i], loop[(i + 1) % len(loop)]) for i in range(len(loop)))
+            for loop in (self.boundary,) + self.holes)
+
+    def ToProtoType(self):
+        for loop in (self.boundary,) + self.holes:
+            for count, pt in enumerate(loop):
+                if geometry.length(geometry.subtract(pt, loop[count - 1])) < \
+                        self.SHORT_EDGE:
+                    raise ValueError('Failed to convert the face to Dynamo geometry.')
+        return Array([Surface(self.boundary, self.holes)])
+
+
+class RevitSolid(object):
+
+    def __init__(self, faces):
+        self.Faces = Array(faces)
+
+    def ToProtoType(self):
+        return Solid(Surface(face.boundary, face.holes) for face in self.Faces)
+
+
+class Transform(object):
+    """Revit transform with an origin and three basis vectors."""
+
+    def __init__(self, origin, basis_x, basis_y, basis_z):
+        self.Origin = XYZ(*origin)
+        self.BasisX = XYZ(*basis_x)
+        self.BasisY = XYZ(*basis_y)
+        self.BasisZ = XYZ(*basis_z)
+
+    def OfPoint(self, point):
+        return geometry.transform_points(
+            (point,), *(geometry.xyz(v) for v in (self.Origin, self.BasisX,
+                                                   self.BasisY, self.BasisZ)))[0]
+
+
+class GeometryElement(Array):
+
+    def GetBoundingBox(self):
+        return BoundingBoxXYZ(
+            [pt for solid in self for face in solid.Faces for pt in face.boundary])
+
+
+class GeometryInstance(object):
+    """Geometry of a family instance as the symbol geometry and a transform."""
+
+    def __init__(self, symbol_solids, transform):
+        self._symbol_solids = symbol_solids
+        self.Transform = transform
+
+    def GetSymbolGeometry(self):
+        return GeometryElement(self._symbol_solids)
+
+    def GetInstanceGeometry(self):
+        return GeometryElement(
+            RevitSolid(Face(tuple(self.Transform.OfPoint(pt) for pt in face.boundary))
+                       for face in solid.Faces)
+            for solid in self._symbol_solids)
+
+
+class Options(object):
+
+    def __init__(self):
+        self.ComputeReferences = False
+
+
+class Parameter(object):
+
+    class _Definition(object):
+        def __init__(self, name):
+            self.Name = name
+
+    def __init__(self, name, value):
+        self.Definition = self._Definition(name)
+        self._value = value
+
+    def AsValueString(self):
+        return self._value
+
+
+class Family(object):
+
+    def __init__(self, name):
+        self.Name = name
+
+
+class FamilySymbol(object):
+
+    def __init__(self, family_name, name, element_id=None):
+        self.Family = Family(family_name)
+        self.Name = name
+        self.Id = ElementId(element_id) if element_id is not None else None
+
+
+class Element(object):
+    """Revit element."""
+
+    def __init__(self, document, element_id, name, category, family=None):
+        self.Document = document
+        self.Id = ElementId(element_id)
+        self.Name = name
+        self.category = category
+        self.Parameters = [Parameter('Family', family or name)]
+        self.type_id = ElementId(-1)
+        self.LevelId = None
+        self.CreatedPhaseId = document.phase_id
+        document.add_element(self)
+
+    def GetTypeId(self):
+        return self.type_id
+
+    def get_Geometry(self, options):
+        return ()
+
+    def _points(self):
+        """Points for the bounding box of the element."""
+        return ()
+
+    def get_BoundingBox(self, view):
+        points = self._points()
+        return BoundingBoxXYZ(points) if points else None
+
+    def Dispose(self):
+        pass
+
+
+class ElementType(Element):
+    """Type of the system family elements (e.g. WallType)."""
+
+    def __init__(self, document, element_id, family, category):
+        Element.__init__(self, document, element_id, family, category, family)
+        self.FamilyName = family
+
+
+class CurtainGrid(object):
+
+    def __init__(self, panel_ids):
+        self._panel_ids = panel_ids
+
+    def GetPanelIds(self):
+        return self._panel_ids
+
+
+class HostElement(Element):
+    """Walls, floors and roofs.
+
+    Args:
+        document: Fake document.
+        element_id: Element id as an integer.
+        face: Face for the geometry of the element with openings as holes.
+        name: Element name.
+        category: Element category (e.g. Walls).
+        family: Value for Family parameter (e.g. Basic Wall, Curtain Wall).
+    """
+
+    def __init__(self, document, element_id, face, name, category, family):
+        Element.__init__(self, document, element_id, name, category, family)
+        self.type_id = document.element_type(family, category).Id
+        self.face = face
+        self.inserts = []
+        self.CurtainGrid = None
+
+    def FindInserts(self, add_rect_openings, include_shadows, include_embedded_walls,
+                    include_shared_embedded_inserts):
+        return [el.Id for el in self.inserts]
+
+    def get_Geometry(self, options):
+        return [RevitSolid([self.face])]
+
+    def _points(self):
+        return self.face.boundary
+
+
+class FamilyInstance(Element):
+    """Windows and curtain panels.
+
+    Args:
+        document: Fake document.
+        element_id: Element id as an integer.
+        symbol: FamilySymbol.
+        boundary: Boundary of the instance as a list of (x, y, z) values.
+        category: Element category (e.g. Windows).
+    """
+
+    def __init__(self, document, element_id, symbol, boundary, category):
+        Element.__init__(self, document, element_id, symbol.Name, category,
+                         symbol.Family.Name)
+        self.Symbol = symbol
+        self.boundary = tuple(boundary)
+        # symbol coordinates are relative to the first corner and the first edge.
+        # Instances with the same size have the same symbol geometry.
+        origin = self.boundary[0]
+        basis_x = geometry.normalize(geometry.subtract(self.boundary[1], origin))
+        basis_z = geometry.normalize(geometry.newell_normal(self.boundary))
+        basis_y = geometry.cross(basis_z, basis_x)
+        self.transform = Transform(origin, basis_x, basis_y, basis_z)
+        self._symbol_boundary = tuple(
+            tuple(geometry.dot(geometry.subtract(pt, origin), axis)
+                  for axis in (basis_x, basis_y, basis_z))
+            for pt in self.boundary)
+
+    def ToDSType(self, is_revit_owned=True):
+        return DSElement(self)
+
+    def get_Geometry(self, options):
+        # similar to DSElement.Faces the first edge face is added for thickness
+        start, end = self._symbol_boundary[:2]
+        edge = (start, end, geometry.add(end, (0, 0, 1)), geometry.add(start, (0, 0, 1)))
+        return [GeometryInstance(
+            [RevitSolid([Face(edge), Face(self._symbol_boundary)])], self.transform)]
+
+    def _points(self):
+        return self.boundary
+
+
+class DSElement(object):
+    """Dynamo wrapper for a Revit element."""
+
+    def __init__(self, element):
+        self.InternalElement = element
+        self.Id = element.Id.IntegerValue
+
+    @property
+    def Faces(self):
+        boundary = self.InternalElement.boundary
+        normal = geometry.normalize(geometry.newell_normal(boundary))
+        # panels have a thickness. Add the first edge face to the outer face.
+        start, end = boundary[0], boundary[1]
+        edge = (start, end, geometry.add(end, normal), geometry.add(start, normal))
+        return Array([Surface(edge), Surface(boundary)])
+
+
+class SpatialElementBoundarySubface(object):
+
+    class _LinkElementId(object):
+        def __init__(self, host_id):
+            self.HostElementId = host_id
+
+    def __init__(self, host_id):
+        self.SpatialBoundaryElement = self._LinkElementId(host_id)
+
+
+class SpatialElementGeometryResults(object):
+
+    def __init__(self, room):
+        self._faces = Array(room.faces)
+
+    def GetGeometry(self):
+        return RevitSolid(self._faces)
+
+    def GetBoundaryFaceInfo(self, face):
+        return [SpatialElementBoundarySubface(h) for h in face.hosts]
+
+    def Dispose(self):
+        pass
+
+
+class SpatialElementGeometryCalculator(object):
+
+    def __init__(self, document, boundary_location=1):
+        self.document = document
+        self.boundary_location = boundary_location
+
+    def CalculateSpatialElementGeometry(self, room):
+        return SpatialElementGeometryResults(room)
+
+    def Dispose(self):
+        pass
+
+
+class Level(Element):
+    """Revit level."""
+
+    def __init__(self, document, element_id, name, elevation):
+        Element.__init__(self, document, element_id, name, 'Levels', 'Level')
+        self.Elevation = elevation
+
+
+class Room(Element):
+    """Revit room.
+
+    Args:
+        document: Fake document.
+        element_id: Element id as an integer.
+        name: Room name.
+        faces: List of Faces for the room. Each face has the id of its boundary
+            elements.
+        level: Level index.
+    """
+
+    def __init__(self, document, element_id, name, faces, level=0):
+        Element.__init__(self, document, element_id, name, 'Rooms', 'Room')
+        self.faces = faces
+        self.level = level
+        self.Number = str(element_id)
+
+    @property
+    def Area(self):
+        """Area of the floor faces. Area is 0 for rooms without faces."""
+        normals = (geometry.newell_normal(face.boundary) for face in self.faces)
+        return sum(-nz / 2.0 for _, _, nz in normals if nz < 0)
+
+    def _points(self):
+        return [pt for face in self.faces for pt in face.boundary]
+
+
+class Document(object):
+    """Fake Revit document."""
+
+    def __init__(self, title='dynosaur'):
+        self.Title = title
+        self.unit_scale = 1.0
+        self.elements = {}
+        # (family, category): ElementType
+        self.types = {}
+        self._next_id = 100000
+        # phase for the new elements
+        self.phase_id = None
+
+    def new_id(self):
+        self._next_id += 1
+        return self._next_id
+
+    def add_element(self, element):
+        self.elements[element.Id.IntegerValue] = element
+
+    def element_type(self, family, category):
+        """Get the element type for a system family and create it if needed."""
+        key = family, category
+        if key not in self.types:
+            self.types[key] = ElementType(self, self.new_id(), family, category)
+        return self.types[key]
+
+    def GetElement(self, element_id):
+        if not isinstance(element_id, ElementId):
+            raise TypeError(
+                'expected ElementId, got %s' % element_id.__class__.__name__)
+        return self.elements.get(element_id.IntegerValue)
+
+    def elements_of_category(self, category):
+        return (el for el in self.elements.values() if el.category == category)
+
+    @property
+    def rooms(self):
+        return sorted(self.elements_of_category('Rooms'),
+                      key=lambda el: el.Id.IntegerValue)
+
+
+# -------------------------------------------------------------------------------- #
+# ------------------------------ backend functions ------------------------------- #
+# -------------------------------------------------------------------------------- #
+
+_current_document = None
+
+
+def set_current_document(document):
+    """Set the document that is returned by current_document."""
+    global _current_document
+    _current_document = document
+
+
+def current_document():
+    return _current_document
+
+
+def _intersects(element, bounding_box):
+    bbox = element.get_BoundingBox(None)
+    if bbox is None:
+        return False
+    (x0, y0, z0), (x1, y1, z1) = bounding_box
+    return bbox.Min.X <= x1 and bbox.Max.X >= x0 and bbox.Min.Y <= y1 and \
+        bbox.Max.Y >= y0 and bbox.Min.Z <= z1 and bbox.Max.Z >= z0
+
+
+def collect_elements(document, categories, family_instances_only=False,
+                     level_id=None, phase_id=None, placed_only=False,
+                     bounding_box=None, family_name=None):
+    if isinstance(categories, str):
+        categories = (categories,)
+    categories = set(categories)
+    for key in sorted(document.elements):
+        el = document.elements[key]
+        if el.category not in categories:
+            continue
+        if family_instances_only and not isinstance(el, FamilyInstance):
+            continue
+        if family_name is not None:
+            symbol = getattr(el, 'Symbol', None)
+            if symbol is None or symbol.Family.Name != family_name:
+                continue
+        if level_id is not None and el.LevelId != level_id:
+            continue
+        if phase_id is not None and el.CreatedPhaseId != phase_id:
+            continue
+        if placed_only and isinstance(el, Room) and not el.Area:
+            continue
+        if bounding_box is not None and not _intersects(el, bounding_box):
+            continue
+        yield el
+
+
+def category_name(element):
+    return element.category
+
+
+def to_ds_type(element):
+    return element.ToDSType(True)
+
+
+def element_id(value):
+    return ElementId(value)
+
+
+def boundary_location(index):
+    return 0 if index == 0 else 1
+
+
+def spatial_element_geometry_calculator(document, boundary_location_index=1):
+    return SpatialElementGeometryCalculator(
+        document, boundary_location(boundary_location_index))
+
+
+def geometry_options():
+    return Options()
+
+
+def to_solid(geometry_object):
+    return geometry_object
+
+
+def to_proto_type(revit_geometry):
+    return revit_geometry.ToProtoType()
+
+
+def length_unit_scale(document):
+    return document.unit_scale
+
+
+def point_by_coordinates(x, y, z):
+    return Point(x, y, z)
+
+
+def surface_by_perimeter_points(points):
+    return Surface.ByPerimeterPoints(points)
+
+
+def short_curve_tolerance(document):
+    return Face.SHORT_EDGE
+
+
+# -------------------------------------------------------------------------------- #
+# ------------------------------ synthetic buildings ----------------------------- #
+# -------------------------------------------------------------------------------- #
+
+def _rectangle(origin, x_vector, y_vector):
+    """Four corners of a rectangle in counterclockwise order around x x y."""
+    return (origin, geometry.add(origin, x_vector),
+            geometry.add(geometry.add(origin, x_vector), y_vector),
+            geometry.add(origin, y_vector))
+
+
+def _scale(v, s):
+    return v[0] * s, v[1] * s, v[2] * s
+
+
+def create_building(room_count, windows_per_wall=1, curtain_wall_share=0,
+                    unbounded_share=0, degenerate_share=0, rooms_per_floor=None,
+                    room_size=(5000, 4000, 3000), panel_width=1500,
+                    wall_thickness=200, seed=0):
+    """Create a fake document with a synthetic building.
+
+    Rooms are boxes laid out in a grid on each floor and the floors are stacked on
+    top of each other. Walls between two rooms and floors between two levels are
+    shared between the rooms. Each exterior wall is either a basic wall with windows
+    or a curtain wall with a grid of system panels.
+
+    The new document is also set as the current document.
+
+    Args:
+        room_count: Number of rooms.
+        windows_per_wall: Number of windows in each exterior basic wall.
+        curtain_wall_share: A number between 0 and 1 for the share of the exterior
+            walls that are curtain walls.
+        unbounded_share: A number between 0 and 1 for the share of the room faces
+            without any boundary elements.
+        degenerate_share: A number between 0 and 1 for the share of the rooms with a
+            degenerate floor face. The floor has a very short edge and converting
+            it to Dynamo fails.
+        rooms_per_floor: Maximum number of rooms on each floor (Default: 25).
+        room_size: Room size as (x, y, height).
+        panel_width: Maximum width of curtain panels.
+        wall_thickness: Thickness of the walls.
+        seed: Random seed for picking the curtain walls, unbounded faces and
+            degenerate rooms.
+
+    Returns:
+        The fake document. Use document.rooms to get the rooms.
+    """
+    rnd = random.Random(seed)
+    doc = Document('synthetic building with %d rooms' % room_count)
+    rooms_per_floor = min(rooms_per_floor or 25, room_count) or 1
+    nx = int(math.ceil(math.sqrt(rooms_per_floor)))
+    sx, sy, sz = room_size
+    phase = Element(doc, doc.new_id(), 'New Construction', 'Phases')
+    doc.phase_id = phase.Id
+    floor_count = int(math.ceil(float(room_count) / rooms_per_floor))
+    levels = [Level(doc, doc.new_id(), 'Level %d' % (floor + 1), floor * sz)
+              for floor in range(floor_count + 1)]
+    basic_window = FamilySymbol('Fixed', 'Fixed Window', doc.new_id())
+    system_panel = FamilySymbol('System Panel', 'Glazed', doc.new_id())
+
+    # index of all the rooms (floor, i, j)
+    cells = set()
+    for count in range(room_count):
+        floor, index = divmod(count, rooms_per_floor)
+        cells.add((floor, index % nx, index // nx))
+
+    # host elements are created once and shared between the rooms
+    hosts = {}
+
+    def _wall(key, start, x_vector, exterior):
+        if key in hosts:
+            return hosts[key]
+        y_vector = (0, 0, sz)
+        normal = geometry.normalize(geometry.cross(x_vector, y_vector))
+        side = geometry.add(start, _scale(normal, wall_thickness / 2.0))
+        is_curtain = exterior and rnd.random() < curtain_wall_share
+        if is_curtain:
+            wall = HostElement(doc, doc.new_id(), Face(_rectangle(start, x_vector,
+                                                                  y_vector)),
+                               'Curtain Wall', 'Walls', 'Curtain Wall')
+            wall.LevelId = levels[key[1]].Id
+            width = geometry.length(x_vector)
+            columns = max(1, int(math.ceil(width / panel_width)))
+            panel_x = _scale(x_vector, 1.0 / columns)
+            panel_y = _scale(y_vector, 0.5)
+            panel_ids = []
+            for c in range(columns):
+                for r in range(2):
+                    origin = geometry.add(geometry.add(start, _scale(panel_x, c)),
+                                          _scale(panel_y, r))
+                    panel = FamilyInstance(doc, doc.new_id(), system_panel,
+                                           _rectangle(origin, panel_x, panel_y),
+                                           'CurtainWallPanels')
+                    panel.LevelId = wall.LevelId
+                    panel_ids.append(panel.Id)
+            wall.CurtainGrid = CurtainGrid(panel_ids)
+        else:
+            openings = []
+            window_count = windows_per_wall if exterior else 0
+            for w in range(window_count):
+                u = (w + 0.25) / window_count
+                origin = geometry.add(
+                    geometry.add(side, _scale(x_vector, u)), _scale(y_vector, 0.3))
+                openings.append(
+                    _rectangle(origin, _scale(x_vector, 0.5 / window_count),
+                               _scale(y_vector, 0.4)))
+            wall = HostElement(
+                doc, doc.new_id(),
+                Face(_rectangle(side, x_vector, y_vector),
+                     tuple(tuple(reversed(o)) for o in openings)),
+                'Generic - 200mm', 'Walls', 'Basic Wall')
+            wall.LevelId = levels[key[1]].Id
+            for opening in openings:
+                wall.inserts.append(FamilyInstance(
+                    doc, doc.new_id(), basic_window, opening, 'Windows'))
+                wall.inserts[-1].LevelId = wall.LevelId
+        hosts[key] = wall
+        return wall
+
+    def _slab(level, i, j):
+        key = ('slab', level, i, j)
+        if key not in hosts:
+            top = (level, i, j) not in cells and (level - 1, i, j) in cells
+            origin = (i * sx, j * sy, level * sz)
+            face = Face(_rectangle(origin, (sx, 0, 0), (0, sy, 0)))
+            if top:
+                hosts[key] = HostElement(doc, doc.new_id(), face, 'Generic Roof',
+                                         'Roofs', 'Basic Roof')
+            else:
+                hosts[key] = HostElement(doc, doc.new_id(), face, 'Generic Floor',
+                                         'Floors', 'Floor')
+            hosts[key].LevelId = levels[level].Id
+        return hosts[key]
+
+    for count, (floor, i, j) in enumerate(sorted(cells)):
+        x0, y0, z0 = i * sx, j * sy, floor * sz
+        height = (0, 0, sz)
+        walls = (
+            # south, east, north, west. Faces point outside the room.
+            (('x', floor, i, j), (x0, y0, z0), (sx, 0, 0), (floor, i, j - 1)),
+            (('y', floor, i + 1, j), (x0 + sx, y0, z0), (0, sy, 0), (floor, i + 1, j)),
+            (('x', floor, i, j + 1), (x0 + sx, y0 + sy, z0), (-sx, 0, 0),
+             (floor, i, j + 1)),
+            (('y', floor, i, j), (x0, y0 + sy, z0), (0, -sy, 0), (floor, i - 1, j))
+        )
+        boundaries = []
+        for key, start, x_vector, neighbour in walls:
+            wall = _wall(key, start, x_vector, neighbour not in cells)
+            boundaries.append((_rectangle(start, x_vector, height), wall))
+        floor_boundary = _rectangle((x0, y0, z0), (0, sy, 0), (sx, 0, 0))
+        if rnd.random() < degenerate_share:
+            # add a vertex very close to the first corner
+            floor_boundary = (floor_boundary[0],
+                              geometry.add(floor_boundary[0], (0, 1e-5, 0))) + \
+                floor_boundary[1:]
+        boundaries.append((floor_boundary, _slab(floor, i, j)))
+        boundaries.append((_rectangle((x0, y0, z0 + sz), (sx, 0, 0), (0, sy, 0)),
+                           _slab(floor + 1, i, j)))
+        faces = [
+            Face(boundary,
+                 hosts=() if rnd.random() < unbounded_share else (host.Id,))
+            for boundary, host in boundaries
+        ]
+        room = Room(doc, doc.new_id(), 'Room %d' % (count + 1), faces, floor)
+        room.LevelId = levels[floor].Id
+
+    set_current_document(doc)
+    return doc
@@ -0,0 +1,426 @@
+"""Geometry functions that work with plain (x, y, z) values.
+
+These functions don't need Revit or Dynamo and are used to replace calls to the
+geometry kernel in the loops.
+"""
+import math
+
+from .backend import get_backend
+
+
+def xyz(point):
+    """Get (x, y, z) for a Dynamo point or a list of three numbers."""
+    try:
+        return point.X, point.Y, point.Z
+    except AttributeError:
+        return point[0], point[1], point[2]
+
+
+def add(a, b):
+    return a[0] + b[0], a[1] + b[1], a[2] + b[2]
+
+
+def subtract(a, b):
+    return a[0] - b[0], a[1] - b[1], a[2] - b[2]
+
+
+def dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def cross(a, b):
+    return (a[1] * b[2] - a[2] * b[1],
+            a[2] * b[0] - a[0] * b[2],
+            a[0] * b[1] - a[1] * b[0])
+
+
+def length(v):
+    return math.sqrt(v[0] * v[0] + v[1] * v[1] + v[2] * v[2])
+
+
+def normalize(v):
+    ln = length(v)
+    return v[0] / ln, v[1] / ln, v[2] / ln
+
+
+def transform_points(points, origin, basis_x, basis_y, basis_z, scale=1.0):
+    """Transform (x, y, z) values from a local coordinate system.
+
+    Args:
+        points: List of (x, y, z) values in the local coordinate system.
+        origin: Origin of the local coordinate system.
+        basis_x, basis_y, basis_z: Axes of the local coordinate system.
+        scale: A scale for origin (e.g. for a Revit origin and Dynamo points).
+    """
+    ox, oy, oz = origin[0] * scale, origin[1] * scale, origin[2] * scale
+    xx, xy, xz = basis_x
+    yx, yy, yz = basis_y
+    zx, zy, zz = basis_z
+    return [(ox + x * xx + y * yx + z * zx,
+             oy + x * xy + y * yy + z * zy,
+             oz + x * xz + y * yz + z * zz) for x, y, z in points]
+
+
+def newell_normal(points):
+    """Normal of a polygon using Newell's method.
+
+    The normal follows the order of the points and its length is twice the area of
+    the polygon.
+    """
+    nx = ny = nz = 0
+    for count, (x0, y0, z0) in enumerate(points):
+        x1, y1, z1 = points[count - len(points) + 1]
+        nx += (y0 - y1) * (z0 + z1)
+        ny += (z0 - z1) * (x0 + x1)
+        nz += (x0 - x1) * (y0 + y1)
+    return nx, ny, nz
+
+
+def weld_points(values, tolerance):
+    """Merge the points that are closer than tolerance.
+
+    Points are bucketed in a uniform grid with the cell size of tolerance and each
+    point is only checked against the points in the neighbouring cells.
+
+    Args:
+        values: A flat list of x, y, z values (e.g. an array.array('d')).
+        tolerance: Distance for merging the points.
+
+    Returns:
+        A tuple of (points, indices). points is the list of the welded (x, y, z)
+        values. The first point of each group is kept. indices is the index of the
+        welded point for each input point.
+    """
+    cells = {}
+    points = []
+    indices = []
+    size = float(tolerance) or 1e-9
+    sq_tolerance = tolerance * tolerance
+    neighbours = tuple((i, j, k) for i in (0, -1, 1) for j in (0, -1, 1)
+                       for k in (0, -1, 1))
+    for count in range(0, len(values), 3):
+        x, y, z = values[count], values[count + 1], values[count + 2]
+        cx, cy, cz = int(math.floor(x / size)), int(math.floor(y / size)), \
+            int(math.floor(z / size))
+        index = None
+        for i, j, k in neighbours:
+            for candidate in cells.get((cx + i, cy + j, cz + k), ()):
+                px, py, pz = points[candidate]
+                if (px - x) ** 2 + (py - y) ** 2 + (pz - z) ** 2 <= sq_tolerance:
+                    index = candidate
+                    break
+            if index is not None:
+                break
+        if index is None:
+            index = len(points)
+            points.append((x, y, z))
+            cells.setdefault((cx, cy, cz), []).append(index)
+        indices.append(index)
+    return points, indices
+
+
+def chain_edges(edges):
+    """Chain a list of edges into an ordered loop.
+
+    The direction of the edges is not important.
+
+    Args:
+        edges: A list of (start, end) point indices. Edges with the same start and
+            end (i.e. welded edges) are ignored.
+
+    Returns:
+        A list of point indices in the order of the loop starting from the start of
+        the first edge or None if the edges don't make a single closed loop.
+    """
+    edges = [(s, e) for s, e in edges if s != e]
+    if len(edges) < 3:
+        return None
+    # point index: list of edge indices
+    point_edges = {}
+    for count, (s, e) in enumerate(edges):
+        point_edges.setdefault(s, []).append(count)
+        point_edges.setdefault(e, []).append(count)
+    if any(len(ids) != 2 for ids in point_edges.values()):
+        return None
+    start, current = edges[0]
+    loop = [start]
+    previous = 0
+    while current != start:
+        loop.append(current)
+        first, second = point_edges[current]
+        previous = second if first == previous else first
+        s, e = edges[previous]
+        current = e if s == current else s
+    if len(loop) != len(edges):
+        # more than one loop
+        return None
+    return loop
+
+
+def plane_from_points(points):
+    """Calculate a plane from a list of (x, y, z) values.
+
+    The order of points is not important.
+
+    Returns:
+        (origin, normal) or None if all the points are collinear.
+    """
+    if len(points) < 3:
+        return None
+    origin = points[0]
+    far = max(points, key=lambda p: length(subtract(p, origin)))
+    axis = subtract(far, origin)
+    if length(axis) == 0:
+        return None
+    normal = max((cross(axis, subtract(p, origin)) for p in points), key=length)
+    if length(normal) == 0:
+        return None
+    return origin, normalize(normal)
+
+
+def planarity_deviation(points, origin, normal):
+    """Maximum distance between points and a plane."""
+    return max(abs(dot(subtract(p, origin), normal)) for p in points)
+
+
+def project_to_plane(points, origin, normal):
+    """Project a list of (x, y, z) values to a plane in one pass."""
+    ox, oy, oz = origin
+    nx, ny, nz = normal
+    projected = []
+    for x, y, z in points:
+        d = (x - ox) * nx + (y - oy) * ny + (z - oz) * nz
+        projected.append((x - d * nx, y - d * ny, z - d * nz))
+    return projected
+
+
+def plane_axes(normal):
+    """Get two unit vectors perpendicular to the normal and to each other."""
+    helper = (1, 0, 0) if abs(normal[0]) < 0.9 else (0, 1, 0)
+    x_axis = normalize(cross(helper, normal))
+    y_axis = cross(normal, x_axis)
+    return x_axis, y_axis
+
+
+def to_plane_coordinates(points, origin, x_axis, y_axis):
+    """Get (u, v) values of points in a plane coordinate system."""
+    return [(dot(subtract(p, origin), x_axis), dot(subtract(p, origin), y_axis))
+            for p in points]
+
+
+def convex_hull(points):
+    """Calculate 2D convex hull for a list of (u, v) values.
+
+    Returns the hull in counterclockwise order without collinear points.
+    """
+    pts = sorted(set(points))
+    if len(pts) < 3:
+        return pts
+
+    def _cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    lower = []
+    for p in pts:
+        while len(lower) >= 2 and _cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    upper = []
+    for p in reversed(pts):
+        while len(upper) >= 2 and _cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return lower[:-1] + upper[:-1]
+
+
+def _edge_distances(point, polygon):
+    """Signed distance of a (u, v) point to the edges of a counterclockwise polygon.
+
+    Positive values are inside.
+    """
+    u, v = point
+    for count, (u0, v0) in enumerate(polygon):
+        u1, v1 = polygon[count - len(polygon) + 1]
+        du, dv = u1 - u0, v1 - v0
+        ln = math.sqrt(du * du + dv * dv)
+        yield (du * (v - v0) - dv * (u - u0)) / ln
+
+
+def is_inside_convex(point, polygon, tolerance=0):
+    """Check if a (u, v) point is inside a counterclockwise convex polygon."""
+    return all(d >= -tolerance for d in _edge_distances(point, polygon))
+
+
+def is_on_boundary(point, polygon, tolerance=0):
+    """Check if a (u, v) point is on the boundary of a convex polygon."""
+    distances = tuple(_edge_distances(point, polygon))
+    return all(d >= -tolerance for d in distances) and \
+        min(abs(d) for d in distances) <= tolerance
+
+
+def closest_point_on_segment(point, start, end):
+    """Closest point to point on a line segment."""
+    direction = subtract(end, start)
+    ln = dot(direction, direction)
+    t = 0 if ln == 0 else min(max(dot(subtract(point, start), direction) / ln, 0), 1)
+    return (start[0] + t * direction[0], start[1] + t * direction[1],
+            start[2] + t * direction[2])
+
+
+class Polygon(object):
+    """A planar and convex polygon.
+
+    Use it instead of a Dynamo face in FaceProjector to project points without
+    Dynamo.
+
+    Args:
+        vertices: List of Dynamo points or (x, y, z) values.
+    """
+
+    def __init__(self, vertices):
+        self.vertices = tuple(xyz(v) for v in vertices)
+        self._plane = None
+
+    def ClosestPointTo(self, point):
+        """Closest point on the polygon to a point as (x, y, z)."""
+        point = xyz(point)
+        if self._plane is None:
+            plane = plane_from_points(self.vertices)
+            if not plane:
+                self._plane = ()
+            else:
+                x_axis, y_axis = plane_axes(plane[1])
+                outline = convex_hull(
+                    to_plane_coordinates(self.vertices, plane[0], x_axis, y_axis))
+                self._plane = plane[0], plane[1], x_axis, y_axis, outline
+        if self._plane:
+            origin, normal, x_axis, y_axis, outline = self._plane
+            projected = project_to_plane((point,), origin, normal)[0]
+            uv = to_plane_coordinates((projected,), origin, x_axis, y_axis)[0]
+            if len(outline) > 2 and is_inside_convex(uv, outline):
+                return projected
+        count = len(self.vertices)
+        return min((closest_point_on_segment(point, self.vertices[i - 1],
+                                             self.vertices[i])
+                    for i in range(count)),
+                   key=lambda pt: length(subtract(pt, point)))
+
+
+class FaceProjector(object):
+    """Project points to a Dynamo face.
+
+    Planar and convex faces are projected using the plane of the face in one batch.
+    For other faces and for points that are projected outside the face the
+    projector falls back to calling ClosestPointTo for each point.
+
+    face can also be a Polygon to project the points without Dynamo.
+
+    Plane of the face is only calculated the first time that a point is projected.
+
+    Args:
+        face: A Dynamo face.
+        tolerance: Maximum distance between the vertices of the face and the plane
+            for the face to be considered planar. Batch projection results will be
+            within this tolerance from ClosestPointTo results (Default: 0.001).
+    """
+
+    def __init__(self, face, tolerance=None):
+        self.face = face
+        self.tolerance = tolerance or 0.001
+        self._plane = None
+        self._outline = None
+        self._is_initiated = False
+        # number of points that went through ClosestPointTo
+        self.fallback_count = 0
+
+    def _initiate(self):
+        self._is_initiated = True
+        if isinstance(self.face, Polygon):
+            points = self.face.vertices
+        else:
+            dynamo_points = tuple(v.PointGeometry for v in self.face.Vertices)
+            points = tuple(xyz(pt) for pt in dynamo_points)
+            for pt in dynamo_points:
+                if hasattr(pt, 'Dispose'):
+                    pt.Dispose()
+        plane = plane_from_points(points)
+        if not plane or planarity_deviation(points, *plane) > self.tolerance:
+            return
+        origin, normal = plane
+        x_axis, y_axis = plane_axes(normal)
+        uvs = to_plane_coordinates(points, origin, x_axis, y_axis)
+        outline = convex_hull(uvs)
+        if len(outline) < 3 or \
+                not all(is_on_boundary(uv, outline, self.tolerance) for uv in uvs):
+            # the face is not convex or it has holes
+            return
+        self._plane = origin, normal, x_axis, y_axis
+        # inward unit normal and start point for each edge of the outline
+        self._outline = []
+        for count, (u0, v0) in enumerate(outline):
+            u1, v1 = outline[count - len(outline) + 1]
+            du, dv = u1 - u0, v1 - v0
+            ln = math.sqrt(du * du + dv * dv)
+            self._outline.append((u0, v0, -dv / ln, du / ln))
+
+    @property
+    def is_planar(self):
+        """True if the face can be used for batch projection."""
+        if not self._is_initiated:
+            self._initiate()
+        return self._plane is not None
+
+    def _closest_point(self, point):
+        self.fallback_count += 1
+        if isinstance(self.face, Polygon):
+            return self.face.ClosestPointTo(point)
+        is_temporary = isinstance(point, tuple)
+        if is_temporary:
+            # (x, y, z) values
+            point = get_backend().point_by_coordinates(*point)
+        pt = self.face.ClosestPointTo(point)
+        coordinates = xyz(pt)
+        for geo in (pt, point) if is_temporary else (pt,):
+            if hasattr(geo, 'Dispose'):
+                geo.Dispose()
+        return coordinates
+
+    def project(self, points):
+        """Project a list of Dynamo points or (x, y, z) values to the face.
+
+        Returns:
+            A tuple of projected points as (x, y, z) values.
+        """
+        points = tuple(points)
+        if not self.is_planar:
+            return tuple(self._closest_point(pt) for pt in points)
+
+        (ox, oy, oz), (nx, ny, nz), (xx, xy, xz), (yx, yy, yz) = self._plane
+        outline = self._outline
+        tol = -self.tolerance
+        projected = []
+        for pt in points:
+            x, y, z = xyz(pt)
+            x, y, z = x - ox, y - oy, z - oz
+            d = x * nx + y * ny + z * nz
+            x, y, z = x - d * nx, y - d * ny, z - d * nz
+            u = x * xx + y * xy + z * xz
+            v = x * yx + y * yy + z * yz
+            for u0, v0, eu, ev in outline:
+                if (u - u0) * eu + (v - v0) * ev < tol:
+                    # projected point is outside the face
+                    projected.append(self._closest_point(pt))
+                    break
+            else:
+                projected.append((x + ox, y + oy, z + oz))
+        return tuple(projected)
+
+
+def face_projector(face, tolerance=None):
+    """Get a FaceProjector for a Dynamo face.
+
+    If the input is already a FaceProjector it will be returned as is.
+    """
+    if isinstance(face, FaceProjector):
+        return face
+    return FaceProjector(face, tolerance)
@@ -0,0 +1,109 @@
+"""Lifetime of Dynamo geometries.
+
+Dynamo geometries keep their memory in the geometry kernel until they are disposed.
+A GeometryScope keeps track of the geometries that are created while it is active
+and disposes all of them when it ends, even if there is an error. Only the (x, y, z)
+values should leave the scope.
+
+    with GeometryScope(report) as scope:
+        faces = scope.track_all(backend.to_proto_type(revit_face))
+        vertices = tuple(geometry.xyz(v.PointGeometry) for v in faces[0].Vertices)
+
+Functions that don't get the scope use track and track_all to add the geometries to
+the innermost active scope of the thread. Geometries that are created outside a
+scope are not tracked.
+
+The number of live geometries is the number of tracked geometries that are not
+disposed yet. The peak is added to the live_geometries peak of the report.
+"""
+import threading
+
+from .instrumentation import get_report
+
+_local = threading.local()
+
+
+def _scopes():
+    try:
+        return _local.scopes
+    except AttributeError:
+        _local.scopes = []
+        return _local.scopes
+
+
+class GeometryScope(object):
+    """Dispose the Dynamo geometries that are created in a with block.
+
+    Args:
+        report: An optional instrumentation.Report to record the peak number of live
+            geometries (live_geometries) and the number of disposed geometries
+            (disposed_geometries).
+    """
+
+    # tracked geometries in all the scopes that are not disposed yet
+    live_count = 0
+
+    def __init__(self, report=None):
+        self.report = get_report(report)
+        self.peak_count = 0
+        self._geometries = []
+
+    def __enter__(self):
+        _scopes().append(self)
+        self.peak_count = GeometryScope.live_count
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        scopes = _scopes()
+        if scopes and scopes[-1] is self:
+            scopes.pop()
+        self.dispose()
+        return False
+
+    def __len__(self):
+        return len(self._geometries)
+
+    def track(self, geometry):
+        """Dispose geometry when the scope ends and return it."""
+        if geometry is not None and hasattr(geometry, 'Dispose'):
+            self._geometries.append(geometry)
+            GeometryScope.live_count += 1
+            if GeometryScope.live_count > self.peak_count:
+                self.peak_count = GeometryScope.live_count
+        return geometry
+
+    def track_all(self, geometries):
+        """Dispose a list of geometries when the scope ends and return them as a
+        tuple."""
+        return tuple(self.track(geo) for geo in geometries)
+
+    def dispose(self):
+        """Dispose all the tracked geometries."""
+        geometries, self._geometries = self._geometries, []
+        for geo in reversed(geometries):
+            geo.Dispose()
+        GeometryScope.live_count -= len(geometries)
+        # the peak of a nested scope is also the peak for the outer scopes
+        for scope in _scopes():
+            scope.peak_count = max(scope.peak_count, self.peak_count)
+        self.report.peak('live_geometries', self.peak_count)
+        self.report.count('disposed_geometries', len(geometries))
+
+
+def current_scope():
+    """Get the innermost active scope or None."""
+    scopes = _scopes()
+    return scopes[-1] if scopes else None
+
+
+def track(geometry):
+    """Add a geometry to the innermost active scope and return it."""
+    scope = current_scope()
+    return scope.track(geometry) if scope is not None else geometry
+
+
+def track_all(geometries):
+    """Add a list of geometries to the innermost active scope and return them as a
+    tuple."""
+    scope = current_scope()
+    return scope.track_all(geometries) if scope is not None else tuple(geometries)
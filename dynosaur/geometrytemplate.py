@@ -0,0 +1,133 @@
+"""Cache for the geometry of repeated family types.
+
+A facade usually has thousands of curtain panels and windows but only a few types.
+Converting the geometry of each instance to Dynamo is the slowest part of getting
+the panels. GeometryTemplateCache converts the symbol geometry of each type once and
+keeps the outer face of each solid as (x, y, z) values in symbol coordinates. Each
+instance only transforms the template with the transform of its geometry instance.
+
+Instances of the same type can have different symbol geometries (e.g. system panels
+with different sizes). Templates are keyed by the type and the symbol geometry id.
+If the symbol geometry id is not available (Revit 2022 and older) the bounding box of
+the symbol geometry is used instead.
+"""
+from collections import OrderedDict
+
+from . import util
+from . import geometry
+from . import geometryscope
+from .backend import get_backend
+
+
+def _outer_face(solid):
+    """Get (area, vertices, center) for the largest face of a Dynamo solid.
+
+    Returns None if the solid doesn't have any faces. Dynamo geometries are added to
+    the active geometry scope.
+    """
+    faces = geometryscope.track_all(solid.Faces) if solid else ()
+    if not faces:
+        return None
+    surfaces = geometryscope.track_all(face.SurfaceGeometry() for face in faces)
+    areas = tuple(surface.Area for surface in surfaces)
+    index = areas.index(max(areas))
+    points = geometryscope.track_all(v.PointGeometry for v in faces[index].Vertices)
+    center = geometryscope.track(surfaces[index].PointAtParameter(0.5, 0.5))
+    return areas[index], tuple(geometry.xyz(pt) for pt in points), \
+        geometry.xyz(center)
+
+
+class GeometryTemplateCache(object):
+    """Least recently used cache for the outer faces of family types.
+
+    Args:
+        opt: Revit geometry options for getting the geometry of the instances.
+        max_templates: Maximum number of templates in the cache. Least recently
+            used templates are removed first (Default: 1000).
+        context: An optional util.DocumentContext for the unit scale.
+    """
+
+    def __init__(self, opt, max_templates=1000, context=None):
+        self.opt = opt
+        self.context = context
+        self.max_templates = max_templates
+        self.hits = 0
+        self.misses = 0
+        self._scale = None
+        # template key: tuple of (area, vertices, center) or None for each solid
+        self._templates = OrderedDict()
+
+    def __len__(self):
+        return len(self._templates)
+
+    @staticmethod
+    def _key(symbol_id, geometry_instance):
+        get_id = getattr(geometry_instance, 'GetSymbolGeometryId', None)
+        if get_id is not None:
+            return symbol_id, get_id().AsUniqueIdentifier()
+        bbox = geometry_instance.GetSymbolGeometry().GetBoundingBox()
+        return (symbol_id,) + tuple(
+            round(v, 6) for pt in (bbox.Min, bbox.Max) for v in (pt.X, pt.Y, pt.Z))
+
+    def _template(self, symbol_id, geometry_instance):
+        key = self._key(symbol_id, geometry_instance)
+        try:
+            template = self._templates.pop(key)
+        except KeyError:
+            self.misses += 1
+            backend = get_backend()
+            with geometryscope.GeometryScope() as scope:
+                solids = scope.track_all(
+                    backend.to_proto_type(geo)
+                    for geo in geometry_instance.GetSymbolGeometry())
+                template = tuple(_outer_face(solid) for solid in solids)
+            while len(self._templates) >= self.max_templates:
+                self._templates.popitem(last=False)
+        else:
+            self.hits += 1
+        self._templates[key] = template
+        return template
+
+    def outer_faces(self, instance):
+        """Get the outer face of each solid of a family instance.
+
+        Args:
+            instance: A Revit family instance.
+
+        Returns:
+            A list of (area, vertices, center) in Dynamo units for each solid of the
+            instance. Solids without faces are None. Returns None if the geometry
+            of the instance is not a geometry instance and the template can't be
+            used.
+        """
+        symbol = getattr(instance, 'Symbol', None)
+        if symbol is None:
+            return None
+        geometries = tuple(instance.get_Geometry(self.opt))
+        if not all(hasattr(geo, 'GetSymbolGeometry') for geo in geometries):
+            return None
+        if self._scale is None:
+            self._scale = self.context.unit_scale if self.context is not None \
+                else util.unit_conversion(instance.Document)
+        faces = []
+        for geo in geometries:
+            transform = geo.Transform
+            basis = tuple(geometry.xyz(v) for v in (
+                transform.Origin, transform.BasisX, transform.BasisY,
+                transform.BasisZ))
+            for outer_face in self._template(symbol.Id.IntegerValue, geo):
+                if outer_face is None:
+                    faces.append(None)
+                    continue
+                area, vertices, center = outer_face
+                points = geometry.transform_points(
+                    vertices + (center,), *basis, scale=self._scale)
+                faces.append((area, tuple(points[:-1]), points[-1]))
+        return faces
+
+    def clear(self):
+        """Remove all the templates from the cache."""
+        self._templates = OrderedDict()
+
+    def __repr__(self):
+        return 'GeometryTemplateCache: %d templates' % len(self._templates)
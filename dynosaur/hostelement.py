@@ -0,0 +1,106 @@
+"""Cache for the data of the boundary elements of the rooms.
+
+A wall that bounds several rooms shows up once for each room face. The family, the
+inserts and the opening loops of a host element don't depend on the room and are
+calculated once in a run. Only projecting the openings to the room face is done for
+each face.
+"""
+from collections import OrderedDict
+
+from . import util
+from . import window
+from .instrumentation import get_report
+
+
+class HostElementCache(object):
+    """Least recently used cache for host element data keyed by element id.
+
+    Args:
+        opt: Revit geometry options for getting the geometry of the host elements.
+        max_elements: Maximum number of host elements in the cache. Least recently
+            used elements are removed first (Default: 5000).
+        context: An optional util.DocumentContext. The family names of the element
+            types are cached in the context and are kept for the whole run.
+    """
+
+    def __init__(self, opt, max_elements=5000, context=None):
+        self.opt = opt
+        self.context = context
+        self.max_elements = max_elements
+        self.hits = 0
+        self.misses = 0
+        # element id: {'family': ..., 'inserts': ..., 'opening_loops': ...}
+        self._elements = OrderedDict()
+
+    def __len__(self):
+        return len(self._elements)
+
+    def _record(self, host_element):
+        key = host_element.Id.IntegerValue
+        try:
+            record = self._elements.pop(key)
+        except KeyError:
+            record = {}
+            while len(self._elements) >= self.max_elements:
+                self._elements.popitem(last=False)
+        self._elements[key] = record
+        return record
+
+    def _get(self, host_element, name, func, report):
+        record = self._record(host_element)
+        try:
+            value = record[name]
+        except KeyError:
+            self.misses += 1
+            report.count('host_cache_misses')
+            value = record[name] = func()
+        else:
+            self.hits += 1
+            report.count('host_cache_hits')
+        return value
+
+    def family(self, host_element, report=None):
+        """Family name of a host element (e.g. Basic Wall, Curtain Wall)."""
+        def _family():
+            if self.context is not None:
+                return self.context.family(host_element)
+            return util.get_parameter(host_element, 'Family')
+
+        return self._get(host_element, 'family', _family, get_report(report))
+
+    def inserts(self, host_element, report=None):
+        """Child elements of a host element (see window.get_child_elemenets).
+
+        The time for finding the inserts is added to find_inserts stage of report.
+        """
+        report = get_report(report)
+
+        def _inserts():
+            start = report.start()
+            inserts = window.get_child_elemenets(host_element)
+            report.add_time('find_inserts', start)
+            return inserts
+
+        return self._get(host_element, 'inserts', _inserts, report)
+
+    def opening_loops(self, host_element, report=None):
+        """Opening loops of a host element (see window.extract_opening_loops).
+
+        The time for getting the loops is added to extraction stage of report.
+        """
+        report = get_report(report)
+
+        def _opening_loops():
+            start = report.start()
+            loops = window.extract_opening_loops(host_element, self.opt)
+            report.add_time('extraction', start)
+            return loops
+
+        return self._get(host_element, 'opening_loops', _opening_loops, report)
+
+    def clear(self):
+        """Remove all the elements from the cache."""
+        self._elements = OrderedDict()
+
+    def __repr__(self):
+        return 'HostElementCache: %d elements' % len(self._elements)
@@ -0,0 +1,275 @@
+"""Timing and counters for creating rooms.
+
+Pass a Report to create_rooms or iter_rooms to find out where the time goes:
+
+    report = instrumentation.Report()
+    rooms, elements, log = create_rooms(revit_rooms, report=report)
+    print(report)
+    report.slowest_rooms(10)
+
+Stages:
+    setup: Creating the calculator, the host element cache and the curtain panel
+        index for the rooms (see dynosaur.create_extractors).
+    spatial: CalculateSpatialElementGeometry.
+    conversion: Converting the room faces to Dynamo (ToProtoType and the edge
+        fallback).
+    face_vertices: Getting the vertices of the Dynamo room faces.
+    boundary: Getting the boundary faces of the room faces and their host elements
+        and families.
+    find_inserts: Finding the child elements of the boundary elements (FindInserts).
+    extraction: Getting the geometry of the windows and the curtain panels.
+    planarity: Finding the plane of the room faces with openings.
+    projection: Projecting the opening vertices to the room faces.
+    surfaces: Creating the surfaces and the fenestration surfaces of a room without
+        the projection.
+    deduplication: Removing the duplicated surfaces of a room.
+    resolve: Replacing the element references of the processed rooms with the
+        Revit elements.
+    assemble: Adding the rooms to the model of all the rooms (RoomModel.extend).
+    simplification: Removing the collinear vertices and merging the coplanar
+        surfaces (see dynosaur.simplify).
+    validation: Checking the geometry of the model (see dynosaur.validation).
+    adjacency: Matching the adjacent surfaces between the rooms.
+    cache: Reading and adding the rooms to the cache (see dynosaur.cache).
+
+Counters:
+    rooms, faces, surfaces, fen_surfaces, fallback_faces (room faces that are
+    recreated from the edges), fallback_points (opening vertices that are projected
+    using ClosestPointTo), duplicate_surfaces, adjacent_pairs, cache_hits,
+    cache_misses, host_cache_hits and host_cache_misses (see
+    hostelement.HostElementCache), template_hits and template_misses (see
+    geometrytemplate.GeometryTemplateCache). rooms only counts the rooms that are
+    not from the cache. disposed_geometries is the number of Dynamo geometries that
+    are disposed by the geometry scopes of the report (see geometryscope).
+    merged_surfaces and removed_vertices are the reductions of dynosaur.simplify.
+    validation_issues and fixed_issues are the issues of dynosaur.validation.
+    shards and cross_shard_pairs are the number of shards and the adjacent pairs
+    between the shards (see dynosaur.sharding).
+
+Peaks:
+    live_geometries: The maximum number of Dynamo geometries that are tracked by
+        geometryscope.GeometryScope and are not disposed yet.
+
+Functions that don't get a report use NULL_REPORT which doesn't record anything.
+"""
+import time
+
+try:
+    clock = time.perf_counter
+except AttributeError:
+    # IronPython 2.7
+    clock = time.clock if hasattr(time, 'clock') else time.time
+
+STAGES = ('setup', 'spatial', 'conversion', 'face_vertices', 'boundary',
+          'find_inserts', 'extraction', 'planarity', 'projection', 'surfaces',
+          'deduplication', 'resolve', 'assemble', 'simplification', 'validation',
+          'adjacency', 'cache')
+
+
+class Report(object):
+    """Record the time and the number of calls for each stage and for each room.
+
+    Time for a stage is recorded by getting the start time from start() and passing
+    it to add_time once the stage is done.
+
+        start = report.start()
+        ...
+        report.add_time('projection', start)
+
+    Args:
+        callback: An optional function that is called after each stage and each
+            room as callback(stage, room_id, elapsed). stage is 'room' once a room
+            is done. Use it to monitor long runs.
+        per_element: Record the time for the openings of each boundary element
+            (Default: True).
+    """
+
+    enabled = True
+
+    def __init__(self, callback=None, per_element=True):
+        self.callback = callback
+        self.per_element = per_element
+        # stage: [time, calls]
+        self.stages = dict((stage, [0.0, 0]) for stage in STAGES)
+        self.counters = {}
+        # counter: maximum value
+        self.peaks = {}
+        # room id: {stage: time, 'total': time}
+        self.rooms = {}
+        # element id: time
+        self.elements = {}
+        self.messages = []
+        self.total_time = 0.0
+        self._room_id = None
+        self._room = None
+        self._room_start = None
+
+    def start(self):
+        """Start time for a stage."""
+        return clock()
+
+    def add_time(self, stage, start):
+        """Add the time since start to a stage and to the current room."""
+        elapsed = clock() - start
+        try:
+            record = self.stages[stage]
+        except KeyError:
+            record = self.stages[stage] = [0.0, 0]
+        record[0] += elapsed
+        record[1] += 1
+        room = self._room
+        if room is not None:
+            room[stage] = room.get(stage, 0.0) + elapsed
+        if self.callback:
+            self.callback(stage, self._room_id, elapsed)
+        return elapsed
+
+    def add_element_time(self, element_id, start):
+        """Add the time since start to a boundary element."""
+        if self.per_element:
+            self.elements[element_id] = \
+                self.elements.get(element_id, 0.0) + clock() - start
+
+    def count(self, counter, value=1):
+        """Add value to a counter."""
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def peak(self, counter, value):
+        """Keep the maximum value for a counter."""
+        if value > self.peaks.get(counter, value - 1):
+            self.peaks[counter] = value
+
+    def log(self, message):
+        """Add a message to the report."""
+        self.messages.append(message)
+
+    def start_room(self, room_id):
+        """Start recording the stages for a room.
+
+        A room can be started several times (e.g. once for extracting the data from
+        Revit and once for processing it). Times are added to the same room.
+        """
+        self._room_id = room_id
+        self._room = self.rooms.setdefault(room_id, {})
+        self._room_start = clock()
+
+    def end_room(self):
+        """Stop recording the stages for the current room."""
+        elapsed = clock() - self._room_start
+        self._room['total'] = self._room.get('total', 0.0) + elapsed
+        self.total_time += elapsed
+        if self.callback:
+            self.callback('room', self._room_id, elapsed)
+        self._room_id = self._room = self._room_start = None
+
+    def merge(self, other):
+        """Add the stages, counters, rooms and messages from another report.
+
+        Use it to collect the reports from the workers (see pipeline). callback is
+        not called for the merged stages.
+        """
+        for stage, (elapsed, calls) in other.stages.items():
+            record = self.stages.setdefault(stage, [0.0, 0])
+            record[0] += elapsed
+            record[1] += calls
+        for counter, value in other.counters.items():
+            self.count(counter, value)
+        for counter, value in other.peaks.items():
+            self.peak(counter, value)
+        for room_id, times in other.rooms.items():
+            room = self.rooms.setdefault(room_id, {})
+            for key, value in times.items():
+                room[key] = room.get(key, 0.0) + value
+        for element_id, value in other.elements.items():
+            self.elements[element_id] = self.elements.get(element_id, 0.0) + value
+        self.messages.extend(other.messages)
+        self.total_time += other.total_time
+
+    def stage_time(self, stage):
+        """Total time for a stage."""
+        return self.stages.get(stage, (0.0, 0))[0]
+
+    def slowest_rooms(self, count=10):
+        """Get a list of (room id, time) for the slowest rooms."""
+        return sorted(((room_id, times['total'])
+                       for room_id, times in self.rooms.items()),
+                      key=lambda item: item[1], reverse=True)[:count]
+
+    def slowest_elements(self, count=10):
+        """Get a list of (element id, time) for the slowest boundary elements."""
+        return sorted(self.elements.items(),
+                      key=lambda item: item[1], reverse=True)[:count]
+
+    def to_dict(self):
+        """Get the report as a dictionary."""
+        return {
+            'stages': dict((stage, {'time': record[0], 'calls': record[1]})
+                           for stage, record in self.stages.items()),
+            'counters': dict(self.counters),
+            'peaks': dict(self.peaks),
+            'rooms': dict((str(room_id), dict(times))
+                          for room_id, times in self.rooms.items()),
+            'elements': dict((str(element_id), value)
+                             for element_id, value in self.elements.items()),
+            'messages': list(self.messages),
+            'total_time': self.total_time
+        }
+
+    def __str__(self):
+        lines = ['%d rooms in %.3f s' % (len(self.rooms), self.total_time)]
+        for stage in sorted(self.stages, key=lambda s: -self.stages[s][0]):
+            elapsed, calls = self.stages[stage]
+            if calls:
+                lines.append('  %-18s %9.3f s %8d calls' % (stage, elapsed, calls))
+        for counter in sorted(self.counters):
+            lines.append('  %-18s %9d' % (counter, self.counters[counter]))
+        for counter in sorted(self.peaks):
+            lines.append('  %-18s %9d peak' % (counter, self.peaks[counter]))
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return 'Report: %d rooms, %.3f s' % (len(self.rooms), self.total_time)
+
+
+class NullReport(Report):
+    """A report that doesn't record anything."""
+
+    enabled = False
+
+    def __init__(self):
+        Report.__init__(self)
+
+    def start(self):
+        return 0
+
+    def add_time(self, stage, start):
+        return 0
+
+    def add_element_time(self, element_id, start):
+        pass
+
+    def count(self, counter, value=1):
+        pass
+
+    def peak(self, counter, value):
+        pass
+
+    def log(self, message):
+        pass
+
+    def start_room(self, room_id):
+        pass
+
+    def end_room(self):
+        pass
+
+    def merge(self, other):
+        pass
+
+
+NULL_REPORT = NullReport()
+
+
+def get_report(report=None):
+    """Get the input report or NULL_REPORT if report is None."""
+    return NULL_REPORT if report is None else report
@@ -0,0 +1,207 @@
+"""Binary file format for RoomModel.
+
+A model file stores the arrays of a RoomModel as they are: float64 vertices, polygon
+offsets, parent indices and a string table for the names. Other processes can
+memory-map the file and use the arrays without parsing or copying them.
+
+    modelfile.write_model(rooms, 'C:/temp/model.dyno')
+    rooms = modelfile.read_model('C:/temp/model.dyno')
+
+File layout (little-endian):
+    header: magic (8 bytes), version (uint32), number of sections (uint32).
+    section table: name (8 bytes), type (8 bytes), offset (uint64) and number of
+        items (uint64) for each section.
+    sections: Each section starts at a multiple of 8 bytes.
+
+Sections:
+    counts (i8): Number of rooms, surfaces and fenestration surfaces.
+    vertices (f8): x, y, z values for all the polygons.
+    poly_off (i8): Polygon offsets. Vertices of polygon i are
+        vertices[3 * poly_off[i]:3 * poly_off[i + 1]].
+    srf_room, srf_poly, srf_adj (i4): Room index, polygon index and adjacent surface
+        index (-1 for none) for each surface.
+    srf_host (i8): Id of the host element for each surface (-1 for none).
+    fen_srf, fen_poly (i4): Surface index and polygon index for each fenestration
+        surface.
+    names (u1): Names of the rooms, surfaces and fenestration surfaces in this order
+        as UTF-8 text.
+    name_off (i8): Offsets of the names in names.
+
+Names that are not text (e.g. Revit elements and ElementIds) are written as their
+integer id.
+"""
+from array import array
+import mmap
+import struct
+import sys
+
+from .objects import RoomModel, name_text
+
+MAGIC = b'DYNOSAUR'
+VERSION = 1
+
+_HEADER = struct.Struct('<8sII')
+_SECTION = struct.Struct('<8s8sQQ')
+# type: (array typecode, item size)
+_TYPES = {'f8': ('d', 8), 'i4': ('i', 4), 'i8': ('q', 8), 'u1': ('B', 1)}
+
+
+def _to_bytes(values, kind):
+    """Little-endian bytes for a list of values."""
+    if kind == 'i8':
+        return struct.pack('<%dq' % len(values), *values)
+    data = array(_TYPES[kind][0], values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data.tobytes() if hasattr(data, 'tobytes') else data.tostring()
+
+
+def _from_buffer(buffer, offset, kind, count, use_view):
+    """Read a section as a memoryview on the buffer or as a copy."""
+    typecode, size = _TYPES[kind]
+    end = offset + count * size
+    if use_view and sys.byteorder == 'little':
+        try:
+            return memoryview(buffer)[offset:end].cast(typecode)
+        except (AttributeError, TypeError):
+            # IronPython 2.7 doesn't support casting memoryviews
+            pass
+    data = buffer[offset:end]
+    if kind == 'i8':
+        # there is no array type for int64 in Python 2
+        return list(struct.unpack('<%dq' % count, data))
+    values = array(typecode)
+    if hasattr(values, 'frombytes'):
+        values.frombytes(data)
+    else:
+        values.fromstring(data)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def write_model(model, path):
+    """Write a RoomModel to a binary model file.
+
+    Args:
+        model: A RoomModel.
+        path: Path to the model file.
+    """
+    names = [name_text(n).encode('utf-8')
+             for n in model.room_names + model.surface_names + model.fen_names]
+    name_offsets = [0]
+    for name in names:
+        name_offsets.append(name_offsets[-1] + len(name))
+    sections = [
+        ('counts', 'i8', _to_bytes([len(model.room_names), len(model.surface_names),
+                                    len(model.fen_names)], 'i8')),
+        ('vertices', 'f8', _to_bytes(model.vertices, 'f8')),
+        ('poly_off', 'i8', _to_bytes(list(model.polygon_offsets), 'i8')),
+        ('srf_room', 'i4', _to_bytes(model.surface_rooms, 'i4')),
+        ('srf_poly', 'i4', _to_bytes(model.surface_polygons, 'i4')),
+        ('srf_adj', 'i4', _to_bytes(model.surface_adjacents, 'i4')),
+        ('srf_host', 'i8', _to_bytes(
+            [h if h is not None else -1 for h in model.surface_hosts], 'i8')),
+        ('fen_srf', 'i4', _to_bytes(model.fen_surfaces, 'i4')),
+        ('fen_poly', 'i4', _to_bytes(model.fen_polygons, 'i4')),
+        ('names', 'u1', b''.join(names)),
+        ('name_off', 'i8', _to_bytes(name_offsets, 'i8'))
+    ]
+    _write_sections(path, sections)
+
+
+def _write_sections(path, sections, magic=MAGIC, version=VERSION):
+    """Write the header, the section table and the sections to a file.
+
+    sections is a list of (name, type, bytes). dynosaur.recording uses the same
+    layout with its own magic.
+    """
+    offset = _HEADER.size + _SECTION.size * len(sections)
+    table = []
+    for name, kind, data in sections:
+        if len(name) > 8:
+            raise ValueError('Section name %s is longer than 8 characters.' % name)
+        offset += -offset % 8
+        table.append(_SECTION.pack(name.encode('ascii'), kind.encode('ascii'),
+                                   offset, len(data) // _TYPES[kind][1]))
+        offset += len(data)
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(magic, version, len(sections)))
+        f.write(b''.join(table))
+        position = _HEADER.size + _SECTION.size * len(sections)
+        for name, kind, data in sections:
+            f.write(b'\0' * (-position % 8))
+            position += -position % 8
+            f.write(data)
+            position += len(data)
+
+
+def _read_sections(buffer, magic=MAGIC, version=VERSION, file_type='model'):
+    """Read the section table as {name: (type, offset, number of items)}."""
+    file_magic, file_version, count = _HEADER.unpack(buffer[:_HEADER.size])
+    if file_magic != magic:
+        raise ValueError('This is not a dynosaur %s file.' % file_type)
+    if file_version != version:
+        raise ValueError('%s file version %d is not supported.' % (
+            file_type.capitalize(), file_version))
+    sections = {}
+    for i in range(count):
+        start = _HEADER.size + i * _SECTION.size
+        name, kind, offset, length = _SECTION.unpack(
+            buffer[start:start + _SECTION.size])
+        sections[name.rstrip(b'\0').decode('ascii')] = \
+            kind.rstrip(b'\0').decode('ascii'), offset, length
+    return sections
+
+
+def read_model(path, use_mmap=True):
+    """Read a RoomModel from a binary model file.
+
+    Args:
+        path: Path to the model file.
+        use_mmap: Memory-map the file and use the arrays of the model as views to
+            the file without copying them. The model is read-only and the file stays
+            open until the model is deleted. Set it to False to read a copy that can
+            be edited (Default: True).
+
+    Returns:
+        A RoomModel. Surface hosts and names are read as integers and text.
+    """
+    with open(path, 'rb') as f:
+        if use_mmap:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buffer = f.read()
+    sections = _read_sections(buffer)
+
+    def _section(name, use_view=use_mmap):
+        kind, offset, count = sections[name]
+        return _from_buffer(buffer, offset, kind, count, use_view)
+
+    room_count, surface_count, _ = _section('counts', False)
+    name_offsets = _section('name_off', False)
+    kind, offset, count = sections['names']
+    text = buffer[offset:offset + count]
+    decoded = text.decode('utf-8')
+    if len(decoded) != len(text):
+        # byte offsets and text offsets are only the same for ASCII names
+        decoded = text
+    names = [decoded[name_offsets[i]:name_offsets[i + 1]]
+             for i in range(len(name_offsets) - 1)]
+    if decoded is text:
+        names = [name.decode('utf-8') for name in names]
+
+    model = RoomModel()
+    model.room_names = names[:room_count]
+    model.surface_names = names[room_count:room_count + surface_count]
+    model.fen_names = names[room_count + surface_count:]
+    model.vertices = _section('vertices')
+    model.polygon_offsets = _section('poly_off')
+    model.surface_rooms = _section('srf_room')
+    model.surface_polygons = _section('srf_poly')
+    model.surface_adjacents = _section('srf_adj')
+    model.surface_hosts = [h if h != -1 else None for h in _section('srf_host')]
+    model.fen_surfaces = _section('fen_srf')
+    model.fen_polygons = _section('fen_poly')
+    return model
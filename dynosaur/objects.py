@@ -1,26 +1,454 @@
-"""dynosaur objects: room, surface and child surface."""
-# TODO: change the objects to classes
+"""dynosaur objects: room, surface and child surface.
 
+All the rooms, surfaces and fenestration surfaces of an export are stored in a
+single RoomModel. Each entity is a row in a few flat arrays which point to their
+parent by index and all the vertices are stored in one float buffer. Room, Surface
+and FenSurface are light views to these arrays and can be used the same way as the
+dictionaries that dynosaur used to create (e.g. room['surfaces']). The functions that
+created and changed the dictionaries (create_room, add_surface_to_room, etc.) are
+kept and return the views.
+"""
+from array import array
 
+from .geometry import xyz
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+
+def name_text(name):
+    """Get a room, surface or fenestration surface name as text.
+
+    Names that are not text (e.g. Revit elements and ElementIds) are converted to
+    their integer id.
+    """
+    if isinstance(name, string_types):
+        return name
+    value = getattr(name, 'IntegerValue', None)
+    if value is None:
+        value = getattr(getattr(name, 'Id', None), 'IntegerValue',
+                        getattr(name, 'Id', None))
+    return str(value if value is not None else name)
+
+
+def _group_by_parent(parents, count):
+    """Group child indices by parent index.
+
+    Returns offsets and order so children of parent i are
+    order[offsets[i]:offsets[i + 1]].
+    """
+    offsets = array('l', [0] * (count + 1))
+    for p in parents:
+        offsets[p + 1] += 1
+    for i in range(count):
+        offsets[i + 1] += offsets[i]
+    position = array('l', offsets[:-1])
+    order = array('l', [0] * len(parents))
+    for child, p in enumerate(parents):
+        order[position[p]] = child
+        position[p] += 1
+    return offsets, order
+
+
+class RoomModel(object):
+    """A collection of rooms, surfaces and fenestration surfaces.
+
+    Polygons for surfaces and fenestration surfaces share the same vertices buffer.
+    Vertices of polygon i are stored in
+    vertices[3 * polygon_offsets[i]:3 * polygon_offsets[i + 1]] as x, y, z values.
+
+    Iterate over the model to get the rooms.
+
+    Usage:
+        model = RoomModel()
+        room = model.add_room('room_1')
+        srf = model.add_surface(room, 'wall', ((0, 0, 0), (1, 0, 0), (1, 0, 1)))
+        model.add_fen_surface(srf, 'glz', ((0.2, 0, 0.2), (0.8, 0, 0.2), (0.8, 0, 0.8)))
+        for room in model:
+            for surface in room['surfaces']:
+                print(surface['vertices'])
+    """
+
+    def __init__(self):
+        self.room_names = []
+
+        self.surface_names = []
+        self.surface_rooms = array('l')
+        self.surface_polygons = array('l')
+        # id of the Revit element that hosts the surface or None
+        self.surface_hosts = []
+        # index of the adjacent surface or -1
+        self.surface_adjacents = array('l')
+
+        self.fen_names = []
+        self.fen_surfaces = array('l')
+        self.fen_polygons = array('l')
+
+        self.polygon_offsets = array('l', [0])
+        self.vertices = array('d')
+
+        self._room_surfaces = None
+        self._surface_fens = None
+
+    def __len__(self):
+        return len(self.room_names)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.room_names)
+        if not 0 <= index < len(self.room_names):
+            raise IndexError('room index out of range')
+        return Room(self, index)
+
+    def __iter__(self):
+        return (Room(self, i) for i in range(len(self.room_names)))
+
+    @property
+    def rooms(self):
+        """List of rooms."""
+        return list(self)
+
+    @property
+    def surface_count(self):
+        return len(self.surface_names)
+
+    @property
+    def fen_surface_count(self):
+        return len(self.fen_names)
+
+    def _add_polygon(self, vertices):
+        start = len(self.vertices)
+        self.vertices.extend(c for pt in vertices or () for c in xyz(pt))
+        count = (len(self.vertices) - start) // 3
+        self.polygon_offsets.append(self.polygon_offsets[-1] + count)
+        return len(self.polygon_offsets) - 2
+
+    def polygon(self, index):
+        """Get vertices of a polygon as a tuple of (x, y, z)."""
+        values = self.vertices[3 * self.polygon_offsets[index]:
+                               3 * self.polygon_offsets[index + 1]]
+        return tuple(zip(values[0::3], values[1::3], values[2::3]))
+
+    def add_room(self, name):
+        """Add a new room to model and return the room."""
+        self.room_names.append(name)
+        self._room_surfaces = None
+        return Room(self, len(self.room_names) - 1)
+
+    def add_surface(self, room, name, vertices=None, host_id=None):
+        """Add a new surface to a room and return the surface.
+
+        Args:
+            room: A room or index of the room.
+            name: Surface name.
+            vertices: List of Dynamo points or (x, y, z) values.
+            host_id: Optional id for the Revit element that hosts the surface.
+        """
+        room = getattr(room, 'index', room)
+        self.surface_names.append(name)
+        self.surface_rooms.append(room)
+        self.surface_polygons.append(self._add_polygon(vertices))
+        self.surface_hosts.append(host_id)
+        self.surface_adjacents.append(-1)
+        self._room_surfaces = None
+        self._surface_fens = None
+        return Surface(self, len(self.surface_names) - 1)
+
+    def add_fen_surface(self, surface, name, vertices=None):
+        """Add a new fenestration surface to a surface and return it.
+
+        Args:
+            surface: A surface or index of the surface.
+            name: Fenestration surface name.
+            vertices: List of Dynamo points or (x, y, z) values.
+        """
+        surface = getattr(surface, 'index', surface)
+        self.fen_names.append(name)
+        self.fen_surfaces.append(surface)
+        self.fen_polygons.append(self._add_polygon(vertices))
+        self._surface_fens = None
+        return FenSurface(self, len(self.fen_names) - 1)
+
+    def extend(self, other):
+        """Add all the rooms from another RoomModel to this model."""
+        room_offset = len(self.room_names)
+        surface_offset = len(self.surface_names)
+        polygon_offset = len(self.polygon_offsets) - 1
+        point_offset = self.polygon_offsets[-1]
+
+        self.room_names.extend(other.room_names)
+
+        self.surface_names.extend(other.surface_names)
+        self.surface_rooms.extend(r + room_offset for r in other.surface_rooms)
+        self.surface_polygons.extend(p + polygon_offset for p in other.surface_polygons)
+        self.surface_hosts.extend(other.surface_hosts)
+        self.surface_adjacents.extend(a + surface_offset if a != -1 else -1
+                                      for a in other.surface_adjacents)
+
+        self.fen_names.extend(other.fen_names)
+        self.fen_surfaces.extend(s + surface_offset for s in other.fen_surfaces)
+        self.fen_polygons.extend(p + polygon_offset for p in other.fen_polygons)
+
+        self.polygon_offsets.extend(o + point_offset for o in other.polygon_offsets[1:])
+        self.vertices.extend(other.vertices)
+
+        self._room_surfaces = None
+        self._surface_fens = None
+
+    def set_fen_surface_parent(self, fen_index, surface_index):
+        """Move a fenestration surface to another surface."""
+        self.fen_surfaces[fen_index] = surface_index
+        self._surface_fens = None
+
+    def set_adjacent_surfaces(self, surface_index, other_index):
+        """Set two surfaces as adjacent to each other."""
+        self.surface_adjacents[surface_index] = other_index
+        self.surface_adjacents[other_index] = surface_index
+
+    def remove_surfaces(self, indices, fen_indices=()):
+        """Remove surfaces and their fenestration surfaces from the model.
+
+        Surfaces and fenestration surfaces are re-indexed and the vertices buffer is
+        compacted.
+
+        Args:
+            indices: Indices of the surfaces.
+            fen_indices: Indices of fenestration surfaces to remove from the
+                surfaces that are kept.
+        """
+        removed = set(indices)
+        removed_fens = set(fen_indices)
+        if not removed and not removed_fens:
+            return
+        surface_map = array('l', [-1] * len(self.surface_names))
+        kept_surfaces = [i for i in range(len(self.surface_names)) if i not in removed]
+        for new, old in enumerate(kept_surfaces):
+            surface_map[old] = new
+        kept_fens = [i for i, s in enumerate(self.fen_surfaces)
+                     if surface_map[s] != -1 and i not in removed_fens]
+
+        polygon_offsets, vertices = self.polygon_offsets, self.vertices
+        self.polygon_offsets = array('l', [0])
+        self.vertices = array('d')
+
+        def _copy_polygon(index):
+            self.vertices.extend(
+                vertices[3 * polygon_offsets[index]:3 * polygon_offsets[index + 1]])
+            self.polygon_offsets.append(len(self.vertices) // 3)
+            return len(self.polygon_offsets) - 2
+
+        self.surface_names = [self.surface_names[i] for i in kept_surfaces]
+        self.surface_rooms = array('l', (self.surface_rooms[i] for i in kept_surfaces))
+        self.surface_hosts = [self.surface_hosts[i] for i in kept_surfaces]
+        self.surface_adjacents = array(
+            'l', (surface_map[self.surface_adjacents[i]]
+                  if self.surface_adjacents[i] != -1 else -1
+                  for i in kept_surfaces))
+        self.fen_names = [self.fen_names[i] for i in kept_fens]
+        self.fen_surfaces = array('l', (surface_map[self.fen_surfaces[i]]
+                                        for i in kept_fens))
+
+        surface_polygons, fen_polygons = self.surface_polygons, self.fen_polygons
+        self.surface_polygons = array(
+            'l', (_copy_polygon(surface_polygons[i]) for i in kept_surfaces))
+        self.fen_polygons = array(
+            'l', (_copy_polygon(fen_polygons[i]) for i in kept_fens))
+
+        self._room_surfaces = None
+        self._surface_fens = None
+
+    def room_surfaces(self, room_index):
+        """Get indices of surfaces for a room."""
+        if self._room_surfaces is None:
+            self._room_surfaces = _group_by_parent(self.surface_rooms,
+                                                   len(self.room_names))
+        offsets, order = self._room_surfaces
+        return order[offsets[room_index]:offsets[room_index + 1]]
+
+    def surface_fen_surfaces(self, surface_index):
+        """Get indices of fenestration surfaces for a surface."""
+        if self._surface_fens is None:
+            self._surface_fens = _group_by_parent(self.fen_surfaces,
+                                                  len(self.surface_names))
+        offsets, order = self._surface_fens
+        return order[offsets[surface_index]:offsets[surface_index + 1]]
+
+
+class _ModelView(object):
+    """Base class for views to a RoomModel row.
+
+    Views support the same keys as the dictionaries that dynosaur used to create.
+    """
+
+    __slots__ = ('model', 'index')
+    _keys = ()
+
+    def __init__(self, model, index):
+        self.model = model
+        self.index = index
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key != 'name':
+            raise KeyError('%s is read-only.' % key)
+        self.name = value
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.model is other.model \
+            and self.index == other.index
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((id(self.model), self.index))
+
+    def keys(self):
+        return self._keys
+
+    def get(self, key, default=None):
+        return self[key] if key in self._keys else default
+
+    def to_dict(self):
+        """Get the data as nested dictionaries."""
+        return dict((k, self._to_dict_value(self[k])) for k in self._keys)
+
+    @staticmethod
+    def _to_dict_value(value):
+        if isinstance(value, list):
+            return [v.to_dict() for v in value]
+        return value
+
+    def __repr__(self):
+        return '%s: %s' % (self.__class__.__name__, self.name)
+
+
+class Room(_ModelView):
+    """A room in a RoomModel."""
+
+    __slots__ = ()
+    _keys = ('name', 'surfaces')
+
+    @property
+    def name(self):
+        return self.model.room_names[self.index]
+
+    @name.setter
+    def name(self, value):
+        self.model.room_names[self.index] = value
+
+    @property
+    def surfaces(self):
+        model = self.model
+        return [Surface(model, i) for i in model.room_surfaces(self.index)]
+
+    def add_surface(self, name, vertices=None, host_id=None):
+        """Add a new surface to this room and return the surface."""
+        return self.model.add_surface(self.index, name, vertices, host_id)
+
+
+class Surface(_ModelView):
+    """A surface in a RoomModel."""
+
+    __slots__ = ()
+    _keys = ('name', 'vertices', 'fen_surfaces', 'parent_id', 'adjacent_surface')
+
+    @property
+    def name(self):
+        return self.model.surface_names[self.index]
+
+    @name.setter
+    def name(self, value):
+        self.model.surface_names[self.index] = value
+
+    @property
+    def room(self):
+        return Room(self.model, self.model.surface_rooms[self.index])
+
+    @property
+    def parent_id(self):
+        return self.model.room_names[self.model.surface_rooms[self.index]]
+
+    @property
+    def host_id(self):
+        return self.model.surface_hosts[self.index]
+
+    @property
+    def adjacent_surface(self):
+        """Name of the adjacent surface or None."""
+        adjacent = self.model.surface_adjacents[self.index]
+        return self.model.surface_names[adjacent] if adjacent != -1 else None
+
+    @property
+    def vertices(self):
+        return self.model.polygon(self.model.surface_polygons[self.index])
+
+    @property
+    def fen_surfaces(self):
+        model = self.model
+        return [FenSurface(model, i) for i in model.surface_fen_surfaces(self.index)]
+
+    def add_fen_surface(self, name, vertices=None):
+        """Add a new fenestration surface to this surface and return it."""
+        return self.model.add_fen_surface(self.index, name, vertices)
+
+
+class FenSurface(_ModelView):
+    """A fenestration surface in a RoomModel."""
+
+    __slots__ = ()
+    _keys = ('name', 'vertices', 'parent_id')
+
+    @property
+    def name(self):
+        return self.model.fen_names[self.index]
+
+    @name.setter
+    def name(self, value):
+        self.model.fen_names[self.index] = value
+
+    @property
+    def surface(self):
+        return Surface(self.model, self.model.fen_surfaces[self.index])
+
+    @property
+    def parent_id(self):
+        return self.model.surface_names[self.model.fen_surfaces[self.index]]
+
+    @property
+    def vertices(self):
+        return self.model.polygon(self.model.fen_polygons[self.index])
+
+
+# functions of the dictionary API. They build on RoomModel and return the views.
+# Surfaces and fenestration surfaces are copied when they are added to a room or to a
+# surface. Dictionaries in the old format can also be added.
 def create_room(name):
-    """Create a new room."""
-    new_room = {
-        'name': None,
-        'surfaces': []
-    }
-    new_room['name'] = name
-    return new_room
+    """Create a new room in its own RoomModel."""
+    return RoomModel().add_room(name)
 
 
 def add_surface_to_room(room, surface):
-    """Add a surface to the room."""
-    room['surfaces'].append(surface)
+    """Add a copy of a surface and its fenestration surfaces to the room."""
+    new_surface = room.add_surface(surface['name'], surface['vertices'],
+                                   getattr(surface, 'host_id', None))
+    add_fenestrations_to_surface(new_surface, surface.get('fen_surfaces') or ())
     return room
 
 
 def add_surfaces_to_room(room, surfaces):
-    """Add surfaces to the room."""
-    room['surfaces'].extend(surfaces)
+    """Add copies of surfaces to the room."""
+    for surface in surfaces:
+        add_surface_to_room(room, surface)
     return room
 
 
@@ -32,43 +460,28 @@ def change_room_name(room, new_name):
 
 # dynosaur surfaces
 def create_surface(name, parent_id=None, vertices=None):
-    """Create a new surface."""
-    vertices = vertices or []
-    new_surface = {
-        'name': None,
-        'vertices': [],
-        'fen_surfaces': [],
-        'parent_id': None
-    }
-    new_surface['name'] = name
-    new_surface['parent_id'] = parent_id
-    new_surface['vertices'] = vertices
-    return new_surface
+    """Create a new surface in a room named parent_id in its own RoomModel."""
+    return create_room(parent_id).add_surface(name, vertices)
 
 
 def create_fen_surface(name, parent_id=None, vertices=None):
-    """Create a new fenestration surface."""
-    vertices = vertices or []
-    new_surface = {
-        'name': None,
-        'vertices': [],
-        'parent_id': None
-    }
-    new_surface['name'] = name
-    new_surface['parent_id'] = parent_id
-    new_surface['vertices'] = vertices
-    return new_surface
+    """Create a new fenestration surface in a surface named parent_id.
+
+    The surface is in its own RoomModel.
+    """
+    return create_surface(parent_id).add_fen_surface(name, vertices)
 
 
 def add_fenestration_to_surface(surface, fenestration):
-    """Add a fenestration surface to a surface."""
-    surface['fen_surfaces'].append(fenestration)
+    """Add a copy of a fenestration surface to a surface."""
+    surface.add_fen_surface(fenestration['name'], fenestration['vertices'])
     return surface
 
 
 def add_fenestrations_to_surface(surface, fenestrations):
-    """Add several fenestration surfaces to surface."""
-    surface['fen_surfaces'].extend(fenestrations)
+    """Add copies of several fenestration surfaces to surface."""
+    for fenestration in fenestrations:
+        add_fenestration_to_surface(surface, fenestration)
     return surface
 
 
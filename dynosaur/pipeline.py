@@ -0,0 +1,442 @@
+"""Two phase pipeline for creating rooms.
+
+Revit API calls must stay on the Revit thread but most of the work after getting
+the coordinates from Revit is pure geometry. Creating a room is split into:
+
+    extract_room: Calls to Revit and Dynamo. Gets the room faces, the boundary
+        elements and the opening loops as (x, y, z) values and indices to a list of
+        Revit elements. It must run on the Revit thread.
+    process_room: Pure Python. Projects the openings to the room faces, removes the
+        degenerate openings and the duplicated surfaces and creates the room in a
+        RoomModel. It can run on other threads or processes.
+    resolve_room: Replaces the element references in the processed room with the
+        Revit elements. It runs on the Revit thread.
+
+Raw and processed rooms are plain Python objects that can be pickled. Use
+create_executor to create a pool of workers and process_rooms to process a chunk of
+rooms in a worker (see dynosaur.iter_rooms).
+"""
+import sys
+import threading
+
+from . import objects
+from . import util
+from . import room
+from . import curtainwall
+from . import geometry
+from . import adjacency
+from .instrumentation import Report, get_report
+from .geometryscope import GeometryScope
+
+try:
+    import queue
+except ImportError:
+    # IronPython 2.7
+    import Queue as queue
+
+# name of the room in processed rooms
+ROOM = ('room',)
+
+
+def _face_vertices(face):
+    """Vertices of a Dynamo face as (x, y, z) values."""
+    points = tuple(v.PointGeometry for v in face.Vertices)
+    vertices = tuple(geometry.xyz(pt) for pt in points)
+    for pt in points:
+        if hasattr(pt, 'Dispose'):
+            pt.Dispose()
+    return vertices
+
+
+def extract_room(revit_room, calculator, curtain_panels, host_elements, report=None,
+                 context=None):
+    """Extract the data for a room from Revit.
+
+    Args:
+        revit_room: A Revit room.
+        calculator: SpatialElementGeometryCalculator.
+        curtain_panels: A curtainwall.CurtainPanelIndex.
+        host_elements: A hostelement.HostElementCache.
+        report: An optional instrumentation.Report.
+        context: An optional util.DocumentContext of the document of the room.
+
+    Returns:
+        A tuple of (raw room, elements). elements is the list of Revit elements that
+        the raw room refers to by index. Each face of the raw room has the
+        geometry.FaceProjector for projecting its openings in process_room or None
+        if the face has no openings or its openings are already projected.
+    """
+    doc = revit_room.Document
+    cps = curtain_panels
+    report = get_report(report)
+    report.start_room(revit_room.Id.IntegerValue)
+    report.count('rooms')
+    room_label = str(revit_room.Id)
+    elements = []
+
+    # Dynamo geometries for the room are disposed at the end of the scope
+    with GeometryScope(report):
+        # calculate spatial data for revit room
+        start = report.start()
+        revit_room_spatial_data = calculator.CalculateSpatialElementGeometry(revit_room)
+
+        # get the geometry of the room
+        revit_room_geometry = revit_room_spatial_data.GetGeometry()
+        report.add_time('spatial', start)
+
+        # Cast revit room faces to dynamo geometry using ToProtoType method
+        start = report.start()
+        room_faces_dyn = room.get_dynamo_room_faces(
+            revit_room_geometry, doc, report, context)
+        report.add_time('conversion', start)
+        report.count('faces', len(room_faces_dyn))
+
+        assert revit_room_geometry.Faces.Size == len(room_faces_dyn), \
+            "Number of rooms elements ({}) doesn't match number of faces ({}).\n" \
+            "Make sure the Room is bounded.".format(revit_room_geometry.Faces.Size,
+                                                    len(room_faces_dyn))
+
+        faces = []
+        for count, face in enumerate(revit_room_geometry.Faces):
+            # base face is useful to project the openings to room boundary
+            base_face_dyn = room_faces_dyn[count]
+            start = report.start()
+            polygon = _face_vertices(base_face_dyn)
+            report.add_time('face_vertices', start)
+            # projector is only created for the faces with openings. Openings of
+            # planar faces are projected in process_room. Other faces need Dynamo and
+            # their openings are projected here with the fallback projector.
+            projector = fallback = None
+
+            start = report.start()
+            boundary_faces = revit_room_spatial_data.GetBoundaryFaceInfo(face)
+            report.add_time('boundary', start)
+
+            if len(boundary_faces) == 0:
+                # There is no boundary face! I don't know what does this exactly mean
+                # in the Revit world but now that there is no boundary face we can just
+                # use the dynamo face and create the surface!
+                faces.append((polygon, None, None))
+                continue
+
+            subfaces = []
+            for boundary_face in boundary_faces:
+                # boundary_face is a SpatialElementBoundarySubface
+                # we need to get the element (Wall, Roof, etc) first
+                start = report.start()
+                boundary_element = doc.GetElement(
+                    boundary_face.SpatialBoundaryElement.HostElementId
+                )
+                element_start = report.start()
+
+                # collect element id for each face.
+                host_index = len(elements)
+                elements.append(doc.GetElement(
+                    boundary_face.SpatialBoundaryElement.HostElementId
+                ))
+                family = host_elements.family(boundary_element, report)
+                report.add_time('boundary', start)
+
+                # time to find child surfaces (e.g. windows!)
+                # this is the reason dynosaur exists in the first place
+                kind, loops, children = None, (), ()
+
+                # Take care of curtain wall systems
+                # This will most likely fail for custom curtain walls
+                if family == 'Curtain Wall':
+                    start = report.start()
+                    panels, loops = curtainwall.find_curtain_panels(cps, base_face_dyn)
+                    report.add_time('extraction', start)
+                    kind = 'curtain'
+                    children = []
+                    for panel in panels:
+                        # panel is used as the name and the element for the panel is
+                        # added to the elements
+                        name_index = element_index = len(elements)
+                        elements.append(panel)
+                        try:
+                            elm = boundary_element.Document.GetElement(panel)
+                        except TypeError:
+                            pass
+                        else:
+                            element_index = len(elements)
+                            elements.append(elm)
+                        children.append((name_index, element_index, str(panel)))
+                else:
+                    # collect child elements for non-curtain wall systems
+                    childelement_collector = \
+                        host_elements.inserts(boundary_element, report)
+
+                    if childelement_collector:
+                        # opening loops are shared between the rooms on both sides of
+                        # the element. Only projecting them is done for each face.
+                        kind = 'window'
+                        loops = host_elements.opening_loops(boundary_element, report)
+                        children = []
+                        for child in childelement_collector:
+                            children.append((len(elements), str(child.Id)))
+                            elements.append(child)
+
+                if kind and projector is None and fallback is None:
+                    start = report.start()
+                    projector = geometry.FaceProjector(geometry.Polygon(polygon))
+                    is_planar = projector.is_planar
+                    report.add_time('planarity', start)
+                    if not is_planar:
+                        projector = None
+                        fallback = geometry.FaceProjector(base_face_dyn)
+
+                if kind and fallback is not None:
+                    start = report.start()
+                    loops = tuple(fallback.project(loop) for loop in loops)
+                    report.add_time('projection', start)
+
+                subfaces.append((
+                    "%s_%s" % (room_label, boundary_element.Id),
+                    boundary_element.Id.IntegerValue, host_index, kind, loops,
+                    tuple(children)
+                ))
+                report.add_element_time(boundary_element.Id.IntegerValue, element_start)
+
+                # clean up!
+                boundary_element.Dispose()
+
+            faces.append((polygon, projector, tuple(subfaces)))
+            if fallback is not None:
+                report.count('fallback_points', fallback.fallback_count)
+
+        # clean up!
+        revit_room_spatial_data.Dispose()
+    report.end_room()
+    return (revit_room.Id.IntegerValue, room_label, tuple(faces)), elements
+
+
+def process_room(raw_room, tolerance=None, report=None):
+    """Create a room from a raw room.
+
+    Args:
+        raw_room: A raw room from extract_room.
+        tolerance: Tolerance for finding duplicated surfaces
+            (Default: adjacency.DEFAULT_TOLERANCE).
+        report: An optional instrumentation.Report.
+
+    Returns:
+        A tuple of (model, element indices, log). model is a RoomModel with a single
+        room. Names that refer to Revit elements are tuples and are replaced in
+        resolve_room.
+    """
+    room_id, room_label, faces = raw_room
+    report = get_report(report)
+    report.start_room(room_id)
+    # initiate zone based on room id
+    room_model = objects.RoomModel()
+    new_room = room_model.add_room(ROOM)
+    elements = []
+    log = []
+    fallback_count = 0
+    # projection time is left out of the time for creating the surfaces
+    start = report.start()
+    projection_time = 0.0
+
+    for polygon, projector, subfaces in faces:
+        if subfaces is None:
+            new_room.add_surface(
+                "%s_%s" % (room_label, util.create_uuid()),
+                polygon
+            )
+            continue
+
+        for name, host_id, host_index, kind, loops, children in subfaces:
+            # initiate honeybee surface
+            # Revit is strange! if two roofs have a shared wall then it will be
+            # duplicated! Duplicated surfaces are removed once all the surfaces
+            # are created.
+            new_surface = new_room.add_surface(name, polygon, host_id)
+            elements.append(host_index)
+
+            if kind is None:
+                continue
+
+            if projector is not None:
+                projection_start = report.start()
+                loops = tuple(projector.project(loop) for loop in loops)
+                projection_time += report.add_time('projection', projection_start)
+
+            if kind == 'curtain':
+                for (name_index, element_index, label), coordinate in \
+                        zip(children, loops):
+                    if not coordinate:
+                        log.append("{} has an opening with less than "
+                                   "two coordinates. It has been removed!"
+                                   .format(label))
+                        continue
+
+                    # create honeybee surface - use element id as the name
+                    new_surface.add_fen_surface(('element', name_index), coordinate)
+                    elements.append(element_index)
+            else:
+                # filter the loops with their children so the ids stay in order
+                for (child_index, label), coordinate in zip(children, loops):
+                    if len(set(coordinate)) < 3:
+                        log.append("{} has an opening with less than "
+                                   "three coordinates. It has been removed!"
+                                   .format(label))
+                        continue
+
+                    # create honeybee surface - use element id as the name
+                    new_surface.add_fen_surface(('element_id', child_index),
+                                                coordinate)
+                    elements.append(child_index)
+
+        if projector is not None:
+            fallback_count += projector.fallback_count
+    report.add_time('surfaces', start + projection_time)
+
+    # remove duplicated surfaces
+    start = report.start()
+    report.count('duplicate_surfaces',
+                 adjacency.remove_duplicate_surfaces(room_model, tolerance))
+    report.add_time('deduplication', start)
+
+    report.count('fallback_points', fallback_count)
+    report.count('surfaces', room_model.surface_count)
+    report.count('fen_surfaces', room_model.fen_surface_count)
+    report.end_room()
+    return room_model, elements, log
+
+
+def resolve_room(processed_room, elements, room_id, report=None):
+    """Replace the element references in a processed room.
+
+    Args:
+        processed_room: A processed room from process_room.
+        elements: The list of Revit elements from extract_room.
+        room_id: Id of the Revit room.
+        report: An optional instrumentation.Report.
+
+    Returns:
+        A tuple of (room, elements, log). room is the only room in its RoomModel.
+    """
+    report = get_report(report)
+    start = report.start()
+    room_model, element_indices, log = processed_room
+    resolve_model(room_model, [elements], [room_id])
+    room_elements = [elements[i] for i in element_indices]
+    report.add_time('resolve', start)
+    return room_model[0], room_elements, log
+
+
+def resolve_model(model, elements, room_ids, report=None):
+    """Replace the element references in a model of processed rooms.
+
+    Args:
+        model: A RoomModel with processed rooms (e.g. the rooms of a shard).
+        elements: The list of Revit elements from extract_room for each room.
+        room_ids: Id of the Revit room for each room.
+        report: An optional instrumentation.Report.
+    """
+    report = get_report(report)
+    start = report.start()
+    surface_rooms = model.surface_rooms
+
+    def _resolve(name, room):
+        if not isinstance(name, tuple):
+            return name
+        kind, index = name
+        element = elements[room][index]
+        return element if kind == 'element' else element.Id
+
+    model.room_names = list(room_ids)
+    model.surface_names = [_resolve(name, surface_rooms[i])
+                           for i, name in enumerate(model.surface_names)]
+    model.fen_names = [_resolve(name, surface_rooms[model.fen_surfaces[i]])
+                       for i, name in enumerate(model.fen_names)]
+    report.add_time('resolve', start)
+
+
+def process_rooms(raw_rooms, tolerance=None):
+    """Process a chunk of raw rooms in a worker.
+
+    Returns:
+        A tuple of (processed rooms, report). Merge the report to the main report.
+    """
+    report = Report(per_element=False)
+    return [process_room(raw_room, tolerance, report) for raw_room in raw_rooms], \
+        report
+
+
+class _Future(object):
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+
+    def result(self):
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class ThreadExecutor(object):
+    """A minimal thread pool with the same submit and shutdown methods as the
+    executors in concurrent.futures.
+
+    It is used where concurrent.futures is not available (e.g. IronPython 2.7).
+    IronPython doesn't have a global interpreter lock and the threads run in
+    parallel.
+    """
+
+    def __init__(self, max_workers):
+        self._tasks = queue.Queue()
+        self._threads = []
+        for _ in range(max_workers):
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            future, func, args = task
+            try:
+                future._result = func(*args)
+            except Exception as error:
+                future._error = error
+            future._done.set()
+
+    def submit(self, func, *args):
+        future = _Future()
+        self._tasks.put((future, func, args))
+        return future
+
+    def shutdown(self, wait=True):
+        for _ in self._threads:
+            self._tasks.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+def create_executor(workers, processes=None):
+    """Create a pool of workers for processing the rooms.
+
+    Args:
+        workers: Number of workers.
+        processes: Use processes instead of threads. By default processes are used
+            if concurrent.futures is available and it is not IronPython.
+    """
+    if processes is None:
+        processes = sys.platform != 'cli'
+    try:
+        # concurrent.futures is only imported when workers are used
+        from concurrent import futures
+    except ImportError:
+        return ThreadExecutor(workers)
+    if processes:
+        return futures.ProcessPoolExecutor(workers)
+    return futures.ThreadPoolExecutor(workers)
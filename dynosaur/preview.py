@@ -0,0 +1,107 @@
+"""Flat vertex buffers for previewing the rooms.
+
+preview_buffers copies the polygons of a RoomModel to two buffers. One has the
+opaque surfaces and the other has the glazing (fenestration surfaces). Each buffer
+has the same layout as the RoomModel: one float array for all the x, y, z values and
+an offsets array for the polygons. Every surface and every fenestration surface is
+one polygon. Curtain wall panels and windows are both flat polygons in the glazing
+buffer.
+
+    opaque, glazing = preview_buffers(model)
+    for i in range(len(glazing)):
+        points = glazing.polygon(i)
+        room_name = model.room_names[glazing.rooms[i]]
+        element_id = glazing.hosts[i]
+
+A viewer can use the arrays directly without walking the rooms.
+"""
+from array import array
+
+from . import util
+
+
+class PreviewBuffer(object):
+    """Polygons for previewing the rooms.
+
+    Vertices of polygon i are stored in vertices[3 * offsets[i]:3 * offsets[i + 1]]
+    as x, y, z values.
+
+    Attributes:
+        vertices: A float array of x, y, z values for all the polygons.
+        offsets: Index of the first vertex of each polygon. The last item is the
+            number of vertices.
+        rooms: Index of the room of each polygon in the RoomModel.
+        surfaces: Index of the surface (opaque) or the fenestration surface
+            (glazing) of each polygon in the RoomModel.
+        hosts: Integer id of the Revit element of each polygon or None. It is the
+            host element of the surfaces (RoomModel.surface_hosts) and the element
+            of the fenestration surfaces (e.g. the window or the curtain panel).
+    """
+
+    __slots__ = ('vertices', 'offsets', 'rooms', 'surfaces', 'hosts')
+
+    def __init__(self):
+        self.vertices = array('d')
+        self.offsets = array('l', [0])
+        self.rooms = array('l')
+        self.surfaces = array('l')
+        # ids can be larger than the items of an array in IronPython
+        self.hosts = []
+
+    def __len__(self):
+        return len(self.rooms)
+
+    @property
+    def vertex_count(self):
+        return self.offsets[-1]
+
+    def _add_polygons(self, model, polygons, rooms, hosts):
+        """Copy polygons of model and set their room, surface index and host."""
+        offsets, values = model.polygon_offsets, model.vertices
+        vertices, new_offsets = self.vertices, self.offsets
+        for polygon in polygons:
+            start, end = offsets[polygon], offsets[polygon + 1]
+            vertices.extend(values[3 * start:3 * end])
+            new_offsets.append(new_offsets[-1] + end - start)
+        self.rooms.extend(rooms)
+        self.surfaces.extend(range(len(polygons)))
+        self.hosts.extend(hosts)
+
+    def polygon(self, index):
+        """Get vertices of a polygon as a tuple of (x, y, z)."""
+        values = self.vertices[3 * self.offsets[index]:3 * self.offsets[index + 1]]
+        return tuple(zip(values[0::3], values[1::3], values[2::3]))
+
+    def polygons(self):
+        """Iterate over the polygons as tuples of (x, y, z)."""
+        return (self.polygon(i) for i in range(len(self.rooms)))
+
+    def __repr__(self):
+        return 'PreviewBuffer: %d polygons, %d vertices' % (
+            len(self.rooms), self.vertex_count)
+
+
+def _element_id(name):
+    """Integer id of the element that is the name of a fenestration surface."""
+    value = getattr(name, 'IntegerValue', None)
+    return value if value is not None else util.element_id_value(name)
+
+
+def preview_buffers(model):
+    """Get the preview buffers for the surfaces and the fenestration surfaces.
+
+    Args:
+        model: A RoomModel (e.g. the rooms from create_rooms).
+
+    Returns:
+        A tuple of (opaque, glazing) PreviewBuffers. Polygons are in the same order
+        as the surfaces and the fenestration surfaces of the model.
+    """
+    opaque, glazing = PreviewBuffer(), PreviewBuffer()
+    surface_rooms = model.surface_rooms
+    opaque._add_polygons(model, model.surface_polygons, surface_rooms,
+                         model.surface_hosts)
+    glazing._add_polygons(model, model.fen_polygons,
+                          (surface_rooms[s] for s in model.fen_surfaces),
+                          (_element_id(name) for name in model.fen_names))
+    return opaque, glazing
@@ -0,0 +1,252 @@
+"""Record the raw rooms of a run and replay them without Revit.
+
+Extracting the rooms from Revit is the only part of create_rooms that needs Revit.
+A recording keeps the raw rooms from pipeline.extract_room: the room faces, the host
+element of each boundary face, the inserts and the opening loops and curtain panels
+of each host. Replaying a recording runs the rest of the pipeline so tolerances and
+processing settings can be changed and profiled outside Revit:
+
+    rooms, elements, log = create_rooms(revit_rooms, record='C:/temp/model.dynr')
+
+and later on any machine:
+
+    rooms, elements, log = dynosaur.replay_rooms('model.dynr', tolerance=0.005)
+
+Revit elements are recorded as their integer ids and are replayed as
+RecordedElements. Rooms that are loaded from the cache are not extracted and are not
+recorded.
+
+A recording file has the same layout as a model file (see dynosaur.modelfile) with
+these sections:
+    meta (u1): Settings of the recorded run as JSON text.
+    room_id (i8), face_off (i8), elem_off (i8): Id of each room and the offsets of
+        its faces and elements.
+    elements (i8): Element ids (-1 for none).
+    vertices (f8), poly_off (i8): x, y, z values of the room faces and the opening
+        loops and their offsets. Vertices of polygon i are
+        vertices[3 * poly_off[i]:3 * poly_off[i + 1]].
+    fc_poly (i4), fc_flag (u1), sub_off (i8): Polygon, flags (1: opening loops
+        are projected in process_room, 2: has boundary faces) and the offsets of
+        the boundary faces for each face.
+    sub_host (i8), sub_elem (i4), sub_kind (u1), loop_off (i8), ch_off (i8):
+        Host id, host element index, kind (0: none, 1: window, 2: curtain), the
+        offsets of the opening loops and the offsets of the children for each
+        boundary face.
+    lp_poly (i4): Polygon of each opening loop.
+    child_a (i4), child_b (i4): Element indices of each child. child_b is -1 for
+        the windows.
+    names (u1), name_off (i8): Room labels, boundary face names and child labels in
+        this order as UTF-8 text.
+"""
+import json
+
+from . import geometry
+from . import util
+from .modelfile import _from_buffer, _read_sections, _to_bytes, _write_sections
+
+MAGIC = b'DYNOREC\0'
+VERSION = 1
+
+_KINDS = (None, 'window', 'curtain')
+
+
+class RecordedElement(object):
+    """Stand-in for a Revit element in a replayed room.
+
+    It has the same Id and IntegerValue members as a Revit element and an ElementId
+    so names and elements of the replayed rooms work the same as the rooms from
+    create_rooms.
+    """
+
+    __slots__ = ('IntegerValue',)
+
+    def __init__(self, value):
+        self.IntegerValue = value
+
+    @property
+    def Id(self):
+        return self
+
+    def __eq__(self, other):
+        return isinstance(other, RecordedElement) and \
+            self.IntegerValue == other.IntegerValue
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.IntegerValue)
+
+    def __str__(self):
+        return str(self.IntegerValue)
+
+    def __repr__(self):
+        return 'RecordedElement: %d' % self.IntegerValue
+
+
+def _element_value(element):
+    """Integer id of an element or an ElementId or -1."""
+    value = util.element_id_value(element)
+    if value is None:
+        value = getattr(element, 'IntegerValue', None)
+    return value if value is not None else -1
+
+
+class Recording(object):
+    """Raw rooms of a run.
+
+    Args:
+        settings: Optional settings of the run (e.g. document and boundary_location).
+            They are saved with the recording and are only for information.
+
+    Attributes:
+        rooms: List of (raw room, element ids) for each room. element ids are the
+            integer ids of the elements of the room from extract_room (-1 for none).
+    """
+
+    def __init__(self, settings=None):
+        self.settings = dict(settings or {})
+        self.rooms = []
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def add(self, raw_room, elements):
+        """Add a raw room and its elements from pipeline.extract_room."""
+        self.rooms.append((raw_room, [_element_value(e) for e in elements]))
+
+    def elements(self, index):
+        """Get the RecordedElements of a room (None for the missing elements)."""
+        return [RecordedElement(v) if v != -1 else None for v in self.rooms[index][1]]
+
+    def save(self, path):
+        """Write the recording to a file."""
+        write_recording(self, path)
+
+    def __repr__(self):
+        return 'Recording: %d rooms' % len(self.rooms)
+
+
+def write_recording(recording, path):
+    """Write a Recording to a recording file."""
+    columns = dict((name, []) for name in (
+        'room_id', 'face_off', 'elem_off', 'elements', 'vertices', 'poly_off',
+        'fc_poly', 'fc_flag', 'sub_off', 'sub_host', 'sub_elem', 'sub_kind',
+        'loop_off', 'lp_poly', 'ch_off', 'child_a', 'child_b'))
+    for name in ('face_off', 'elem_off', 'poly_off', 'sub_off', 'loop_off',
+                 'ch_off'):
+        columns[name].append(0)
+    labels, sub_names, child_labels = [], [], []
+    vertices, poly_off = columns['vertices'], columns['poly_off']
+
+    def _add_polygon(points):
+        for point in points:
+            vertices.extend(point)
+        poly_off.append(len(vertices) // 3)
+        return len(poly_off) - 2
+
+    for (room_id, room_label, faces), element_ids in recording.rooms:
+        columns['room_id'].append(room_id)
+        labels.append(room_label)
+        columns['elements'].extend(element_ids)
+        columns['elem_off'].append(len(columns['elements']))
+        for polygon, projector, subfaces in faces:
+            columns['fc_poly'].append(_add_polygon(polygon))
+            columns['fc_flag'].append(
+                (1 if projector is not None else 0) |
+                (2 if subfaces is not None else 0))
+            for name, host_id, host_index, kind, loops, children in subfaces or ():
+                sub_names.append(name)
+                columns['sub_host'].append(host_id)
+                columns['sub_elem'].append(host_index)
+                columns['sub_kind'].append(_KINDS.index(kind))
+                columns['lp_poly'].extend(_add_polygon(loop) for loop in loops)
+                columns['loop_off'].append(len(columns['lp_poly']))
+                for child in children:
+                    columns['child_a'].append(child[0])
+                    columns['child_b'].append(child[1] if len(child) == 3 else -1)
+                    child_labels.append(child[-1])
+                columns['ch_off'].append(len(columns['child_a']))
+            columns['sub_off'].append(len(columns['sub_host']))
+        columns['face_off'].append(len(columns['fc_poly']))
+
+    names = [name.encode('utf-8') for name in labels + sub_names + child_labels]
+    name_offsets = [0]
+    for name in names:
+        name_offsets.append(name_offsets[-1] + len(name))
+    meta = json.dumps(recording.settings, sort_keys=True).encode('utf-8')
+    sections = [('meta', 'u1', meta)]
+    for name, kind in (
+            ('room_id', 'i8'), ('face_off', 'i8'), ('elem_off', 'i8'),
+            ('elements', 'i8'), ('vertices', 'f8'), ('poly_off', 'i8'),
+            ('fc_poly', 'i4'), ('fc_flag', 'u1'), ('sub_off', 'i8'),
+            ('sub_host', 'i8'), ('sub_elem', 'i4'), ('sub_kind', 'u1'),
+            ('loop_off', 'i8'), ('lp_poly', 'i4'), ('ch_off', 'i8'),
+            ('child_a', 'i4'), ('child_b', 'i4')):
+        sections.append((name, kind, _to_bytes(columns[name], kind)))
+    sections.append(('names', 'u1', b''.join(names)))
+    sections.append(('name_off', 'i8', _to_bytes(name_offsets, 'i8')))
+    _write_sections(path, sections, MAGIC, VERSION)
+
+
+def read_recording(path):
+    """Read a Recording from a recording file."""
+    with open(path, 'rb') as f:
+        buffer = f.read()
+    sections = _read_sections(buffer, MAGIC, VERSION, 'recording')
+
+    def _section(name):
+        kind, offset, count = sections[name]
+        if kind == 'u1':
+            return buffer[offset:offset + count]
+        return _from_buffer(buffer, offset, kind, count, False)
+
+    recording = Recording(json.loads(_section('meta').decode('utf-8')))
+    text, name_off = _section('names'), _section('name_off')
+    names = [text[name_off[i]:name_off[i + 1]].decode('utf-8')
+             for i in range(len(name_off) - 1)]
+    room_ids, face_off, elem_off = \
+        _section('room_id'), _section('face_off'), _section('elem_off')
+    element_ids = _section('elements')
+    vertices, poly_off = _section('vertices'), _section('poly_off')
+    fc_poly, fc_flag, sub_off = \
+        _section('fc_poly'), bytearray(_section('fc_flag')), _section('sub_off')
+    sub_host, sub_elem, sub_kind = \
+        _section('sub_host'), _section('sub_elem'), bytearray(_section('sub_kind'))
+    loop_off, lp_poly = _section('loop_off'), _section('lp_poly')
+    ch_off = _section('ch_off')
+    child_a, child_b = _section('child_a'), _section('child_b')
+    room_count = len(room_ids)
+    sub_names = names[room_count:room_count + len(sub_host)]
+    child_labels = names[room_count + len(sub_host):]
+
+    def _polygon(index):
+        values = vertices[3 * poly_off[index]:3 * poly_off[index + 1]]
+        return tuple(zip(values[0::3], values[1::3], values[2::3]))
+
+    def _child(index):
+        if child_b[index] == -1:
+            return child_a[index], child_labels[index]
+        return child_a[index], child_b[index], child_labels[index]
+
+    for room in range(room_count):
+        faces = []
+        for face in range(face_off[room], face_off[room + 1]):
+            flag = fc_flag[face]
+            subfaces = None
+            if flag & 2:
+                subfaces = tuple(
+                    (sub_names[s], sub_host[s], sub_elem[s], _KINDS[sub_kind[s]],
+                     tuple(_polygon(lp_poly[p])
+                           for p in range(loop_off[s], loop_off[s + 1])),
+                     tuple(_child(c) for c in range(ch_off[s], ch_off[s + 1])))
+                    for s in range(sub_off[face], sub_off[face + 1]))
+            polygon = _polygon(fc_poly[face])
+            # the plane of the face is calculated when the openings are projected
+            projector = geometry.FaceProjector(geometry.Polygon(polygon)) \
+                if flag & 1 else None
+            faces.append((polygon, projector, subfaces))
+        recording.rooms.append((
+            (room_ids[room], names[room], tuple(faces)),
+            list(element_ids[elem_off[room]:elem_off[room + 1]])))
+    return recording
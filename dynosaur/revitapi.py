@@ -0,0 +1,186 @@
+"""Revit and Dynamo backend.
+
+This is the only module that imports clr and the Revit and Dynamo libraries. See
+backend.py for the backend functions.
+"""
+import clr
+import System
+from System.Collections.Generic import List
+clr.AddReference("RevitAPI")
+import Autodesk.Revit.DB as DB
+
+clr.AddReference("RevitServices")
+from RevitServices.Persistence import DocumentManager
+
+clr.AddReference('ProtoGeometry')
+from Autodesk.DesignScript.Geometry import Point, Surface
+
+clr.AddReference("RevitNodes")
+import Revit
+from Revit import GeometryConversion
+# Import ToProtoType, ToRevitType geometry conversion extension methods
+clr.ImportExtensions(GeometryConversion)
+# Add ToDSType method for Revit elements
+clr.ImportExtensions(Revit.Elements)
+
+
+def current_document():
+    """Get the current Revit document."""
+    return DocumentManager.Instance.CurrentDBDocument
+
+
+# categories with a phase and an area parameter
+SPATIAL_CATEGORIES = ('Rooms', 'MEPSpaces', 'Areas')
+
+
+def _family_filter(document, built_in_categories, family_name):
+    """FamilyInstanceFilter for the symbols of a family or None if there is none."""
+    symbols = DB.FilteredElementCollector(document).OfClass(DB.FamilySymbol)
+    filters = List[DB.ElementFilter]()
+    for symbol in symbols:
+        if symbol.Family.Name == family_name and symbol.Category is not None and \
+                symbol.Category.Id.IntegerValue in built_in_categories:
+            filters.Add(DB.FamilyInstanceFilter(document, symbol.Id))
+    if filters.Count == 0:
+        return None
+    return filters[0] if filters.Count == 1 else DB.LogicalOrFilter(filters)
+
+
+def collect_elements(document, categories, family_instances_only=False,
+                     level_id=None, phase_id=None, placed_only=False,
+                     bounding_box=None, family_name=None):
+    """Iterate over elements of one or several categories in a Revit document.
+
+    All the filters are applied by the FilteredElementCollector and only the
+    elements that pass the filters are loaded.
+
+    Args:
+        document: Revit document.
+        categories: BuiltInCategory name without OST_ (e.g. Rooms, MEPSpaces) or a
+            list of names.
+        family_instances_only: Only collect FamilyInstance elements.
+        level_id: Only collect the elements on this level.
+        phase_id: Only collect the elements in this phase. The phase of rooms and
+            spaces is their phase parameter and for other elements it's the phase
+            they are created or existing in.
+        placed_only: Only collect rooms, spaces and areas that are placed and
+            bounded (area larger than zero).
+        bounding_box: Only collect the elements that intersect a bounding box as
+            ((x, y, z), (x, y, z)) in Revit internal units.
+        family_name: Only collect the instances of this family.
+    """
+    if isinstance(categories, str):
+        categories = (categories,)
+    built_in = [getattr(DB.BuiltInCategory, 'OST_%s' % c) for c in categories]
+    collector = DB.FilteredElementCollector(document)
+    if len(built_in) == 1:
+        collector.OfCategory(built_in[0])
+    else:
+        collector.WherePasses(
+            DB.ElementMulticategoryFilter(List[DB.BuiltInCategory](built_in)))
+    if family_instances_only:
+        collector.OfClass(DB.FamilyInstance)
+    # quick filters first
+    if bounding_box is not None:
+        outline = DB.Outline(DB.XYZ(*bounding_box[0]), DB.XYZ(*bounding_box[1]))
+        collector.WherePasses(DB.BoundingBoxIntersectsFilter(outline))
+    if level_id is not None:
+        collector.WherePasses(DB.ElementLevelFilter(level_id))
+    if family_name is not None:
+        family_filter = _family_filter(
+            document, set(int(c) for c in built_in), family_name)
+        if family_filter is None:
+            return iter(())
+        collector.WherePasses(family_filter)
+    is_spatial = all(c in SPATIAL_CATEGORIES for c in categories)
+    if phase_id is not None:
+        if is_spatial:
+            rule = DB.ParameterFilterRuleFactory.CreateEqualsRule(
+                DB.ElementId(DB.BuiltInParameter.ROOM_PHASE_ID), phase_id)
+            collector.WherePasses(DB.ElementParameterFilter(rule))
+        else:
+            statuses = List[DB.ElementOnPhaseStatus](
+                [DB.ElementOnPhaseStatus.New, DB.ElementOnPhaseStatus.Existing])
+            collector.WherePasses(DB.ElementPhaseStatusFilter(phase_id, statuses))
+    if placed_only and is_spatial:
+        rule = DB.ParameterFilterRuleFactory.CreateGreaterRule(
+            DB.ElementId(DB.BuiltInParameter.ROOM_AREA), 0.0, 1e-9)
+        collector.WherePasses(DB.ElementParameterFilter(rule))
+    element_iter = collector.GetElementIdIterator()
+    element_iter.Reset()
+    return (document.GetElement(el_id) for el_id in element_iter)
+
+
+def category_name(element):
+    """BuiltInCategory name of an element without OST_ or None."""
+    category = element.Category
+    if category is None:
+        return None
+    name = System.Enum.GetName(DB.BuiltInCategory, category.Id.IntegerValue)
+    return name[4:] if name and name.startswith('OST_') else name
+
+
+def to_ds_type(element):
+    """Wrap a Revit element as a Dynamo element."""
+    return element.ToDSType(True)
+
+
+def element_id(value):
+    """Create an ElementId from its integer value."""
+    return DB.ElementId(value)
+
+
+def boundary_location(index):
+    """Get SpatialElementBoundaryLocation.
+
+    0 > Finish: Spatial element finish face.
+    1 > Center: Spatial element centerline.
+    """
+    if index == 0:
+        return DB.SpatialElementBoundaryLocation.Finish
+    else:
+        return DB.SpatialElementBoundaryLocation.Center
+
+
+def spatial_element_geometry_calculator(document, boundary_location_index=1):
+    """Create a SpatialElementGeometryCalculator for a document."""
+    options = DB.SpatialElementBoundaryOptions()
+    options.SpatialElementBoundaryLocation = boundary_location(boundary_location_index)
+    return DB.SpatialElementGeometryCalculator(document, options)
+
+
+def geometry_options():
+    """Create Revit geometry options."""
+    return DB.Options()
+
+
+def to_solid(geometry_object):
+    """Convert a Revit geometry object to a Solid."""
+    return clr.Convert(geometry_object, DB.Solid)
+
+
+def to_proto_type(geometry):
+    """Convert Revit geometry to Dynamo geometry."""
+    return geometry.ToProtoType()
+
+
+def length_unit_scale(document):
+    """Scale from Revit internal length units to document display units."""
+    doc_units = document.GetUnits()
+    length_unit = doc_units.GetFormatOptions(DB.UnitType.UT_Length).DisplayUnits
+    return DB.UnitUtils.ConvertFromInternalUnits(1.0, length_unit)
+
+
+def point_by_coordinates(x, y, z):
+    """Create a Dynamo point."""
+    return Point.ByCoordinates(x, y, z)
+
+
+def surface_by_perimeter_points(points):
+    """Create a Dynamo surface from perimeter points."""
+    return Surface.ByPerimeterPoints(points)
+
+
+def short_curve_tolerance(document):
+    """Shortest curve length that Revit accepts in internal units."""
+    return document.Application.ShortCurveTolerance
@@ -1,55 +1,102 @@
 """Revit room functions."""
-import util
-import clr
-clr.AddReference('ProtoGeometry')
-from Autodesk.DesignScript.Geometry import Point, Surface
-
-clr.AddReference("RevitNodes")
-from Revit import GeometryConversion
-# Import ToProtoType, ToRevitType geometry conversion extension methods
-clr.ImportExtensions(GeometryConversion)
-
-import sys
-sys.path.append(r'C:\Program Files (x86)\IronPython 2.7\Lib')
+import array
 import collections
 
+from . import util
+from . import geometry
+from . import geometryscope
+from .instrumentation import get_report
+from .backend import get_backend
 
-def get_dynamo_room_faces(revit_room_geometry):
-    rounding = 4
+
+def rebuild_faces(revit_faces, document=None, context=None):
+    """Recreate Dynamo faces from the edges of Revit faces.
+
+    All the edge end points of the faces are collected in one array and the points
+    that are closer than the short curve tolerance of Revit are welded. This removes
+    the very short edges that make ToProtoType fail. The edges of each loop are
+    chained in order and the loop is reversed if it doesn't match the normal of the
+    Revit face so the surface can be created on the first try.
+
+    Each edge loop is recreated as a separate face.
+
+    Args:
+        revit_faces: Revit faces.
+        document: Revit document (Default: current document).
+        context: An optional util.DocumentContext for the unit scale and the short
+            curve tolerance of the document.
+
+    Returns:
+        A list of Dynamo surfaces. Surfaces are added to the active geometry scope
+        (see geometryscope).
+    """
+    backend = get_backend()
+    context = util.get_context(document, context)
+    scale = context.unit_scale
+    tolerance = context.short_curve_tolerance
+
+    # x, y, z values for the start and the end of all the edges
+    values = array.array('d')
+    # (face normal, number of edges) for each loop
+    loops = []
+    for face in revit_faces:
+        normal = getattr(face, 'FaceNormal', None)
+        for loop in face.EdgeLoops:
+            count = 0
+            for edge in loop:
+                for parameter in (0, 1):
+                    pt = edge.Evaluate(parameter)
+                    values.extend((pt.X, pt.Y, pt.Z))
+                count += 1
+            loops.append((normal, count))
+
+    points, indices = geometry.weld_points(values, tolerance)
+
+    faces = []
+    offset = 0
+    for normal, count in loops:
+        edges = tuple(zip(indices[offset:offset + 2 * count:2],
+                          indices[offset + 1:offset + 2 * count:2]))
+        offset += 2 * count
+        order = geometry.chain_edges(edges)
+        if order is None:
+            # the edges don't make a single loop. Use the points in the order of
+            # the edges.
+            order = collections.OrderedDict.fromkeys(i for edge in edges for i in edge)
+        loop = [points[i] for i in order]
+        if normal is not None and \
+                geometry.dot(geometry.newell_normal(loop), geometry.xyz(normal)) < 0:
+            # reverse the loop and keep the first point
+            loop = loop[:1] + loop[:0:-1]
+        dynamo_points = [backend.point_by_coordinates(x * scale, y * scale, z * scale)
+                         for x, y, z in loop]
+        try:
+            faces.append(geometryscope.track(
+                backend.surface_by_perimeter_points(dynamo_points)))
+        finally:
+            for pt in dynamo_points:
+                pt.Dispose()
+    return faces
+
+
+def get_dynamo_room_faces(revit_room_geometry, document=None, report=None,
+                          context=None):
+    """Convert the faces of a Revit room geometry to Dynamo faces.
+
+    If any of the faces fails to convert all the faces are recreated from their
+    edges (see rebuild_faces). The number of recreated faces is added to the
+    fallback_faces counter of report (an instrumentation.Report).
+
+    Dynamo faces are added to the active geometry scope (see geometryscope) and are
+    disposed with the scope even if converting one of the faces fails.
+    """
+    backend = get_backend()
     try:
-        room_faces_dyn = \
-            tuple(face.ToProtoType()[0] for face in revit_room_geometry.Faces)
-    except StandardError:
-        scale = util.unit_conversion()
-        # try to recreate the faces from the edges
-        loops = tuple(loop for face in revit_room_geometry.Faces
-                      for loop in face.EdgeLoops)
-
-        # collect all the start and end points
-        start_ends = (((e.Evaluate(1), e.Evaluate(0)) if count == 0 else
-                       (e.Evaluate(0), e.Evaluate(1))
-                       for count, e in enumerate(loop)) for loop in loops)
-
-        # round the values
-        points = ((
-            (round(pt.X, rounding), round(pt.Y, rounding), round(pt.Z, rounding))
-            for edge in loop for pt in edge)
-            for loop in start_ends)
-
-        # remove duplicated points
-        xyz_unique = (list(collections.OrderedDict.fromkeys(pts)) for pts in points)
-
-        room_faces_dyn = []
-        for pgroup in xyz_unique:
-            try:
-                face = Surface.ByPerimeterPoints(Point.ByCoordinates(*p).Scale(scale)
-                                                 for p in pgroup)
-            except StandardError:
-                # changing the order was not needed for this face
-                pgroup[0], pgroup[1] = pgroup[1], pgroup[0]
-                face = Surface.ByPerimeterPoints(Point.ByCoordinates(*p).Scale(scale)
-                                                 for p in pgroup)
-
-            room_faces_dyn.append(face)
+        room_faces_dyn = tuple(
+            geometryscope.track_all(backend.to_proto_type(face))[0]
+            for face in revit_room_geometry.Faces)
+    except Exception:
+        room_faces_dyn = rebuild_faces(revit_room_geometry.Faces, document, context)
+        get_report(report).count('fallback_faces', len(room_faces_dyn))
 
     return room_faces_dyn
@@ -0,0 +1,221 @@
+"""Create the rooms of large models in shards.
+
+create_rooms_sharded splits the rooms by level or by a grid of their bounding boxes.
+The rooms of each shard are extracted from Revit on the current thread (see
+dynosaur.pipeline) and the raw rooms of the shard are sent to a worker as soon as
+the shard is extracted. The worker processes the rooms and matches the adjacent
+surfaces in the shard. Revit keeps extracting the next shard while the workers
+process the previous ones.
+
+    rooms, elements, log = sharding.create_rooms_sharded(
+        revit_rooms, by='level', workers=4)
+
+The shard models are merged in the order of the shards and the rooms of each shard
+keep the order of the input rooms. Room, surface and fenestration surface names are
+the same as create_rooms. Surfaces on the boundary of two shards (e.g. the floor
+between two levels) are matched once all the shards are merged. Only the surfaces
+with a host element that are not adjacent to a surface in their own shard are
+compared.
+"""
+import collections
+import math
+
+from . import objects
+from . import pipeline
+from . import util
+from . import adjacency
+from .dynosaur import create_extractors
+from .instrumentation import Report, get_report
+
+LEVEL, GRID = 'level', 'grid'
+
+# size of the grid cells in Revit internal units (feet)
+DEFAULT_CELL_SIZE = 100.0
+
+
+def shard_key(revit_room, by=LEVEL, cell_size=None):
+    """Get the shard of a room.
+
+    Args:
+        revit_room: A Revit room.
+        by: level to use the level of the room or grid to use the cell of the
+            center of the room bounding box in plan (Default: level).
+        cell_size: Size of the grid cells in Revit internal units
+            (Default: DEFAULT_CELL_SIZE).
+
+    Returns:
+        The integer id of the level or a tuple of (column, row) for the grid cell.
+        Rooms without a level or a bounding box return None.
+    """
+    if by == LEVEL:
+        level_id = getattr(revit_room, 'LevelId', None)
+        return level_id.IntegerValue if level_id is not None else None
+    if by != GRID:
+        raise ValueError('%s is not a valid shard type. Use level or grid.' % by)
+    bbox = revit_room.get_BoundingBox(None)
+    if bbox is None:
+        return None
+    size = cell_size or DEFAULT_CELL_SIZE
+    return (int(math.floor((bbox.Min.X + bbox.Max.X) / 2.0 / size)),
+            int(math.floor((bbox.Min.Y + bbox.Max.Y) / 2.0 / size)))
+
+
+def split_rooms(rooms, by=LEVEL, cell_size=None):
+    """Split rooms into shards.
+
+    Args:
+        rooms: Revit rooms.
+        by: level, grid or a function that returns the shard key of a room
+            (Default: level).
+        cell_size: Size of the grid cells in Revit internal units
+            (Default: DEFAULT_CELL_SIZE).
+
+    Returns:
+        A list of (key, rooms) in the order of the first room of each shard. Rooms
+        of each shard are in the same order as the input rooms.
+    """
+    shards = collections.OrderedDict()
+    for revit_room in rooms:
+        key = by(revit_room) if callable(by) else shard_key(revit_room, by, cell_size)
+        shards.setdefault(key, []).append(revit_room)
+    return list(shards.items())
+
+
+def process_shard(raw_rooms, tolerance=None):
+    """Process the raw rooms of a shard in a worker.
+
+    Args:
+        raw_rooms: Raw rooms from pipeline.extract_room.
+        tolerance: Tolerance for finding duplicated and adjacent surfaces
+            (Default: adjacency.DEFAULT_TOLERANCE).
+
+    Returns:
+        A tuple of (model, element indices, logs, report). model has a room for
+        each raw room in the same order and adjacent surfaces in the shard are set.
+        Names that refer to Revit elements are replaced in pipeline.resolve_model.
+        element indices and logs are lists for each room. Merge the report to the
+        main report.
+    """
+    report = Report(per_element=False)
+    model = objects.RoomModel()
+    element_indices = []
+    logs = []
+    for raw_room in raw_rooms:
+        room_model, indices, log = pipeline.process_room(raw_room, tolerance, report)
+        start = report.start()
+        model.extend(room_model)
+        report.add_time('assemble', start)
+        element_indices.append(indices)
+        logs.append(log)
+
+    start = report.start()
+    report.count('adjacent_pairs', adjacency.set_adjacent_surfaces(model, tolerance))
+    report.add_time('adjacency', start)
+    return model, element_indices, logs, report
+
+
+def create_rooms_sharded(rooms, by=LEVEL, cell_size=None, workers=None,
+                         boundary_location=1, tolerance=None, report=None,
+                         context=None):
+    """Create dynosaur rooms from Revit rooms in shards.
+
+    The result is the same as create_rooms except for the order of the rooms. Rooms
+    are in the order of the shards (see split_rooms). The cache, the progress and
+    the time budget of create_rooms are not supported.
+
+    Args:
+        rooms: Revit rooms.
+        by: level, grid or a function that returns the shard key of a room
+            (Default: level).
+        cell_size: Size of the grid cells in Revit internal units
+            (Default: DEFAULT_CELL_SIZE).
+        workers: Number of workers or an executor with a submit method (see
+            iter_rooms). Each shard is processed by one worker. By default all the
+            shards are processed on the current thread.
+        boundary_location: 0 for finish face and 1 for center line (Default: 1).
+        tolerance: Tolerance for finding duplicated and adjacent surfaces
+            (Default: adjacency.DEFAULT_TOLERANCE).
+        report: An optional instrumentation.Report. The number of shards is added
+            to the shards counter and the pairs that are matched between the shards
+            to the cross_shard_pairs counter.
+        context: An optional util.DocumentContext for the document of the rooms.
+
+    Returns:
+        A tuple of (rooms, elements, log) like create_rooms.
+    """
+    rooms = tuple(util.get_internal_elements(rooms) or ())
+    if not rooms:
+        return objects.RoomModel(), [], []
+    report = get_report(report)
+    context = util.get_context(rooms[0].Document, context)
+    shards = split_rooms(rooms, by, cell_size)
+    report.count('shards', len(shards))
+
+    if isinstance(workers, int):
+        executor = pipeline.create_executor(workers) if workers > 1 else None
+    else:
+        executor = workers
+
+    # (rooms, elements, future or processed shard) for each shard
+    pending = []
+    cps = None
+    try:
+        calculator, cps, host_elements = create_extractors(
+            rooms, boundary_location, context, report)
+        for _, shard_rooms in shards:
+            raw_rooms = []
+            elements = []
+            for revit_room in shard_rooms:
+                raw_room, room_elements = pipeline.extract_room(
+                    revit_room, calculator, cps, host_elements, report, context)
+                raw_rooms.append(raw_room)
+                elements.append(room_elements)
+            if executor is None:
+                pending.append((shard_rooms, elements,
+                                process_shard(raw_rooms, tolerance)))
+            else:
+                pending.append((shard_rooms, elements, executor.submit(
+                    process_shard, raw_rooms, tolerance)))
+
+        log = []
+        element_collector = []
+        room_collector = objects.RoomModel()
+        # surfaces that are not matched in their shard
+        boundary_surfaces = []
+        for shard_rooms, elements, shard in pending:
+            if executor is not None:
+                shard = shard.result()
+            model, element_indices, logs, worker_report = shard
+            report.merge(worker_report)
+            pipeline.resolve_model(model, elements, [r.Id for r in shard_rooms],
+                                   report)
+            offset = room_collector.surface_count
+            boundary_surfaces.extend(
+                offset + i for i, host in enumerate(model.surface_hosts)
+                if host is not None and model.surface_adjacents[i] == -1)
+            start = report.start()
+            room_collector.extend(model)
+            report.add_time('assemble', start)
+            for room_elements, indices, room_log in zip(elements, element_indices,
+                                                        logs):
+                element_collector.append([room_elements[i] for i in indices])
+                for message in room_log:
+                    log.append(message)
+                    report.log(message)
+    finally:
+        # disposes the calculator
+        context.dispose()
+        if cps is not None:
+            cps.Dispose()
+        if executor is not None and executor is not workers:
+            executor.shutdown()
+
+    # find adjacent surfaces between the shards
+    start = report.start()
+    count = adjacency.set_adjacent_surfaces(room_collector, tolerance,
+                                            boundary_surfaces)
+    report.count('adjacent_pairs', count)
+    report.count('cross_shard_pairs', count)
+    report.add_time('adjacency', start)
+
+    return room_collector, element_collector, log
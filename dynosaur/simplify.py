@@ -0,0 +1,333 @@
+"""Remove collinear vertices and merge coplanar surfaces in a RoomModel.
+
+Room faces from Revit can have duplicated vertices and vertices in the middle of a
+straight edge (e.g. where a boundary element ends). Extra vertices make the energy
+models larger and keep the adjacent surfaces of two rooms from matching. Remove
+them before finding the adjacent surfaces:
+
+    rooms, elements, log = create_rooms(revit_rooms, simplify=True)
+
+create_rooms doesn't merge any surfaces. It creates one surface for each room face
+and boundary element and every surface of a room face has the polygon of the whole
+face, so there are no surfaces to merge. Merging is for models that have a plane
+split into several surfaces (e.g. models that are built or edited by hand):
+
+    simplify.simplify_model(rooms, merge=True)
+
+Surfaces of the same room with the same host element on the same plane are merged
+if they share an edge and the merged surface is a single loop. Edges of a surface
+that are split by the vertices of the other surfaces (T-junctions) are split before
+the edges are matched. Fenestration surfaces are moved to the merged surface.
+Duplicated and collinear vertices are removed from all the surfaces and fenestration
+surfaces.
+
+Surfaces are grouped by their plane using a dictionary so only the surfaces in the
+same group are compared. Adjacent surfaces are not merged. Simplify the model before
+finding the adjacent surfaces.
+"""
+from array import array
+from operator import add, mul, sub
+
+from . import geometry
+from .adjacency import DEFAULT_TOLERANCE
+from .instrumentation import get_report
+
+# tolerance for the components of the unit normal of coplanar surfaces
+ANGLE_TOLERANCE = 0.001
+
+
+def _is_redundant(previous, point, next_point, sq_tolerance):
+    """Check if a point is a duplicate of the previous point or is on the line
+    between its neighbours."""
+    ax, ay, az = previous
+    px, py, pz = point[0] - ax, point[1] - ay, point[2] - az
+    if px * px + py * py + pz * pz <= sq_tolerance:
+        return True
+    bx, by, bz = next_point[0] - ax, next_point[1] - ay, next_point[2] - az
+    sq_length = bx * bx + by * by + bz * bz
+    if sq_length <= sq_tolerance:
+        # a spike that goes back to the previous point
+        return True
+    cx, cy, cz = py * bz - pz * by, pz * bx - px * bz, px * by - py * bx
+    return cx * cx + cy * cy + cz * cz <= sq_tolerance * sq_length
+
+
+def simplify_polygon(values, tolerance=None):
+    """Remove the duplicated and collinear vertices of a polygon.
+
+    Args:
+        values: A flat list of x, y, z values.
+        tolerance: Maximum distance of a removed vertex from the polygon
+            (Default: adjacency.DEFAULT_TOLERANCE).
+
+    Returns:
+        A flat list of x, y, z values. Polygons that would have less than three
+        vertices are returned as they are.
+    """
+    tolerance = tolerance or DEFAULT_TOLERANCE
+    sq_tolerance = tolerance * tolerance
+    points = list(zip(values[0::3], values[1::3], values[2::3]))
+    while len(points) > 3:
+        kept = []
+        count = len(points)
+        for i in range(count):
+            previous = kept[-1] if kept else points[i - 1]
+            if not _is_redundant(previous, points[i], points[(i + 1) % count],
+                                 sq_tolerance):
+                kept.append(points[i])
+        if len(kept) == count:
+            break
+        if len(kept) < 3:
+            return list(values)
+        points = kept
+    return [v for point in points for v in point]
+
+
+def _redundant_polygons(offsets, vertices, sq_tolerance):
+    """Find the polygons with duplicated or collinear vertices.
+
+    All the vertices are checked at once on the columns of the vertices buffer (see
+    _is_redundant for a single vertex). Triangles are skipped.
+
+    Returns:
+        A set of polygon indices.
+    """
+    count = offsets[-1]
+    # index of the previous and the next point for each vertex
+    previous, following = list(range(-1, count - 1)), list(range(1, count + 1))
+    for polygon in range(len(offsets) - 1):
+        start, end = offsets[polygon], offsets[polygon + 1]
+        if end > start:
+            previous[start], following[end - 1] = end - 1, start
+    current = range(count)
+
+    # vectors from the previous point to the point (p) and to the next point (b)
+    p_vectors, b_vectors = [], []
+    for axis in range(3):
+        column = list(vertices[axis::3])
+        get = column.__getitem__
+        a = list(map(get, previous))
+        p_vectors.append(list(map(sub, map(get, current), a)))
+        b_vectors.append(list(map(sub, map(get, following), a)))
+    px, py, pz = p_vectors
+    bx, by, bz = b_vectors
+
+    def _dot(x0, y0, z0, x1, y1, z1):
+        return list(map(add, map(add, map(mul, x0, x1), map(mul, y0, y1)),
+                        map(mul, z0, z1)))
+
+    def _cross(a0, a1, b0, b1):
+        return list(map(sub, map(mul, a0, b0), map(mul, a1, b1)))
+
+    sq_p = _dot(px, py, pz, px, py, pz)
+    sq_b = _dot(bx, by, bz, bx, by, bz)
+    cx, cy, cz = _cross(py, pz, bz, by), _cross(pz, px, bx, bz), \
+        _cross(px, py, by, bx)
+    sq_c = _dot(cx, cy, cz, cx, cy, cz)
+    flags = [p <= sq_tolerance or b <= sq_tolerance or c <= sq_tolerance * b
+             for p, b, c in zip(sq_p, sq_b, sq_c)]
+    return set(polygon for polygon in range(len(offsets) - 1)
+               if offsets[polygon + 1] - offsets[polygon] > 3 and
+               any(flags[offsets[polygon]:offsets[polygon + 1]]))
+
+
+def _split_edges(loop, points, candidates, sq_tolerance):
+    """Add the candidate points that are on the edges of a loop."""
+    split = []
+    for count, start in enumerate(loop):
+        end = loop[(count + 1) % len(loop)]
+        split.append(start)
+        ax, ay, az = points[start]
+        bx, by, bz = points[end]
+        ex, ey, ez = bx - ax, by - ay, bz - az
+        sq_length = ex * ex + ey * ey + ez * ez
+        if not sq_length:
+            continue
+        on_edge = []
+        for index in candidates:
+            if index == start or index == end:
+                continue
+            px, py, pz = points[index]
+            t = ((px - ax) * ex + (py - ay) * ey + (pz - az) * ez) / sq_length
+            if not 0 < t < 1:
+                continue
+            dx, dy, dz = ax + t * ex - px, ay + t * ey - py, az + t * ez - pz
+            if dx * dx + dy * dy + dz * dz <= sq_tolerance:
+                on_edge.append((t, index))
+        split.extend(index for _, index in sorted(on_edge))
+    return split
+
+
+def merge_polygons(polygons, tolerance=None):
+    """Merge coplanar polygons that share an edge.
+
+    Polygons should be on the same plane with the same orientation.
+
+    Args:
+        polygons: A list of flat lists of x, y, z values.
+        tolerance: Distance for welding the vertices
+            (Default: adjacency.DEFAULT_TOLERANCE).
+
+    Returns:
+        A list of (indices, values) for each group of polygons that is merged.
+        indices are the indices of the merged polygons and values is the merged
+        polygon as a flat list of x, y, z values. Groups that don't make a single
+        loop (e.g. a polygon with a hole) are not merged.
+    """
+    tolerance = tolerance or DEFAULT_TOLERANCE
+    points, indices = geometry.weld_points(
+        [v for polygon in polygons for v in polygon], tolerance)
+    loops = []
+    position = 0
+    for polygon in polygons:
+        count = len(polygon) // 3
+        welded = indices[position:position + count]
+        position += count
+        loop = [index for i, index in enumerate(welded) if index != welded[i - 1]]
+        # degenerate polygons don't have any edges
+        loops.append(loop if len(loop) > 2 else [])
+    candidates = set(index for loop in loops for index in loop)
+    loops = [_split_edges(loop, points, candidates, tolerance * tolerance)
+             for loop in loops]
+
+    def _edges(loop):
+        return zip(loop, loop[1:] + loop[:1])
+
+    # directed edge: polygon index. Shared edges are in the opposite direction.
+    owners = {}
+    for count, loop in enumerate(loops):
+        for edge in _edges(loop):
+            owners[edge] = count
+
+    parents = list(range(len(loops)))
+
+    def _root(i):
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    shared = set()
+    for (start, end), count in owners.items():
+        other = owners.get((end, start))
+        if other is not None and other != count:
+            shared.add((start, end))
+            parents[_root(count)] = _root(other)
+
+    groups = {}
+    for count in range(len(loops)):
+        groups.setdefault(_root(count), []).append(count)
+
+    merged = []
+    for group in groups.values():
+        if len(group) < 2:
+            continue
+        loop = geometry.chain_edges(
+            [edge for count in group for edge in _edges(loops[count])
+             if edge not in shared])
+        if loop is None:
+            continue
+        merged.append((group, [v for index in loop for v in points[index]]))
+    return merged
+
+
+def _coplanar_groups(model, surface_values, tolerance):
+    """Groups of surfaces with the same room, host and plane."""
+    groups = {}
+    for index, values in enumerate(surface_values):
+        host = model.surface_hosts[index]
+        if host is None or model.surface_adjacents[index] != -1 or len(values) < 9:
+            continue
+        points = list(zip(values[0::3], values[1::3], values[2::3]))
+        normal = geometry.newell_normal(points)
+        length = geometry.length(normal)
+        if not length:
+            continue
+        nx, ny, nz = normal[0] / length, normal[1] / length, normal[2] / length
+        distance = nx * points[0][0] + ny * points[0][1] + nz * points[0][2]
+        key = (model.surface_rooms[index], host, int(round(nx / ANGLE_TOLERANCE)),
+               int(round(ny / ANGLE_TOLERANCE)), int(round(nz / ANGLE_TOLERANCE)),
+               int(round(distance / tolerance)))
+        groups.setdefault(key, []).append(index)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def simplify_model(model, tolerance=None, merge=False, report=None):
+    """Remove duplicated and collinear vertices and merge coplanar surfaces.
+
+    Args:
+        model: A RoomModel. The model is changed in place.
+        tolerance: Tolerance for welding and removing the vertices and for finding
+            the coplanar surfaces (Default: adjacency.DEFAULT_TOLERANCE).
+        merge: Merge the coplanar surfaces of each room that share a host element
+            (Default: False).
+        report: An optional instrumentation.Report to record the time
+            (simplification) and the number of merged surfaces (merged_surfaces)
+            and removed vertices (removed_vertices).
+
+    Returns:
+        A dictionary with the number of surfaces and vertices before and after
+        (surfaces_before, surfaces_after, vertices_before and vertices_after).
+        Vertices include the vertices of the fenestration surfaces.
+    """
+    report = get_report(report)
+    start = report.start()
+    tolerance = tolerance or DEFAULT_TOLERANCE
+    surfaces_before = model.surface_count
+    vertices_before = model.polygon_offsets[-1]
+    offsets, vertices = model.polygon_offsets, model.vertices
+
+    def _values(polygon):
+        return list(vertices[3 * offsets[polygon]:3 * offsets[polygon + 1]])
+
+    surface_values = [_values(polygon) for polygon in model.surface_polygons] \
+        if merge else ()
+    # removed surface: surface that it is merged to
+    merged_to = {}
+    # surface: vertices of the merged surface
+    merged_values = {}
+    if merge:
+        for group in _coplanar_groups(model, surface_values, tolerance):
+            for members, values in merge_polygons(
+                    [surface_values[i] for i in group], tolerance):
+                members = sorted(group[i] for i in members)
+                merged_values[members[0]] = values
+                for index in members[1:]:
+                    merged_to[index] = members[0]
+        for fen_index, surface in enumerate(model.fen_surfaces):
+            if surface in merged_to:
+                model.set_fen_surface_parent(fen_index, merged_to[surface])
+
+    # write the polygons to a new vertices buffer. Only the merged polygons and the
+    # polygons with redundant vertices are simplified and the rest are copied.
+    redundant = _redundant_polygons(offsets, vertices, tolerance * tolerance)
+    new_offsets, new_vertices = array('l', [0]), array('d')
+
+    def _add_polygon(polygon, values=None):
+        if values is not None:
+            new_vertices.extend(simplify_polygon(values, tolerance))
+        elif polygon in redundant:
+            new_vertices.extend(simplify_polygon(_values(polygon), tolerance))
+        else:
+            new_vertices.extend(
+                vertices[3 * offsets[polygon]:3 * offsets[polygon + 1]])
+        new_offsets.append(len(new_vertices) // 3)
+        return len(new_offsets) - 2
+
+    model.surface_polygons = array(
+        'l', (_add_polygon(polygon, merged_values.get(index))
+              for index, polygon in enumerate(model.surface_polygons)))
+    model.fen_polygons = array(
+        'l', (_add_polygon(polygon) for polygon in model.fen_polygons))
+    model.polygon_offsets, model.vertices = new_offsets, new_vertices
+    model.remove_surfaces(merged_to)
+
+    report.count('merged_surfaces', len(merged_to))
+    report.count('removed_vertices', vertices_before - model.polygon_offsets[-1])
+    report.add_time('simplification', start)
+    return {
+        'surfaces_before': surfaces_before,
+        'surfaces_after': model.surface_count,
+        'vertices_before': vertices_before,
+        'vertices_after': model.polygon_offsets[-1]
+    }
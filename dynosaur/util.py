@@ -1,24 +1,18 @@
 """Utilities."""
-import uuid
-import clr
-clr.AddReference("RevitServices")
-from RevitServices.Persistence import DocumentManager
+from .backend import get_backend
 
-clr.AddReference("RevitAPI")
-from Autodesk.Revit.DB import UnitUtils, UnitType, SpatialElementBoundaryLocation
 
-
-def unit_conversion():
+def unit_conversion(document=None):
     """Convert Revit units to Dynamo Units."""
-    doc = DocumentManager.Instance.CurrentDBDocument
-    doc_units = doc.GetUnits()
-    length_unit = doc_units.GetFormatOptions(UnitType.UT_Length).DisplayUnits
-
-    return UnitUtils.ConvertFromInternalUnits(1.0, length_unit)
+    backend = get_backend()
+    doc = document or backend.current_document()
+    return backend.length_unit_scale(doc)
 
 
 def create_uuid():
     """Return a random uuid."""
+    # uuid is slow to import and is only needed once the rooms are created
+    import uuid
     return str(uuid.uuid4())
 
 
@@ -38,6 +32,14 @@ def get_internal_elements(elements):
         return elements
 
 
+def element_id_value(element):
+    """Integer id of a Revit or a Dynamo element or None."""
+    internal = getattr(element, 'InternalElement', None)
+    if internal is not None:
+        return internal.Id.IntegerValue
+    return getattr(getattr(element, 'Id', None), 'IntegerValue', None)
+
+
 def get_boundary_location(index=1):
     """Get SpatialElementBoundaryLocation.
 
@@ -45,10 +47,7 @@ def get_boundary_location(index=1):
     1 > Center: Spatial element centerline.
     """
     index = index or index % 2
-    if index == 0:
-        return SpatialElementBoundaryLocation.Finish
-    else:
-        return SpatialElementBoundaryLocation.Center
+    return get_backend().boundary_location(index)
 
 
 def get_parameters(el, parameter):
@@ -57,6 +56,160 @@ def get_parameters(el, parameter):
 
 
 def get_parameter(el, parameter):
-    """Get a parameter from a revit element."""
-    return tuple(p.AsValueString() for p in el.Parameters
-                 if p.Definition.Name == parameter)[0]
+    """Get a parameter from a revit element.
+
+    Use DocumentContext.parameter to get several parameters of the same element.
+    """
+    for p in el.Parameters:
+        if p.Definition.Name == parameter:
+            return p.AsValueString()
+    raise IndexError('%s is not a parameter of the element.' % parameter)
+
+
+class DocumentContext(object):
+    """Document data that is used many times in a run.
+
+    The context keeps the unit scale, the short curve tolerance, the geometry
+    options, the spatial element geometry calculators, the parameters of each element
+    and the family of each element type. create_rooms creates a context for each run
+    and passes it to the functions that need it.
+
+    Use invalidate after changing the document. The ids from the DocumentChanged
+    event of Revit can be used to only remove the elements that have changed:
+
+        context.invalidate(args.GetModifiedElementIds())
+
+    A context is only used for its own document (see get_context).
+
+    Args:
+        document: Revit document (Default: current document).
+    """
+
+    def __init__(self, document=None):
+        self.document = document or get_backend().current_document()
+        # calculators are disposed in dispose and are not removed in invalidate
+        self._calculators = {}
+        self.invalidate()
+
+    def invalidate(self, element_ids=None):
+        """Remove the cached data.
+
+        Args:
+            element_ids: Elements, ElementIds or integer ids of the elements that
+                have changed. Only the parameters and the families of these elements
+                are removed. By default all the data is removed.
+        """
+        if element_ids is None:
+            self._unit_scale = None
+            self._short_curve_tolerance = None
+            self._geometry_options = None
+            # element id: {parameter name: value}
+            self._parameters = {}
+            # element type id: family name
+            self._families = {}
+            return
+        for element_id in element_ids:
+            element_id = getattr(element_id, 'Id', element_id)
+            key = getattr(element_id, 'IntegerValue', element_id)
+            self._parameters.pop(key, None)
+            self._families.pop(key, None)
+
+    @property
+    def unit_scale(self):
+        """Scale from Revit internal units to Dynamo units (see unit_conversion)."""
+        if self._unit_scale is None:
+            self._unit_scale = unit_conversion(self.document)
+        return self._unit_scale
+
+    @property
+    def short_curve_tolerance(self):
+        """Shortest curve length that Revit accepts in internal units."""
+        if self._short_curve_tolerance is None:
+            self._short_curve_tolerance = \
+                get_backend().short_curve_tolerance(self.document)
+        return self._short_curve_tolerance
+
+    @property
+    def geometry_options(self):
+        """Revit geometry options."""
+        if self._geometry_options is None:
+            self._geometry_options = get_backend().geometry_options()
+        return self._geometry_options
+
+    def calculator(self, boundary_location=1):
+        """SpatialElementGeometryCalculator for a boundary location.
+
+        Args:
+            boundary_location: 0 for finish face and 1 for center line (Default: 1).
+        """
+        try:
+            return self._calculators[boundary_location]
+        except KeyError:
+            calculator = self._calculators[boundary_location] = \
+                get_backend().spatial_element_geometry_calculator(
+                    self.document, boundary_location)
+            return calculator
+
+    def parameters(self, element):
+        """Get the parameters of an element as a dictionary of value strings.
+
+        The parameters are read once for each element. If there are several
+        parameters with the same name the first one is used.
+        """
+        key = element.Id.IntegerValue
+        try:
+            return self._parameters[key]
+        except KeyError:
+            values = {}
+            for p in element.Parameters:
+                name = p.Definition.Name
+                if name not in values:
+                    values[name] = p.AsValueString()
+            self._parameters[key] = values
+            return values
+
+    def parameter(self, element, name, default=None):
+        """Get a parameter of an element as a value string or default."""
+        return self.parameters(element).get(name, default)
+
+    def family(self, element):
+        """Family name of an element (e.g. Basic Wall, Curtain Wall, Basic Roof).
+
+        The family name of the type of the element is used and is cached for each
+        type. The Family parameter of the element is used for the elements without
+        a type.
+        """
+        get_type_id = getattr(element, 'GetTypeId', None)
+        if get_type_id is not None:
+            type_id = get_type_id()
+            try:
+                return self._families[type_id.IntegerValue]
+            except KeyError:
+                element_type = element.Document.GetElement(type_id)
+                family = getattr(element_type, 'FamilyName', None)
+                if family:
+                    self._families[type_id.IntegerValue] = family
+                    return family
+        return self.parameter(element, 'Family')
+
+    def dispose(self):
+        """Dispose the calculators."""
+        calculators, self._calculators = self._calculators, {}
+        for calculator in calculators.values():
+            calculator.Dispose()
+
+    def __repr__(self):
+        return 'DocumentContext: %s (%d elements)' % (
+            getattr(self.document, 'Title', self.document), len(self._parameters))
+
+
+def get_context(document=None, context=None):
+    """Get a DocumentContext for a document.
+
+    context is returned if it is for the same document. Otherwise a new context is
+    created.
+    """
+    document = document or get_backend().current_document()
+    if context is not None and context.document == document:
+        return context
+    return DocumentContext(document)
@@ -0,0 +1,455 @@
+"""Validate the geometry of a RoomModel.
+
+create_rooms only removes the surfaces that it can't create. Problems like a window
+that is outside its wall or two curtain panels on top of each other go through and
+break the simulation much later. validate_model checks the whole model at once:
+
+    result = validation.validate_model(rooms)
+    print(result)
+    for issue in result:
+        print(issue)
+
+Checks:
+    degenerate: Polygons with less than three vertices or with no area.
+    non_planar: Polygons with vertices that are farther than tolerance from the
+        plane of the polygon.
+    self_intersection: Polygons with two edges that cross each other.
+    fen_outside_parent: Fenestration surfaces with vertices outside the boundary or
+        the plane of their parent surface.
+    fen_orientation: Fenestration surfaces that face the opposite direction of their
+        parent surface.
+    fen_area: Surfaces where the area of the fenestration surfaces is larger than
+        the area of the surface.
+    fen_overlap: Fenestration surfaces of the same surface that overlap.
+
+The plane and the area of every polygon are calculated in one pass over the vertices
+buffer and the fenestration surfaces are checked in the plane coordinates of their
+parent. Sibling openings are sorted along the plane so only
+the openings with overlapping bounding boxes are compared.
+
+Use fix=True to fix the issues that can be fixed without guessing. Degenerate
+polygons are removed, non-planar polygons are projected to their plane, reversed
+fenestration surfaces are flipped, fenestration surfaces that are only off the
+plane of the parent are projected to it, fenestration surfaces outside the boundary
+of the parent are removed and the smaller one of two overlapping openings is
+removed. Self-intersections and fen_area issues are only reported.
+"""
+from array import array
+import math
+
+from . import geometry
+from .adjacency import DEFAULT_TOLERANCE
+from .instrumentation import get_report
+from .objects import name_text
+
+DEGENERATE = 'degenerate'
+NON_PLANAR = 'non_planar'
+SELF_INTERSECTION = 'self_intersection'
+FEN_OUTSIDE = 'fen_outside_parent'
+FEN_ORIENTATION = 'fen_orientation'
+FEN_AREA = 'fen_area'
+FEN_OVERLAP = 'fen_overlap'
+
+CHECKS = (DEGENERATE, NON_PLANAR, SELF_INTERSECTION, FEN_OUTSIDE, FEN_ORIENTATION,
+          FEN_AREA, FEN_OVERLAP)
+
+SURFACE, FEN_SURFACE = 'surface', 'fen_surface'
+
+
+class Issue(object):
+    """A problem with a surface or a fenestration surface.
+
+    Attributes:
+        code: One of the checks (e.g. non_planar).
+        kind: surface or fen_surface.
+        index: Index of the surface or the fenestration surface in the model before
+            the issues are fixed.
+        name: Name of the surface or the fenestration surface.
+        value: Size of the problem in model units. The planarity deviation for
+            non_planar, the area for degenerate, the distance from the parent for
+            fen_outside_parent, the area of the openings over the area of the surface
+            for fen_area and the index of the other opening for fen_overlap.
+        fixed: True if the issue is fixed.
+    """
+
+    __slots__ = ('code', 'kind', 'index', 'name', 'value', 'fixed')
+
+    def __init__(self, code, kind, index, name, value=None):
+        self.code = code
+        self.kind = kind
+        self.index = index
+        self.name = name
+        self.value = value
+        self.fixed = False
+
+    def to_dict(self):
+        return dict((key, getattr(self, key)) for key in self.__slots__)
+
+    def __repr__(self):
+        value = '%.4g' % self.value if isinstance(self.value, float) else self.value
+        return 'Issue: %s %s %s (%s)%s' % (
+            self.code, self.kind, self.name, value, ' [fixed]' if self.fixed else '')
+
+
+class ValidationResult(object):
+    """Issues of a RoomModel.
+
+    Iterate over the result to get the issues.
+
+    Attributes:
+        issues: List of Issues in the order of the checks.
+        surface_count, fen_surface_count: Number of checked surfaces and
+            fenestration surfaces.
+    """
+
+    def __init__(self, surface_count=0, fen_surface_count=0):
+        self.issues = []
+        self.surface_count = surface_count
+        self.fen_surface_count = fen_surface_count
+
+    def __len__(self):
+        return len(self.issues)
+
+    def __iter__(self):
+        return iter(self.issues)
+
+    def add(self, code, kind, index, name, value=None):
+        """Add a new issue and return it."""
+        issue = Issue(code, kind, index, name, value)
+        self.issues.append(issue)
+        return issue
+
+    def counts(self):
+        """Number of issues for each check."""
+        counts = dict((code, 0) for code in CHECKS)
+        for issue in self.issues:
+            counts[issue.code] = counts.get(issue.code, 0) + 1
+        return counts
+
+    @property
+    def fixed_count(self):
+        return sum(1 for issue in self.issues if issue.fixed)
+
+    def to_dict(self):
+        return {
+            'surface_count': self.surface_count,
+            'fen_surface_count': self.fen_surface_count,
+            'counts': self.counts(),
+            'issues': [issue.to_dict() for issue in self.issues]
+        }
+
+    def __repr__(self):
+        counts = self.counts()
+        return 'ValidationResult: %d issues in %d surfaces and %d fenestration ' \
+            'surfaces, %d fixed%s' % (
+                len(self.issues), self.surface_count, self.fen_surface_count,
+                self.fixed_count, ''.join(
+                    '\n  %s: %d' % (code, counts[code]) for code in CHECKS
+                    if counts[code]))
+
+
+def _polygon_planes(offsets, vertices, polygons):
+    """Calculate the plane data of polygons in one pass over the vertices.
+
+    Returns:
+        A list of (count, area, origin, normal, deviation) for each polygon. origin
+        is the average of the vertices and normal is the unit Newell normal. normal
+        is None for the polygons without area.
+    """
+    planes = []
+    for polygon in polygons:
+        start, end = 3 * offsets[polygon], 3 * offsets[polygon + 1]
+        xs, ys, zs = vertices[start:end:3], vertices[start + 1:end:3], \
+            vertices[start + 2:end:3]
+        count = len(xs)
+        if count < 3:
+            planes.append((count, 0.0, None, None, 0.0))
+            continue
+        # Newell's method with the next vertex of each vertex
+        nx = ny = nz = 0.0
+        px, py, pz = xs[-1], ys[-1], zs[-1]
+        for x, y, z in zip(xs, ys, zs):
+            nx += (py - y) * (pz + z)
+            ny += (pz - z) * (px + x)
+            nz += (px - x) * (py + y)
+            px, py, pz = x, y, z
+        size = math.sqrt(nx * nx + ny * ny + nz * nz)
+        origin = sum(xs) / count, sum(ys) / count, sum(zs) / count
+        if size == 0:
+            planes.append((count, 0.0, origin, None, 0.0))
+            continue
+        nx, ny, nz = nx / size, ny / size, nz / size
+        deviation = 0.0
+        if count > 3:
+            ox, oy, oz = origin
+            d = ox * nx + oy * ny + oz * nz
+            distances = [x * nx + y * ny + z * nz - d for x, y, z in zip(xs, ys, zs)]
+            deviation = max(max(distances), -min(distances))
+        planes.append((count, size / 2.0, origin, (nx, ny, nz), deviation))
+    return planes
+
+
+def _to_plane(values, origin, normal, x_axis, y_axis):
+    """Get (u, v) points and the maximum distance from the plane for a polygon."""
+    ox, oy, oz = origin
+    nx, ny, nz = normal
+    ux, uy, uz = x_axis
+    vx, vy, vz = y_axis
+    points = []
+    distances = []
+    for i in range(0, len(values), 3):
+        x, y, z = values[i] - ox, values[i + 1] - oy, values[i + 2] - oz
+        points.append((x * ux + y * uy + z * uz, x * vx + y * vy + z * vz))
+        distances.append(x * nx + y * ny + z * nz)
+    return points, max(max(distances), -min(distances))
+
+
+def _bounds(points):
+    us = [p[0] for p in points]
+    vs = [p[1] for p in points]
+    return min(us), min(vs), max(us), max(vs)
+
+
+def _locate(point, polygon):
+    """Signed distance of a (u, v) point to the boundary of a polygon.
+
+    Positive values are inside the polygon.
+    """
+    u, v = point
+    inside = False
+    sq_distance = None
+    u0, v0 = polygon[-1]
+    for u1, v1 in polygon:
+        if (v0 > v) != (v1 > v) and u < (u1 - u0) * (v - v0) / (v1 - v0) + u0:
+            inside = not inside
+        du, dv = u1 - u0, v1 - v0
+        ln = du * du + dv * dv
+        t = 0 if ln == 0 else min(max(((u - u0) * du + (v - v0) * dv) / ln, 0), 1)
+        eu, ev = u0 + t * du - u, v0 + t * dv - v
+        d = eu * eu + ev * ev
+        if sq_distance is None or d < sq_distance:
+            sq_distance = d
+        u0, v0 = u1, v1
+    distance = math.sqrt(sq_distance)
+    return distance if inside else -distance
+
+
+def _crosses(a, b, c, d, tolerance):
+    """Check if segment ab crosses segment cd by more than tolerance."""
+    def _side(p, q, r):
+        # signed distance of r from the line pq
+        du, dv = q[0] - p[0], q[1] - p[1]
+        ln = math.sqrt(du * du + dv * dv) or 1e-12
+        return (du * (r[1] - p[1]) - dv * (r[0] - p[0])) / ln
+
+    s1, s2 = _side(a, b, c), _side(a, b, d)
+    if not (s1 > tolerance and s2 < -tolerance or s1 < -tolerance and s2 > tolerance):
+        return False
+    s3, s4 = _side(c, d, a), _side(c, d, b)
+    return s3 > tolerance and s4 < -tolerance or s3 < -tolerance and s4 > tolerance
+
+
+def _is_bowtie(values, normal):
+    """Check if a planar quad crosses itself.
+
+    A simple quad has at most one corner that turns against the normal.
+    """
+    nx, ny, nz = normal
+    reflex = 0
+    ax, ay, az = values[9] - values[6], values[10] - values[7], values[11] - values[8]
+    for i in range(0, 12, 3):
+        bx, by, bz = values[i] - values[i - 3], values[i + 1] - values[i - 2], \
+            values[i + 2] - values[i - 1]
+        if (ay * bz - az * by) * nx + (az * bx - ax * bz) * ny + \
+                (ax * by - ay * bx) * nz < 0:
+            reflex += 1
+        ax, ay, az = bx, by, bz
+    return reflex > 1
+
+
+def _self_intersects(points, tolerance):
+    """Check if two edges of a (u, v) loop cross each other."""
+    count = len(points)
+    if count < 4:
+        return False
+    for i in range(count - 2):
+        a, b = points[i], points[i + 1]
+        # the last edge shares a vertex with the first edge
+        for j in range(i + 2, count - 1 if i == 0 else count):
+            if _crosses(a, b, points[j], points[(j + 1) % count], tolerance):
+                return True
+    return False
+
+
+def _overlaps(first, second, tolerance):
+    """Check if two (u, v) polygons overlap by more than tolerance."""
+    for point in first:
+        if _locate(point, second) > tolerance:
+            return True
+    for point in second:
+        if _locate(point, first) > tolerance:
+            return True
+    center = (sum(p[0] for p in first) / len(first),
+              sum(p[1] for p in first) / len(first))
+    if _locate(center, second) > tolerance and _locate(center, first) > tolerance:
+        # the same polygon
+        return True
+    for i, a in enumerate(first):
+        b = first[i - len(first) + 1]
+        for j, c in enumerate(second):
+            if _crosses(a, b, c, second[j - len(second) + 1], tolerance):
+                return True
+    return False
+
+
+def validate_model(model, tolerance=None, fix=False, report=None):
+    """Check the geometry of the surfaces and the fenestration surfaces.
+
+    Args:
+        model: A RoomModel.
+        tolerance: Distance tolerance for all the checks
+            (Default: adjacency.DEFAULT_TOLERANCE).
+        fix: Fix the issues that can be fixed (see dynosaur.validation). The model is
+            changed in place (Default: False).
+        report: An optional instrumentation.Report to record the time (validation)
+            and the number of issues (validation_issues and fixed_issues).
+
+    Returns:
+        A ValidationResult.
+    """
+    report = get_report(report)
+    start = report.start()
+    tolerance = tolerance or DEFAULT_TOLERANCE
+    result = ValidationResult(model.surface_count, model.fen_surface_count)
+    if not model.surface_count:
+        report.add_time('validation', start)
+        return result
+    offsets, vertices = model.polygon_offsets, model.vertices
+    surface_planes = _polygon_planes(offsets, vertices, model.surface_polygons)
+    fen_planes = _polygon_planes(offsets, vertices, model.fen_polygons)
+    min_area = tolerance * tolerance
+
+    # polygon: new x, y, z values of the same length
+    new_values = {}
+    removed_surfaces = set()
+    removed_fens = set()
+
+    def _values(polygon):
+        return vertices[3 * offsets[polygon]:3 * offsets[polygon + 1]]
+
+    def _check_polygon(kind, index, polygon, plane, names, removed):
+        count, area, origin, normal, deviation = plane
+        if count < 3 or area <= min_area:
+            issue = result.add(DEGENERATE, kind, index, name_text(names[index]), area)
+            if fix:
+                removed.add(index)
+                issue.fixed = True
+            return False
+        if deviation > tolerance:
+            issue = result.add(NON_PLANAR, kind, index, name_text(names[index]),
+                               deviation)
+            if fix:
+                values = _values(polygon)
+                new_values[polygon] = [c for pt in geometry.project_to_plane(
+                    zip(values[0::3], values[1::3], values[2::3]), origin, normal)
+                    for c in pt]
+                issue.fixed = True
+        if count == 4:
+            if _is_bowtie(_values(polygon), normal):
+                result.add(SELF_INTERSECTION, kind, index, name_text(names[index]))
+        elif count > 4:
+            x_axis, y_axis = geometry.plane_axes(normal)
+            points = _to_plane(_values(polygon), origin, normal, x_axis, y_axis)[0]
+            if _self_intersects(points, tolerance):
+                result.add(SELF_INTERSECTION, kind, index, name_text(names[index]))
+        return True
+
+    valid_surfaces = [
+        _check_polygon(SURFACE, index, polygon, surface_planes[index],
+                       model.surface_names, removed_surfaces)
+        for index, polygon in enumerate(model.surface_polygons)]
+    valid_fens = [
+        _check_polygon(FEN_SURFACE, index, polygon, fen_planes[index],
+                       model.fen_names, removed_fens)
+        for index, polygon in enumerate(model.fen_polygons)]
+
+    fen_names = model.fen_names
+    for surface, valid in enumerate(valid_surfaces):
+        fens = [f for f in model.surface_fen_surfaces(surface) if valid_fens[f]]
+        if not valid or not fens:
+            continue
+        _, area, origin, normal, _ = surface_planes[surface]
+        x_axis, y_axis = geometry.plane_axes(normal)
+        boundary = _to_plane(_values(model.surface_polygons[surface]), origin,
+                             normal, x_axis, y_axis)[0]
+        fen_area = 0.0
+        # (u min, u max, v min, v max, fen, points) for the openings in the boundary
+        openings = []
+        for fen in fens:
+            polygon = model.fen_polygons[fen]
+            fen_normal = fen_planes[fen][3]
+            fen_area += fen_planes[fen][1]
+            if geometry.dot(fen_normal, normal) < 0:
+                issue = result.add(FEN_ORIENTATION, FEN_SURFACE, fen,
+                                   name_text(fen_names[fen]))
+                if fix:
+                    values = new_values.get(polygon) or list(_values(polygon))
+                    # reverse the loop and keep the first point
+                    new_values[polygon] = values[:3] + [
+                        c for i in range(len(values) - 3, 0, -3)
+                        for c in values[i:i + 3]]
+                    issue.fixed = True
+            points, distance = _to_plane(_values(polygon), origin, normal, x_axis,
+                                         y_axis)
+            outside = max(0.0, -min(_locate(p, boundary) for p in points))
+            if outside > tolerance or distance > tolerance:
+                issue = result.add(FEN_OUTSIDE, FEN_SURFACE, fen,
+                                   name_text(fen_names[fen]), max(outside, distance))
+                if fix and outside > tolerance:
+                    removed_fens.add(fen)
+                    issue.fixed = True
+                elif fix:
+                    values = new_values.get(polygon) or _values(polygon)
+                    new_values[polygon] = [c for pt in geometry.project_to_plane(
+                        zip(values[0::3], values[1::3], values[2::3]), origin,
+                        normal) for c in pt]
+                    issue.fixed = True
+            if outside <= tolerance:
+                u_min, v_min, u_max, v_max = _bounds(points)
+                openings.append((u_min, u_max, v_min, v_max, fen, points))
+
+        if fen_area > area + min_area:
+            result.add(FEN_AREA, SURFACE, surface,
+                       name_text(model.surface_names[surface]), fen_area / area)
+
+        # sweep the openings along u and only compare the overlapping bounds
+        openings.sort()
+        for i, (_, u_max, v_min, v_max, fen, points) in enumerate(openings):
+            for other in openings[i + 1:]:
+                if other[0] >= u_max - tolerance:
+                    break
+                if other[2] >= v_max - tolerance or other[3] <= v_min + tolerance \
+                        or fen in removed_fens or other[4] in removed_fens:
+                    continue
+                if not _overlaps(points, other[5], tolerance):
+                    continue
+                # the issue is for the smaller opening
+                first, second = fen, other[4]
+                if fen_planes[first][1] > fen_planes[second][1]:
+                    first, second = second, first
+                issue = result.add(FEN_OVERLAP, FEN_SURFACE, first,
+                                   name_text(fen_names[first]), second)
+                if fix:
+                    removed_fens.add(first)
+                    issue.fixed = True
+
+    if fix:
+        for polygon, values in new_values.items():
+            start_index = 3 * offsets[polygon]
+            vertices[start_index:start_index + len(values)] = array('d', values)
+        model.remove_surfaces(removed_surfaces, removed_fens)
+
+    report.count('validation_issues', len(result))
+    report.count('fixed_issues', result.fixed_count)
+    report.add_time('validation', start)
+    return result
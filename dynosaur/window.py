@@ -1,12 +1,8 @@
 """Functions to deal with Revit Window elements."""
-import clr
-clr.AddReference("RevitAPI")
-from Autodesk.Revit.DB import Solid
-
-clr.AddReference("RevitNodes")
-from Revit import GeometryConversion
-# Import ToProtoType, ToRevitType geometry conversion extension methods
-clr.ImportExtensions(GeometryConversion)
+from . import geometry
+from .geometryscope import GeometryScope
+from .instrumentation import get_report
+from .backend import get_backend
 
 
 def get_child_elemenets(host_element, add_rect_openings=True, include_shadows=False,
@@ -25,38 +21,69 @@ def get_child_elemenets(host_element, add_rect_openings=True, include_shadows=Fa
     return tuple(host_element.Document.GetElement(i) for i in ids)
 
 
-def exctract_glazing_vertices(host_element, base_face, opt):
-    """Return glazing vertices for a window family instance.
+def extract_opening_loops(host_element, opt):
+    """Return the opening loops of a host element as (x, y, z) values.
 
-    I was hoping that revit supports a cleaner way for doing this but for now
-    I calculate the bounding box and find the face that it's vertices are coplanar
-    with the host face.
+    Openings are the inner loops of the outer face of the host element. Dynamo
+    geometries are disposed before returning the loops. The loops don't depend on
+    the room so they can be calculated once for each host element (see
+    hostelement.HostElementCache).
     """
+    backend = get_backend()
     # get 3d faces for the geometry
     # TODO: Take all the vertices for daylight modeling
-    faces = (clr.Convert(obj, Solid).Faces
+    faces = (backend.to_solid(obj).Faces
              for obj in host_element.get_Geometry(opt))
 
-    _outerFace = next(faces)[0].ToProtoType()[0]
+    loops = []
+    with GeometryScope() as scope:
+        _outerFace = scope.track_all(backend.to_proto_type(next(faces)[0]))[0]
+        for face in scope.track_all(_outerFace.Faces):
+            for loop in face.Loops[:-1]:
+                points = scope.track_all(
+                    edge.StartVertex.PointGeometry for edge in loop.CoEdges)
+                loops.append(tuple(geometry.xyz(pt) for pt in points))
+    return tuple(loops)
+
 
-    openings = (
-        tuple(edge.StartVertex.PointGeometry for edge in loop.CoEdges)
-        for face in _outerFace.Faces
-        for loop in face.Loops[:-1]
-    )
+def project_openings(opening_loops, base_face, report=None):
+    """Project opening loops to a base face.
 
-    coordinates = (
-        tuple(
-            tuple(base_face.ClosestPointTo(pt) for pt in opening)
-            for opening in openings
-        ))
+    Openings with less than three unique vertices after projection are removed.
 
-    # cleaning up
-    (pt.Dispose() for opening in openings for pt in opening)
-    (face.Dispose() for faceGroup in faces for face in faceGroup)
+    Args:
+        opening_loops: Opening loops as (x, y, z) values (see extract_opening_loops).
+        base_face: Dynamo base face or a geometry.FaceProjector.
+        report: An optional instrumentation.Report to record the time for
+            projecting the vertices (projection).
+    """
+    report = get_report(report)
+    start = report.start()
+    projector = geometry.face_projector(base_face)
+    coordinates = tuple(projector.project(opening) for opening in opening_loops)
+    report.add_time('projection', start)
 
     filtered_coordinates = tuple(coorgroup
                                  for coorgroup in coordinates
                                  if len(set(coorgroup)) > 2)
 
     return filtered_coordinates
+
+
+def exctract_glazing_vertices(host_element, base_face, opt, report=None):
+    """Return glazing vertices for a window family instance.
+
+    I was hoping that revit supports a cleaner way for doing this but for now
+    I calculate the bounding box and find the face that it's vertices are coplanar
+    with the host face.
+
+    base_face can be a Dynamo face or a geometry.FaceProjector. Vertices are
+    returned as (x, y, z) values. Use report (an instrumentation.Report) to record
+    the time for getting the geometry (extraction) and projecting the vertices
+    (projection).
+    """
+    report = get_report(report)
+    start = report.start()
+    opening_loops = extract_opening_loops(host_element, opt)
+    report.add_time('extraction', start)
+    return project_openings(opening_loops, base_face, report)
@@ -0,0 +1,430 @@
+"""Streaming writers for energy model geometry.
+
+Writers take the rooms one at a time and write their surfaces and fenestration
+surfaces to the file in chunks so memory doesn't grow with the size of the model.
+Use them with iter_rooms to write the rooms while they are created:
+
+    with writers.IDFWriter('C:/temp/model.idf', scale=0.001) as writer:
+        for room, elements, log in iter_rooms(revit_rooms):
+            writer.write_room(room)
+
+or write_rooms to write a RoomModel or any iterable of rooms:
+
+    writers.write_rooms(rooms, 'C:/temp/model.xml', scale=0.001)
+
+Surface types are set from the normal of the surface. Rooms from iter_rooms don't
+have adjacent surfaces and all the surfaces are written as exterior surfaces. Use
+the model from create_rooms to write the adjacent surfaces.
+
+Available writers:
+    IDFWriter: EnergyPlus Zone, BuildingSurface:Detailed and
+        FenestrationSurface:Detailed objects.
+    GBXMLWriter: gbXML Space, Surface and Opening elements.
+"""
+import io
+from operator import add, mul, sub
+import os
+import re
+import shutil
+import tempfile
+
+from .objects import name_text
+
+# minimum z value of the unit normal for roofs and ceilings
+HORIZONTAL = 0.7
+
+
+def surface_type(values):
+    """Get the type of a surface from its vertices.
+
+    Args:
+        values: A flat list of x, y, z values.
+
+    Returns:
+        'Wall', 'Roof' (facing up) or 'Floor' (facing down). Room surfaces face
+        outside the room.
+    """
+    if len(values) == 12:
+        # the cross product of the diagonals of a quad is twice its area vector
+        x0, y0, z0, x1, y1, z1, x2, y2, z2, x3, y3, z3 = values
+        ax, ay, az, bx, by, bz = x2 - x0, y2 - y0, z2 - z0, x3 - x1, y3 - y1, z3 - z1
+        nx, ny, nz = ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx
+    else:
+        # Newell's method (see geometry.newell_normal) on the columns of the values
+        xs, ys, zs = values[0::3], values[1::3], values[2::3]
+        xs1, ys1, zs1 = xs[1:] + xs[:1], ys[1:] + ys[:1], zs[1:] + zs[:1]
+        nx = sum(map(mul, map(sub, ys, ys1), map(add, zs, zs1)))
+        ny = sum(map(mul, map(sub, zs, zs1), map(add, xs, xs1)))
+        nz = sum(map(mul, map(sub, xs, xs1), map(add, ys, ys1)))
+    sq_length = nx * nx + ny * ny + nz * nz
+    if nz * nz <= HORIZONTAL * HORIZONTAL * sq_length or sq_length == 0:
+        return 'Wall'
+    return 'Roof' if nz > 0 else 'Floor'
+
+
+class _Writer(object):
+    """Base class for the streaming writers.
+
+    Args:
+        path: Path to the output file.
+        scale: Scale for the vertices (e.g. 0.001 for millimeters to meters).
+        chunk_size: Number of objects that are kept in memory before they are
+            written to the file (Default: 1000).
+        precision: Number of decimal places for the coordinates (Default: 6).
+    """
+
+    def __init__(self, path, scale=1.0, chunk_size=1000, precision=6):
+        self.path = path
+        self.scale = scale
+        self.chunk_size = chunk_size
+        self.room_count = 0
+        self.surface_count = 0
+        self.fen_surface_count = 0
+        self._coordinate = '%%.%df' % precision
+        self._formats = {}
+        self._chunk = []
+        self._file = io.open(path, 'w', encoding='utf-8', newline='\n')
+        self._write_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _vertex_format(self, count):
+        """Format for a polygon with count vertices."""
+        raise NotImplementedError
+
+    def _values(self, model, polygon):
+        """Scaled vertices of a polygon as a flat tuple of x, y, z values."""
+        offsets = model.polygon_offsets
+        values = model.vertices[3 * offsets[polygon]:3 * offsets[polygon + 1]]
+        if self.scale != 1:
+            scale = self.scale
+            return tuple(v * scale for v in values)
+        return tuple(values)
+
+    def _points(self, model, polygon):
+        """Vertices of a polygon as formatted text and as a flat list of values."""
+        values = self._values(model, polygon)
+        count = len(values) // 3
+        fmt = self._formats.get(count)
+        if fmt is None:
+            fmt = self._formats[count] = self._vertex_format(count)
+        return fmt % values, values
+
+    def _add(self, text):
+        self._chunk.append(text)
+        if len(self._chunk) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write the objects in memory to the file."""
+        if self._chunk:
+            self._file.write(u''.join(self._chunk))
+            del self._chunk[:]
+
+    def write_room(self, room):
+        """Write a room with its surfaces and fenestration surfaces.
+
+        Args:
+            room: A room from a RoomModel or a tuple of (room, elements, log) from
+                iter_rooms.
+        """
+        if isinstance(room, tuple):
+            room = room[0]
+        model, index = room.model, room.index
+        self._write_room(model, index)
+        self.room_count += 1
+
+    def write_model(self, model):
+        """Write all the rooms in a RoomModel."""
+        for index in range(len(model)):
+            self._write_room(model, index)
+            self.room_count += 1
+
+    def _write_header(self):
+        pass
+
+    def _write_footer(self):
+        pass
+
+    def _write_room(self, model, index):
+        raise NotImplementedError
+
+    def close(self):
+        """Write the remaining objects and close the file."""
+        if self._file.closed:
+            return
+        try:
+            self._write_footer()
+            self.flush()
+        finally:
+            self._file.close()
+
+    def __repr__(self):
+        return '%s: %s (%d rooms, %d surfaces)' % (
+            self.__class__.__name__, self.path, self.room_count, self.surface_count)
+
+
+class IDFWriter(_Writer):
+    """Write rooms as EnergyPlus zones, building surfaces and fenestration surfaces.
+
+    Adjacent surfaces have Surface outside boundary condition and the rest are
+    Outdoors. Constructions are left empty.
+    """
+
+    def _vertex_format(self, count):
+        xyz = ','.join((self._coordinate,) * 3)
+        return '%d,\n  ' % count + ',\n  '.join((xyz,) * count) + ';\n\n'
+
+    def _write_room(self, model, index):
+        zone = name_text(model.room_names[index])
+        self._add(u'Zone,\n  %s;\n\n' % zone)
+        names, adjacents = model.surface_names, model.surface_adjacents
+        for surface in model.room_surfaces(index):
+            points, values = self._points(model, model.surface_polygons[surface])
+            srf_type = surface_type(values)
+            adjacent = adjacents[surface]
+            name = name_text(names[surface])
+            if adjacent == -1:
+                boundary = 'Outdoors,,SunExposed,WindExposed'
+            else:
+                boundary = 'Surface,%s,NoSun,NoWind' % name_text(names[adjacent])
+                if srf_type == 'Roof':
+                    srf_type = 'Ceiling'
+            self._add(u'BuildingSurface:Detailed,\n  %s,%s,,%s,%s,autocalculate,%s' % (
+                name, srf_type, zone, boundary, points))
+            self.surface_count += 1
+            for fen in model.surface_fen_surfaces(surface):
+                points, _ = self._points(model, model.fen_polygons[fen])
+                self._add(u'FenestrationSurface:Detailed,\n  %s,Window,,%s,,'
+                          u'autocalculate,,1,%s' % (name_text(model.fen_names[fen]),
+                                                    name, points))
+                self.fen_surface_count += 1
+
+
+_INVALID_ID = re.compile(r'[^A-Za-z0-9_.-]')
+# gbXML surface types for exterior and adjacent surfaces
+_EXTERIOR_TYPES = {'Wall': 'ExteriorWall', 'Roof': 'Roof', 'Floor': 'RaisedFloor'}
+_INTERIOR_TYPES = {'Wall': 'InteriorWall', 'Roof': 'Ceiling', 'Floor': 'InteriorFloor'}
+
+
+def _xml_id(prefix, name):
+    """A valid XML id for a name."""
+    return prefix + _INVALID_ID.sub('_', name)
+
+
+def _xml_text(text):
+    if '&' in text or '<' in text or '>' in text or '"' in text:
+        return text.replace('&', '&amp;').replace('<', '&lt;') \
+            .replace('>', '&gt;').replace('"', '&quot;')
+    return text
+
+
+class GBXMLWriter(_Writer):
+    """Write rooms as gbXML spaces, surfaces and openings.
+
+    gbXML needs all the spaces before the surfaces. write_model writes all the
+    spaces first and then writes the surfaces to the file. Rooms from write_room
+    come one at a time so their surfaces are written to a temporary file next to
+    the output file and are copied to the end of the file when the writer is
+    closed. Adjacent surfaces are written once with both spaces. Set length_unit
+    to the unit of the scaled vertices (Default: Meters).
+    """
+
+    def __init__(self, path, scale=1.0, chunk_size=1000, precision=6,
+                 length_unit='Meters'):
+        self.length_unit = length_unit
+        # temporary file for the surfaces of the rooms from write_room
+        self._surfaces = None
+        self._surfaces_path = None
+        self._building_closed = False
+        # number of vertices: template for a surface or an opening row
+        self._surface_formats = {}
+        self._opening_formats = {}
+        _Writer.__init__(self, path, scale, chunk_size, precision)
+
+    def _vertex_format(self, count):
+        point = '<CartesianPoint>%s</CartesianPoint>' % ''.join(
+            ('<Coordinate>%s</Coordinate>' % self._coordinate,) * 3)
+        return '<PlanarGeometry><PolyLoop>%s</PolyLoop></PlanarGeometry>' % (
+            point * count)
+
+    def _write_header(self):
+        self._add(
+            u'<?xml version="1.0" encoding="UTF-8"?>\n'
+            u'<gbXML xmlns="http://www.gbxml.org/schema" version="0.37" '
+            u'useSIUnitsForResults="true" temperatureUnit="C" lengthUnit="%s" '
+            u'areaUnit="SquareMeters" volumeUnit="CubicMeters">\n'
+            u'<Campus id="campus"><Location><Name>dynosaur</Name></Location>\n'
+            u'<Building id="building" buildingType="Unknown">\n' % self.length_unit)
+
+    def _write_space(self, model, index):
+        room_name = name_text(model.room_names[index])
+        self._add(u'<Space id="%s"><Name>%s</Name></Space>\n' % (
+            _xml_id('space_', room_name), _xml_text(room_name)))
+
+    def _write_surfaces(self, model, index, add):
+        """Write the surfaces of a room as one row for each surface.
+
+        Each surface and its openings are formatted with a single template for
+        their number of vertices and are joined once.
+        """
+        surface_formats, opening_formats = \
+            self._surface_formats, self._opening_formats
+        names, adjacents = model.surface_names, model.surface_adjacents
+        polygons, fen_names, fen_polygons = \
+            model.surface_polygons, model.fen_names, model.fen_polygons
+        surface_fen_surfaces, get_values = model.surface_fen_surfaces, self._values
+        space = u'<AdjacentSpaceId spaceIdRef="%s"/>' % _xml_id(
+            'space_', name_text(model.room_names[index]))
+        for surface in model.room_surfaces(index):
+            adjacent = adjacents[surface]
+            if adjacent != -1 and adjacent < surface:
+                # written with the adjacent surface
+                continue
+            values = get_values(model, polygons[surface])
+            srf_type = surface_type(values)
+            name = name_text(names[surface])
+            if adjacent == -1:
+                srf_type = _EXTERIOR_TYPES[srf_type]
+                spaces = space
+            else:
+                srf_type = _INTERIOR_TYPES[srf_type]
+                spaces = space + u'<AdjacentSpaceId spaceIdRef="%s"/>' % _xml_id(
+                    'space_', name_text(model.room_names[model.surface_rooms[adjacent]]))
+            count = len(values) // 3
+            fmt = surface_formats.get(count)
+            if fmt is None:
+                fmt = surface_formats[count] = \
+                    u'<Surface id="%s" surfaceType="%s"><Name>%s</Name>%s' + \
+                    self._vertex_format(count)
+            row = [fmt % ((_xml_id('surface_', name), srf_type, _xml_text(name),
+                           spaces) + values)]
+            fens = surface_fen_surfaces(surface)
+            for fen in fens:
+                fen_name = name_text(fen_names[fen])
+                values = get_values(model, fen_polygons[fen])
+                count = len(values) // 3
+                fmt = opening_formats.get(count)
+                if fmt is None:
+                    fmt = opening_formats[count] = \
+                        u'<Opening id="%s" openingType="FixedWindow"><Name>%s</Name>' + \
+                        self._vertex_format(count) + u'</Opening>'
+                row.append(fmt % ((_xml_id('opening_', fen_name),
+                                   _xml_text(fen_name)) + values))
+            self.fen_surface_count += len(fens)
+            row.append(u'</Surface>\n')
+            add(u''.join(row))
+            self.surface_count += 1
+
+    def _add_surface(self, text):
+        if self._surfaces is None:
+            handle, self._surfaces_path = tempfile.mkstemp(
+                '.xml', dir=os.path.dirname(os.path.abspath(self.path)))
+            os.close(handle)
+            self._surfaces = io.open(self._surfaces_path, 'w', encoding='utf-8',
+                                     newline='\n')
+            self._surface_chunk = []
+        self._surface_chunk.append(text)
+        if len(self._surface_chunk) >= self.chunk_size:
+            self._surfaces.write(u''.join(self._surface_chunk))
+            del self._surface_chunk[:]
+
+    def _close_building(self):
+        if not self._building_closed:
+            self._add(u'</Building>\n')
+            self._building_closed = True
+
+    def _write_room(self, model, index):
+        if self._building_closed:
+            raise ValueError('Rooms can\'t be added to a gbXML file after '
+                             'write_model.')
+        self._write_space(model, index)
+        self._write_surfaces(model, index, self._add_surface)
+
+    def write_model(self, model):
+        """Write all the rooms in a RoomModel.
+
+        Spaces are written first and the surfaces are written to the file without
+        the temporary file. No rooms can be written after the model.
+        """
+        if self._building_closed:
+            raise ValueError('Rooms can\'t be added to a gbXML file after '
+                             'write_model.')
+        room_count = len(model)
+        for index in range(room_count):
+            self._write_space(model, index)
+        self._close_building()
+        # surfaces of the rooms from write_room go before the surfaces of the model
+        self._copy_surfaces()
+        chunk = self._chunk
+        for index in range(room_count):
+            self._write_surfaces(model, index, chunk.append)
+            if len(chunk) >= self.chunk_size:
+                self.flush()
+        self.room_count += room_count
+
+    def _copy_surfaces(self):
+        """Copy the surfaces from the temporary file to the file."""
+        if self._surfaces is None or self._surfaces.closed:
+            return
+        self.flush()
+        self._surfaces.write(u''.join(self._surface_chunk))
+        del self._surface_chunk[:]
+        self._surfaces.close()
+        # copy the bytes without decoding and encoding the text again
+        self._file.flush()
+        with io.open(self._surfaces_path, 'rb') as f:
+            shutil.copyfileobj(f, self._file.buffer, 1024 * 1024)
+
+    def _write_footer(self):
+        self._close_building()
+        self._copy_surfaces()
+        self._add(u'</Campus>\n</gbXML>\n')
+
+    def close(self):
+        try:
+            _Writer.close(self)
+        finally:
+            if self._surfaces is not None and not self._surfaces.closed:
+                self._surfaces.close()
+            if self._surfaces_path and os.path.isfile(self._surfaces_path):
+                os.remove(self._surfaces_path)
+
+
+WRITERS = {'.idf': IDFWriter, '.xml': GBXMLWriter, '.gbxml': GBXMLWriter}
+
+
+def write_rooms(rooms, path, scale=1.0, chunk_size=1000, precision=6):
+    """Write rooms to an IDF or a gbXML file.
+
+    Args:
+        rooms: A RoomModel, a list of rooms or an iterable of (room, elements, log)
+            from iter_rooms.
+        path: Path to the output file. The format is picked from the extension
+            (.idf, .xml or .gbxml).
+        scale: Scale for the vertices (e.g. 0.001 for millimeters to meters).
+        chunk_size: Number of objects that are kept in memory before they are
+            written to the file.
+        precision: Number of decimal places for the coordinates.
+
+    Returns:
+        The closed writer. Use it to get the number of written rooms and surfaces.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        writer_class = WRITERS[extension]
+    except KeyError:
+        raise ValueError('Unsupported file extension: %s. Use one of %s.' % (
+            extension, ', '.join(sorted(WRITERS))))
+    with writer_class(path, scale, chunk_size, precision) as writer:
+        if hasattr(rooms, 'room_surfaces'):
+            writer.write_model(rooms)
+        else:
+            for room in rooms:
+                writer.write_room(room)
+    return writer
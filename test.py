@@ -6,28 +6,21 @@ sys.path.append(r'C:\Users\Mostapha\Documents\code\ladybug-tools\dynosaur')
 
 import traceback
 
+import clr
+clr.AddReference('ProtoGeometry')
+from Autodesk.DesignScript.Geometry import Point
+
+
+def to_points(vertices):
+    """Convert (x, y, z) values to Dynamo points."""
+    return [Point.ByCoordinates(*v) for v in vertices]
+
 
 def extract_vertices(rooms):
     """extract vertices from the room for quick visualization."""
-    vertices = []
-    glz_vertices = []
-    for room in rooms:
-        for surface in room['surfaces']:
-            vertices.append(surface['vertices'])
-            if 'fen_surfaces' in surface:
-                # add child surfaces
-                for fen_surface in surface['fen_surfaces']:
-                    ver = fen_surface['vertices']
-                    try:
-                        # curtain wall. This should be fixed in the code itself
-                        ver[0][0]
-                        glz_vertices.extend(ver)
-                    except TypeError:
-                        glz_vertices.append(ver)
-                    except IndexError:
-                        glz_vertices.append(ver)
-
-    return vertices, glz_vertices
+    opaque, glazing = preview.preview_buffers(rooms)
+    return ([to_points(polygon) for polygon in opaque.polygons()],
+            [to_points(polygon) for polygon in glazing.polygons()])
 
 
 try:
@@ -37,6 +30,7 @@ try:
     # reload(dynosaur.curtainwall)
     # reload(dynosaur.dynosaur)
     import dynosaur.dynosaur as dynsr
+    from dynosaur import preview
     # import dynosaur.collector as col
     rooms = IN[0]
     roomosaurus, elements, log = dynsr.create_rooms(rooms)